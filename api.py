@@ -1,23 +1,57 @@
-import dns.resolver
-import sys
 import threading
-import json
-import os
+import time
 
-from checkers import whois_checker, dkim_checker, dns_checker, network_checker, update_checker
+from checkers import app_paths, metrics, models, whois_checker, dns_checker, dkim_checker, dnssec_checker, dns_resolver, email_auth_checker, network_checker, update_checker, bulk_checker, history_store, net_policy
+from job_manager import JobManager, current_job_id
 from logger_setup import log_execution
+from progress_channel import ProgressChannel
 
 _window = None
+# バックグラウンド処理からUIへの通知はすべてこのチャネルを通す
+_channel = ProgressChannel(json_default=models.json_default)
+
+# ジョブの種類ごとの同時実行数。ここにない種類は job_manager.DEFAULT_TYPE_LIMIT
+JOB_LIMITS = {
+    'nslookup': 4,
+    'nslookup_recheck': 2,
+    'propagation': 1,
+    'dnssec': 2,
+    'port': 4,
+    'ping': 2,
+    'traceroute': 1,
+    'whois': 2,
+    'email_auth': 1,
+    'port_scan': 1,
+    'bulk_audit': 1,
+    'update': 1,
+}
+# 時間のかかる処理はすべてこのジョブ管理で実行し、終わったらUIの job_finished に結果を送る
+_jobs = JobManager(type_limits=JOB_LIMITS,
+                   on_finish=lambda job: _channel.call('job_finished', _finished_job(job)))
+
+def _finished_job(job):
+    """
+    job_finished で送る内容。結果は runJob で待っている種類 (Api.JOB_METHODS) のものだけ付ける。
+    メール認証・ポートスキャン・一括チェックの結果は finish_* で送っているので、二重には送らない。
+    """
+    return job.to_dict(include_result=job.type in Api.JOB_METHODS)
 
 def set_window_for_api(window):
     global _window
     _window = window
+    _channel.set_window(window)
+
+def _save_history(domain, check, result, variant=''):
+    """結果を履歴に保存する。保存に失敗してもチェック結果の表示は妨げない。"""
+    try:
+        history_store.get_store().save(domain, check, result, variant)
+    except Exception as e:
+        print(f"ERROR: Failed to save history: {e}")
 
 def _get_app_version():
     """version.txtから現在のアプリケーションバージョンを読み込む"""
     try:
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
-        file_path = os.path.join(base_path, 'version.txt')
+        file_path = app_paths.get_resource_path('version.txt')
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read().strip()
     except Exception as e:
@@ -25,9 +59,17 @@ def _get_app_version():
         return "N/A" 
 
 class Api:
-    def __init__(self):
-        self.dkim_cancel_event = threading.Event()
-        self.dkim_thread = None
+    # start_job_py で実行できるジョブの種類と、実行するメソッド
+    JOB_METHODS = {
+        'nslookup': 'nslookup_py',
+        'nslookup_recheck': 'nslookup_recheck_py',
+        'propagation': 'check_propagation_py',
+        'dnssec': 'check_dnssec_py',
+        'port': 'test_port_connection_py',
+        'ping': 'ping_py',
+        'traceroute': 'traceroute_py',
+        'whois': 'whois_py',
+    }
 
     def get_app_version(self):
         """UIにバージョンを渡すための関数"""
@@ -35,8 +77,7 @@ class Api:
 
     def check_for_updates(self, version_url):
         """アップデートチェックをバックグラウンドで開始する"""
-        thread = threading.Thread(target=self._run_update_check, args=(version_url,))
-        thread.start()
+        _jobs.submit('update', self._run_update_check, version_url)
 
     def _run_update_check(self, version_url):
         """実際のアップデートチェック処理"""
@@ -44,92 +85,236 @@ class Api:
         # update_checkerライブラリを呼び出す
         update_checker.check(current_version, version_url, _window)
 
+    def get_bridge_stats_py(self):
+        """UI通知チャネルの送信回数とブリッジ往復時間を返す"""
+        latency = _channel.measure_latency()
+        stats = _channel.stats()
+        stats['measured_ms'] = round(latency * 1000, 2) if latency is not None else None
+        return stats
+
+    # --- ジョブ ---
+    def start_job_py(self, job_type, args):
+        """
+        JOB_METHODS の処理をジョブとして開始し、すぐに job_id を返す。
+        結果は終わったときに job_finished でUIに届くので、待っている間もUIは止まらない。
+        """
+        method = self.JOB_METHODS.get(job_type)
+        if method is None:
+            return {'error': f"不明なジョブの種類です: {job_type}"}
+        job = _jobs.submit(job_type, getattr(self, method), *(args or []))
+        return {'job_id': job.id, 'status': job.status}
+
+    def cancel_job_py(self, job_id):
+        """ジョブをキャンセルする。待っているジョブはそのまま取り消し、実行中のジョブは結果を捨てる。"""
+        return {'cancelled': _jobs.cancel(job_id)}
+
+    def get_jobs_py(self):
+        """ジョブの一覧 (新しい順) と、種類ごとの実行中・待ちの数を返す"""
+        return {'jobs': _jobs.list(), 'stats': _jobs.stats()}
+
+    # --- 診断 ---
+    def get_metrics_py(self):
+        """診断パネル用に、計測したヒストグラム・カウンタと各キャッシュの統計をまとめて返す"""
+        data = metrics.export_json()
+        data['bridge'] = _channel.stats()
+        data['dns_cache'] = dns_resolver.get_cache_stats()
+        data['whois_cache'] = whois_checker.get_cache_stats()
+        data['spf_cache'] = email_auth_checker.get_cache_stats()
+        data['dnssec_cache'] = dnssec_checker.get_cache_stats()
+        data['net_policy'] = net_policy.get_stats()
+        data['jobs'] = {'stats': _jobs.stats(), 'recent': _jobs.list()[:20]}
+        return data
+
+    def get_metrics_prometheus_py(self):
+        """計測結果を Prometheus のテキスト形式で返す"""
+        return metrics.export_prometheus()
+
+    def set_metrics_enabled_py(self, flag):
+        metrics.enable(flag)
+        return {'enabled': metrics.enabled}
+
+    def reset_metrics_py(self):
+        metrics.reset()
+        return {'status': 'reset'}
+
     def toggle_on_top(self, is_on_top):
         if _window:
             threading.Timer(0.01, lambda: setattr(_window, 'on_top', is_on_top)).start()
 
     # --- 各機能の呼び出し ---
+    # チェッカーの結果オブジェクトは、UIに返す直前に models.serialize で辞書に変換する
     @log_execution
     def nslookup_py(self, domain, server):
-        return dns_checker.nslookup(domain, server)
+        result = dns_checker.nslookup(domain, server)
+        _save_history(domain, 'nslookup', result, server)
+        return models.serialize(result)
+    @log_execution
+    def nslookup_recheck_py(self, domain, server):
+        """TTLが切れたレコードだけを問い合わせ直し、前回の結果との差分と合わせて返す"""
+        if not domain: return {'error': "ドメイン名を入力してください。"}
+        return history_store.get_store().recheck_records(
+            domain, lambda record_types: dns_checker.nslookup(domain, server, record_types=record_types),
+            dns_checker.RECORD_TYPES, variant=server)
+    @log_execution
+    def check_propagation_py(self, domain):
+        return models.serialize(dns_checker.check_propagation(domain))
+    @log_execution
+    def check_dnssec_py(self, domain, server):
+        """ルートから domain までのDNSSECの信頼の連鎖を検証する"""
+        return models.serialize(dnssec_checker.validate_chain(domain, server))
     @log_execution
     def test_port_connection_py(self, host, port_str):
-        return network_checker.test_port_connection(host, port_str)
+        result = network_checker.test_port_connection(host, port_str)
+        _save_history(host, 'port', result)
+        return models.serialize(result)
+    @log_execution
+    def start_port_scan_py(self, hosts, ports):
+        """複数ホスト・複数ポートのスキャンをバックグラウンドで開始する"""
+        if _jobs.active('port_scan'):
+            return {'error': "ポートスキャンは既に実行中です。"}
+        try:
+            host_list = network_checker.parse_hosts(hosts)
+            port_list = network_checker.parse_ports(ports)
+        except ValueError as e:
+            return {'error': str(e)}
+        if not host_list or not port_list:
+            return {'error': "ホストとポート番号の両方を入力してください。"}
+        job = _jobs.submit('port_scan', self._run_port_scan, host_list, port_list, cancellable=True)
+        return {'status': 'started', 'job_id': job.id, 'total': len(host_list) * len(port_list)}
+
+    def cancel_port_scan_py(self):
+        """実行中のポートスキャンを中断する"""
+        _jobs.cancel_type('port_scan')
+        return {'status': 'cancelling'}
+
+    @log_execution
+    def _run_port_scan(self, hosts, ports, cancel_event):
+        try:
+            result = network_checker.scan_ports(
+                hosts, ports,
+                on_result=lambda r: _channel.call('port_scan_result', r),
+                cancel_event=cancel_event
+            )
+            _channel.call('finish_port_scan', result.get('summary') or result)
+            return result
+        except Exception as e:
+            print(f"ERROR in port scan thread: {e}")
+            _channel.call('finish_port_scan', {"error": str(e)})
+            return {"error": str(e)}
     @log_execution
     def ping_py(self, host):
-        return network_checker.ping(host)
+        return models.serialize(network_checker.ping(host))
     @log_execution
     def traceroute_py(self, host):
-        return network_checker.traceroute(host)
+        return models.serialize(network_checker.traceroute(host))
     @log_execution
     def whois_py(self, query):
-        return whois_checker.get_whois_info(query)
+        result = whois_checker.get_whois_info(query)
+        _save_history(query, 'whois', result)
+        return models.serialize(result)
+    def get_history_changes_py(self, check, field, days):
+        """指定した日数のうちに項目 (例: nslookup の MX) が変わったドメインと、その差分を返す"""
+        since = time.time() - float(days) * 86400
+        store = history_store.get_store()
+        return {'domains': store.changed_domains(check, field, since),
+                'changes': store.changes(check, field, since=since)}
+    def get_history_py(self, domain):
+        """ドメインの保存済みの結果を新しい順に返す"""
+        return history_store.get_store().history(domain)
+    def get_dns_cache_stats_py(self):
+        """共有DNSキャッシュのヒット/ミス数をUIに返す"""
+        return dns_resolver.get_cache_stats()
     @log_execution
     def check_email_auth_py(self, domain, dkim_selector):
-        thread = threading.Thread(target=self._run_auth_check, args=(domain, dkim_selector))
-        thread.start()
-        return {'status': 'started'}
+        # 前のチェックが残っていれば打ち切ってから始める
+        _jobs.cancel_type('email_auth')
+        job = _jobs.submit('email_auth', self._run_auth_check, domain, dkim_selector, cancellable=True)
+        return {'status': 'started', 'job_id': job.id}
 
-    def _run_auth_check(self, domain, dkim_selector):
-        try:
-            results = []
-            resolver = dns.resolver.Resolver()
-            
-            # SPF
-            spf_data = {'type': 'SPF', 'records': []}
-            try:
-                answers = resolver.resolve(domain, 'TXT')
-                for rdata in answers:
-                    if 'v=spf1' in rdata.to_text().lower():
-                        spf_data['records'].append(rdata.to_text().strip('"'))
-                if not spf_data['records']: spf_data['status'] = "レコードが見つかりませんでした。"
-            except Exception as e: spf_data['status'] = f"クエリ失敗: {e}"
-            results.append(spf_data)
-
-            # DMARC
-            dmarc_data = {'type': 'DMARC', 'records': []}
-            try:
-                answers = resolver.resolve(f'_dmarc.{domain}', 'TXT')
-                for rdata in answers:
-                    if 'v=dmarc1' in rdata.to_text().lower():
-                        dmarc_data['records'].append(rdata.to_text().strip('"'))
-                if not dmarc_data['records']: dmarc_data['status'] = "DMARCレコードが見つかりませんでした。"
-            except Exception as e: dmarc_data['status'] = f"クエリ失敗: {e}"
-            results.append(dmarc_data)
-
-            # DKIM
-            public_dns_list = self._get_public_dns_servers()
-            if public_dns_list is None:
-                dkim_data = {'type': 'DKIM', 'status': "エラー: dns_servers.jsonが読み込めませんでした。"}
-                results.append(dkim_data)
-                if _window: _window.evaluate_js(f'finish_auth_check({json.dumps({"results": results, "checked_selectors": []})})')
-                return
+    def get_dkim_stats_py(self):
+        """DKIMセレクタの並べ替えの効果 (何番目の候補で見つかったかの中央値) を返す"""
+        return dkim_checker.get_selector_stats()
+
+    def cancel_email_auth_py(self):
+        """実行中のDKIMセレクタ検索を中断する"""
+        _jobs.cancel_type('email_auth')
+        return {'status': 'cancelling'}
 
+    @log_execution
+    def _run_auth_check(self, domain, dkim_selector, cancel_event):
+        # UIは job_id で今のチェックの通知かを見分け、打ち切られた前のチェックの通知は捨てる
+        job_id = current_job_id()
+        try:
             def update_progress(done, total):
-                if _window: _window.evaluate_js(f'update_dkim_progress({done}, {total})')
+                _channel.call('update_dkim_progress', done, total, job_id, coalesce=True)
 
-            # asyncio.run を削除し、同期関数を直接呼び出し
-            dkim_result, checked_selectors = dkim_checker.find_dkim_record(
-                domain, dkim_selector,
-                progress_callback=update_progress
-            )
-            
-            dkim_data = {'type': 'DKIM'}
-            dkim_data.update(dkim_result)
-            results.append(dkim_data)
-            
-            final_result = {'results': results, 'checked_selectors': checked_selectors}
-            if _window: _window.evaluate_js(f'finish_auth_check({json.dumps(final_result)})')
+            final_result = email_auth_checker.check_email_auth(domain, dkim_selector, update_progress, cancel_event)
+            # キャンセルされた (新しいチェックに置き換えられた) 結果は途中までなので、保存も通知もしない
+            if cancel_event.is_set():
+                print(f"INFO: Auth check {job_id} was cancelled. Discarding the result.")
+                return
+            _save_history(domain, 'email_auth', final_result, dkim_selector)
+            final_result['job_id'] = job_id
+            _channel.call('finish_auth_check', final_result)
+            return final_result
 
         except Exception as e:
             print(f"ERROR in auth check thread: {e}")
-            if _window: _window.evaluate_js(f'finish_auth_check({json.dumps({"error": str(e)})})')
-    
-    def _get_public_dns_servers(self):
+            if not cancel_event.is_set():
+                _channel.call('finish_auth_check', {"error": str(e), 'job_id': job_id})
+            return {"error": str(e)}
+
+    # --- 一括チェック ---
+    @log_execution
+    def start_bulk_audit_py(self, domains_text):
+        """貼り付け/CSVのドメイン一覧に対する一括チェックをバックグラウンドで開始する"""
+        domains = bulk_checker.parse_domains(domains_text)
+        if not domains:
+            return {'error': "チェックするドメインが見つかりませんでした。"}
+        if _jobs.active('bulk_audit'):
+            return {'error': "一括チェックは既に実行中です。"}
+        job = _jobs.submit('bulk_audit', self._run_bulk_audit, domains, cancellable=True)
+        return {'status': 'started', 'job_id': job.id, 'domains': domains}
+
+    def cancel_bulk_audit_py(self):
+        """実行中の一括チェックを中断する"""
+        _jobs.cancel_type('bulk_audit')
+        return {'status': 'cancelling'}
+
+    @log_execution
+    def _run_bulk_audit(self, domains, cancel_event):
+        # 履歴にある結果は期限 (DNSはTTL) 内ならそのまま使い、切れた部分だけ問い合わせ直す
+        store = history_store.get_store()
+        started = time.time()
+
+        def check_nslookup(domain):
+            entry = store.recheck_records(
+                domain, lambda record_types: dns_checker.nslookup(domain, '', record_types=record_types),
+                dns_checker.RECORD_TYPES)
+            return entry.get('result', entry)
+
+        def run_email_auth(domain):
+            result = email_auth_checker.check_email_auth(domain, '', cancel_event=cancel_event)
+            if cancel_event.is_set():
+                # 途中で打ち切った結果は履歴に残さない
+                raise RuntimeError("一括チェックは中断されました。")
+            return result
+
+        checks = {
+            'nslookup': check_nslookup,
+            'email_auth': lambda domain: store.recheck(domain, 'email_auth', run_email_auth)['result'],
+            'whois': lambda domain: store.recheck(domain, 'whois', whois_checker.get_whois_info)['result'],
+        }
+
+        def push_result(result):
+            result['changes'] = store.changes(domain=result['domain'], since=started)
+            _channel.call('bulk_audit_result', result)
+
         try:
-            base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
-            file_path = os.path.join(base_path, 'web', 'dns', 'dns_servers.json')
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [server['ip'] for server in data.get('public', []) if server.get('ip')]
-        except Exception: return None
\ No newline at end of file
+            stats = bulk_checker.run_audit(domains, checks, on_result=push_result, cancel_event=cancel_event)
+            _channel.call('finish_bulk_audit', stats)
+            return stats
+        except Exception as e:
+            print(f"ERROR in bulk audit thread: {e}")
+            _channel.call('finish_bulk_audit', {"error": str(e)})
+            return {"error": str(e)}
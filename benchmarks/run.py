@@ -0,0 +1,340 @@
+# benchmarks/run.py
+"""
+ローカルのスタブサーバーに向けて Api の各機能を繰り返し実行し、
+シナリオごとのスループット・レイテンシ (p50/p95/p99)・メモリをJSONで出力する。
+インターネットには出ないので、同じマシンなら実行ごとの結果を比べられる。
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario nslookup_cold whois_rdap --iterations 50
+    python -m benchmarks.run --dns-latency 20 --compare benchmarks/results/前回.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from benchmarks.stub_servers import (DKIM_SELECTOR, WHOIS_ONLY_TLD, ZONE, StubDNSServer, StubRDAPServer,
+                                     StubWhoisServer, TCPListeners)
+from checkers.metrics import percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# メモリ計測 (tracemalloc) で実行する回数。レイテンシの計測とは別に実行する
+MEMORY_ITERATIONS = 3
+
+class Scenario:
+    """
+    ベンチマークの1項目。call(i) を iterations 回、最大 concurrency 並列で実行する。
+    call は Api の戻り値を返し、エラーを含むものは errors として数える。
+    """
+    def __init__(self, name, call, iterations=20, concurrency=1, dns_loss=None, description=''):
+        self.name = name
+        self.call = call
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.dns_loss = dns_loss
+        self.description = description
+
+class _BenchWindow:
+    """pywebview のウィンドウの代わり。evaluate_js で送られた量だけを数える。"""
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def evaluate_js(self, script):
+        self.calls += 1
+        self.bytes += len(script)
+
+# 失敗を含みうる入れ子の場所 (差分確認の result、メール認証のカード、浸透確認のサーバー、スキャンの集計)
+_NESTED_KEYS = ('result', 'results', 'servers', 'summary')
+
+def _is_error(result):
+    """
+    結果に失敗が含まれるか。トップレベルの error のほか、レコードやカードの failed (タイムアウトなど)、
+    浸透確認のサーバーごとの status: error、DNSSECの bogus、一括チェックやスキャンの失敗件数も見る。
+    """
+    if isinstance(result, list):
+        return any(_is_error(item) for item in result)
+    if not isinstance(result, dict):
+        return False
+    if result.get('error') or result.get('failed') or result.get('errors'):
+        return True
+    if result.get('status') in ('error', 'bogus'):
+        return True
+    records = result.get('records')
+    if isinstance(records, dict) and _is_error(list(records.values())):
+        return True
+    return any(_is_error(result.get(key)) for key in _NESTED_KEYS)
+
+def _max_rss_kib():
+    """プロセスの最大常駐メモリ (KiB)。取得できないOSでは None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux はKiB
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def build_scenarios(api, listeners, jobs):
+    """Api の各機能を呼ぶシナリオの一覧。ドメインは毎回変えてキャッシュに当たらないようにする (warm 以外)"""
+    ports = ','.join(str(p) for p in listeners.open_ports + listeners.closed_ports)
+
+    def wait(response):
+        # バックグラウンドのジョブが終わるまで待ち、ジョブの結果を返す
+        if 'job_id' not in response:
+            return response
+        job = jobs.wait(response['job_id'])
+        if job['status'] != 'done':
+            return {'error': job['error'] or job['status']}
+        return job['result']
+
+    def nslookup_job(i):
+        return wait(api.start_job_py('nslookup', [f'job{i}.{ZONE}', '']))
+
+    def email_auth(i):
+        return wait(api.check_email_auth_py(f'mail{i}.{ZONE}', ''))
+
+    def port_scan(i):
+        return wait(api.start_port_scan_py('127.0.0.1,localhost', ports))
+
+    def bulk_audit(i):
+        return wait(api.start_bulk_audit_py('\n'.join(f'bulk{i}x{k}.{ZONE}' for k in range(10))))
+
+    return [
+        Scenario('nslookup_cold', lambda i: api.nslookup_py(f'cold{i}.{ZONE}', ''), 40, 4,
+                 description='毎回別のドメインで全レコード種別とグルーを引く'),
+        Scenario('nslookup_warm', lambda i: api.nslookup_py(f'warm.{ZONE}', ''), 200, 4,
+                 description='同じドメインを繰り返し引く (DNSキャッシュに当たる)'),
+        Scenario('nslookup_job', nslookup_job, 40, 8,
+                 description='ジョブ管理経由で引く (同時実行数の上限で待たされる分も含む)'),
+        Scenario('nslookup_lossy', lambda i: api.nslookup_py(f'lossy{i}.{ZONE}', ''), 10, 4, dns_loss=0.05,
+                 description='DNSの応答の5%を落とす'),
+        Scenario('nslookup_recheck', lambda i: api.nslookup_recheck_py(f'recheck{i % 5}.{ZONE}', ''), 40, 1,
+                 description='5ドメインを繰り返し差分確認する (2回目以降は履歴から)'),
+        Scenario('propagation', lambda i: api.check_propagation_py(f'prop{i}.{ZONE}'), 20, 2,
+                 description='8台のDNSサーバー (すべてスタブ) で応答を比べる'),
+        Scenario('email_auth', email_auth, 20, 1,
+                 description=f'SPF/DMARC/DKIM (セレクタ候補を総当たり、{DKIM_SELECTOR} で当たる)'),
+        Scenario('dnssec', lambda i: api.check_dnssec_py(f'signed{i}.{ZONE}', ''), 40, 4,
+                 description='スタブで署名したゾーンの連鎖を検証する (ルートから bench.test. までは検証済みの鍵を再利用)'),
+        Scenario('whois_rdap', lambda i: api.whois_py(f'rdap{i}.{ZONE}'), 40, 4,
+                 description='RDAP (HTTPのキープアライブ接続を使い回す)'),
+        Scenario('whois_legacy', lambda i: api.whois_py(f'legacy{i}.bench.{WHOIS_ONLY_TLD}'), 40, 4,
+                 description='RDAPに載っていないTLDでポート43のWhoisにフォールバックする'),
+        Scenario('port_open', lambda i: api.test_port_connection_py('127.0.0.1', str(listeners.open_ports[0])), 100, 8,
+                 description='待ち受けているポートへのTCP接続'),
+        Scenario('port_scan', port_scan, 20, 1,
+                 description=f'2ホスト x {len(listeners.open_ports) + len(listeners.closed_ports)} ポートのスキャン'),
+        Scenario('ping', lambda i: api.ping_py('127.0.0.1'), 3, 1,
+                 description='127.0.0.1 へのPing (ICMPが使えなければTCP)'),
+        Scenario('traceroute', lambda i: api.traceroute_py('127.0.0.1'), 3, 1,
+                 description='127.0.0.1 へのTraceroute'),
+        Scenario('bulk_audit', bulk_audit, 3, 1,
+                 description='10ドメインの一括チェック (NSLOOKUP / メール認証 / Whois)'),
+    ]
+
+def run_scenario(scenario, dns_server, iterations=None, measure_memory=True):
+    """シナリオを実行して統計を返す"""
+    iterations = iterations or scenario.iterations
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    default_loss = dns_server.loss
+    if scenario.dns_loss is not None:
+        dns_server.loss = scenario.dns_loss
+    queries_before = dns_server.queries
+
+    def timed_call(i):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            failed = _is_error(scenario.call(i))
+        except Exception as e:
+            print(f"ERROR: {scenario.name}: {e}", file=sys.stderr)
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=scenario.concurrency) as executor:
+            list(executor.map(timed_call, range(iterations)))
+        elapsed = time.perf_counter() - started
+
+        memory = {'peak_kib': None, 'max_rss_kib': None}
+        if measure_memory:
+            # 計測のオーバーヘッドがレイテンシに入らないよう、別の回で測る
+            tracemalloc.start()
+            try:
+                for i in range(MEMORY_ITERATIONS):
+                    scenario.call(iterations + i)
+                memory['peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            except Exception as e:
+                print(f"ERROR: {scenario.name} (memory): {e}", file=sys.stderr)
+            finally:
+                tracemalloc.stop()
+            memory['max_rss_kib'] = _max_rss_kib()
+    finally:
+        dns_server.loss = default_loss
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'name': scenario.name,
+        'description': scenario.description,
+        'calls': iterations,
+        'concurrency': scenario.concurrency,
+        'errors': errors,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(iterations / elapsed, 3) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'min': ms(latencies[0]),
+            'mean': ms(statistics.mean(latencies)),
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]),
+        },
+        'dns_queries': dns_server.queries - queries_before,
+        'memory': memory,
+    }
+
+def compare(report, previous):
+    """前回の結果と比べ、p50 とスループットの変化率を返す"""
+    old = {s['name']: s for s in previous.get('scenarios', [])}
+    changes = []
+    for scenario in report['scenarios']:
+        before = old.get(scenario['name'])
+        if before is None:
+            continue
+        ratio = lambda new, prev: round((new - prev) / prev * 100, 1) if prev else None
+        changes.append({
+            'name': scenario['name'],
+            'p50_change_pct': ratio(scenario['latency_ms']['p50'], before['latency_ms']['p50']),
+            'throughput_change_pct': ratio(scenario['throughput'], before['throughput']),
+        })
+    return changes
+
+def _print_summary(report, out):
+    out.write(f"{'scenario':<18}{'calls':>7}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>10}\n")
+    for s in report['scenarios']:
+        latency = s['latency_ms']
+        peak = s['memory']['peak_kib']
+        out.write(f"{s['name']:<18}{s['calls']:>7}{s['errors']:>5}{s['throughput']:>10.1f}"
+                  f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}"
+                  f"{peak if peak is not None else '-':>10}\n")
+    for change in report.get('comparison', []):
+        out.write(f"  {change['name']}: p50 {change['p50_change_pct']:+}% / "
+                  f"throughput {change['throughput_change_pct']:+}%\n")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='ローカルのスタブサーバーを使ったベンチマーク')
+    parser.add_argument('--scenario', nargs='+', help='実行するシナリオ (省略時はすべて)')
+    parser.add_argument('--iterations', type=int, help='各シナリオの実行回数 (省略時はシナリオごとの既定値)')
+    parser.add_argument('--dns-latency', type=float, default=5.0, help='スタブDNSの応答遅延 (ミリ秒)')
+    parser.add_argument('--dns-loss', type=float, default=0.0, help='スタブDNSが応答を落とす確率 (0-1)')
+    parser.add_argument('--no-memory', action='store_true', help='tracemalloc でのメモリ計測を省く')
+    parser.add_argument('--metrics', action='store_true', help='checkers.metrics の計測を有効にして実行する (計測の負担の確認用)')
+    parser.add_argument('--output', help='結果のJSONの保存先 (省略時は benchmarks/results/<日時>.json)')
+    parser.add_argument('--compare', help='比べる前回の結果のJSON')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # 履歴やキャッシュは一時ディレクトリに書き、実際の cache/ を汚さない
+    cache_dir = tempfile.mkdtemp(prefix='rsc-bench-')
+    os.environ['RENTALSERVERCHECKER_CACHE_DIR'] = cache_dir
+
+    dns_server = StubDNSServer(latency=args.dns_latency / 1000, loss=args.dns_loss, seed=0).start()
+    whois_server = StubWhoisServer().start()
+    rdap_server = StubRDAPServer().start()
+    listeners = TCPListeners().start()
+
+    import api
+    from checkers import dns_checker, dns_resolver, dnssec_checker, metrics, net_policy, whois_checker
+    metrics.enable(args.metrics)
+
+    # 各チェッカーの問い合わせ先をスタブに向ける
+    dns_resolver.configure('127.0.0.1', dns_server.port)
+    dnssec_checker.configure([dns_server.trust_anchor])
+    whois_checker.RDAP_BOOTSTRAP_URL = rdap_server.bootstrap_url
+    whois_checker.IANA_WHOIS_SERVER = '127.0.0.1'
+    whois_checker.WHOIS_PORT = whois_server.port
+    # 同じサーバーへの問い合わせ間隔は、ローカルのスタブ相手なのであけない
+    whois_checker.configure(min_interval=0)
+    dns_checker.configure([{'name': f'stub-{n}', 'ip': '127.0.0.1', 'port': dns_server.port, 'group': 'public'}
+                           for n in range(8)])
+
+    # コンソールへのログは結果の表示の邪魔になるので止める (ファイルへのログは残す)
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if type(handler) is logging.StreamHandler:
+            root_logger.removeHandler(handler)
+    window = _BenchWindow()
+    api.set_window_for_api(window)
+    bench_api = api.Api()
+
+    scenarios = build_scenarios(bench_api, listeners, api._jobs)
+    if args.scenario:
+        unknown = set(args.scenario) - {s.name for s in scenarios}
+        if unknown:
+            print(f"ERROR: unknown scenario: {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        scenarios = [s for s in scenarios if s.name in args.scenario]
+
+    results = []
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        for scenario in scenarios:
+            print(f"running {scenario.name}...", file=sys.stderr)
+            # パケットロスのシナリオで遮断したサーバーを次のシナリオに持ち越さない
+            net_policy.reset()
+            # チェッカーの print は計測中は捨てる
+            with contextlib.redirect_stdout(devnull):
+                results.append(run_scenario(scenario, dns_server, args.iterations, not args.no_memory))
+
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'dns_latency_ms': args.dns_latency, 'dns_loss': args.dns_loss, 'iterations': args.iterations,
+                   'metrics': args.metrics},
+        'scenarios': results,
+        'bridge': {'evaluate_js_calls': window.calls, 'evaluate_js_bytes': window.bytes},
+        'dns_cache': dns_resolver.get_cache_stats(),
+    }
+    if args.metrics:
+        report['metrics'] = metrics.export_json()
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    _print_summary(report, sys.stdout)
+    print(f"saved: {output}", file=sys.stderr)
+    for server in (dns_server, whois_server, rdap_server, listeners):
+        server.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
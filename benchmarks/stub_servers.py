@@ -0,0 +1,395 @@
+# benchmarks/stub_servers.py
+"""
+ベンチマーク用に同じプロセス内で動かすローカルのサーバー。
+どれも 127.0.0.1 の空いているポートで待ち受け、start() でバックグラウンドのスレッドを起動する。
+"""
+import json
+import random
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dns.flags
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+# StubDNSServer が応答するゾーン
+ZONE = 'bench.test'
+# Whoisだけで引ける (RDAPのブートストラップに載せない) TLD
+WHOIS_ONLY_TLD = 'invalid'
+DKIM_SELECTOR = 'selector1'
+# DNSSECの検証で失敗させるドメインのラベルの接頭辞。
+# bogus* は親ゾーンのDSが別の鍵を指し、nods* はDNSKEYはあるが親ゾーンにDSが無く、unsigned* は署名されていない。
+# DSの否定応答には親ゾーンが署名した NSEC を付けるが、noproof* (nods* と同じくDSが無い) には付けない
+BOGUS_PREFIX = 'bogus'
+NODS_PREFIX = 'nods'
+UNSIGNED_PREFIX = 'unsigned'
+NOPROOF_PREFIX = 'noproof'
+
+def _zone_records(name, zone):
+    """
+    zone 以下の任意のドメイン (<ラベル>.<zone>) について、一般的なメール用のレコードを合成する。
+    戻り値は {レコード種別: [値]}。zone の外なら None。
+    """
+    name = name.rstrip('.').lower()
+    if not name.endswith('.' + zone):
+        return None
+    labels = name[:-len(zone) - 1].split('.')
+    domain = f"{labels[-1]}.{zone}"
+    prefix = labels[:-1]
+    if labels == ['_spf']:
+        # 全ドメインが include する共通のSPF (_spf.google.com のようなもの)
+        return {'TXT': ['"v=spf1 ip4:192.0.2.0/24 ip6:2001:db8::/32 ~all"']}
+    if not prefix:
+        return {
+            'A': ['192.0.2.1'],
+            'AAAA': ['2001:db8::1'],
+            'MX': [f'10 mx1.{domain}.', f'20 mx2.{domain}.'],
+            'NS': [f'ns1.{domain}.', f'ns2.{domain}.'],
+            'TXT': [f'"v=spf1 include:_spf.{zone} mx -all"'],
+            'SOA': [f'ns1.{domain}. hostmaster.{domain}. 1 3600 600 86400 60'],
+        }
+    if prefix == ['_smtp', '_tls']:
+        return {'TXT': [f'"v=TLSRPTv1; rua=mailto:tls@{domain}"']}
+    if prefix == ['_dmarc']:
+        return {'TXT': [f'"v=DMARC1; p=none; rua=mailto:dmarc@{domain}"']}
+    if prefix == [DKIM_SELECTOR, '_domainkey']:
+        return {'TXT': ['"v=DKIM1; k=rsa; p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC"']}
+    if len(prefix) == 1 and prefix[0] in ('mx1', 'mx2', 'ns1', 'ns2'):
+        last = {'mx1': 10, 'mx2': 11, 'ns1': 53, 'ns2': 54}[prefix[0]]
+        return {'A': [f'192.0.2.{last}'], 'AAAA': [f'2001:db8::{last}']}
+    return {}
+
+class _ZoneSigner:
+    """
+    スタブのゾーンを ルート → test. → bench.test. → <ラベル>.bench.test. の連鎖として署名する。
+    鍵はゾーンごとに1つ (KSK と ZSK を兼ねる ECDSAP256SHA256) で、<ラベル>.bench.test. は全ドメインで同じ鍵を使う。
+    ルートの鍵のDSが trust_anchor になる。鍵と署名は初めて使うときに作る。
+    """
+    def __init__(self, zone):
+        self.zone = dns.name.from_text(zone)
+        self._keys = {}
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def _key(self, name):
+        """(秘密鍵, DNSKEY)。name はゾーン名か、<ラベル>.bench.test. 共通の鍵なら 'domain'、偽のDS用なら 'other'。"""
+        import dns.dnssec
+        from cryptography.hazmat.primitives.asymmetric import ec
+        with self._lock:
+            if name not in self._keys:
+                private_key = ec.generate_private_key(ec.SECP256R1())
+                dnskey = dns.dnssec.make_dnskey(private_key.public_key(), dns.dnssec.Algorithm.ECDSAP256SHA256, flags=257)
+                self._keys[name] = (private_key, dnskey)
+            return self._keys[name]
+
+    @property
+    def trust_anchor(self):
+        """ルートの鍵のDS ('タグ アルゴリズム ダイジェスト種別 ダイジェスト')"""
+        import dns.dnssec
+        return dns.dnssec.make_ds(dns.name.root, self._key(dns.name.root)[1], 'SHA256').to_text()
+
+    def zone_of(self, name):
+        """name を含むゾーン。<ラベル>.bench.test. 以下はそのドメインがゾーン"""
+        if name.is_subdomain(self.zone) and len(name) > len(self.zone):
+            return name.split(len(self.zone) + 1)[1]
+        while not self.zone.is_subdomain(name):
+            name = name.parent()
+        return name
+
+    def _zone_key(self, zone):
+        return self._key('domain' if len(zone) > len(self.zone) else zone)
+
+    def _label(self, zone):
+        return zone.labels[0].decode().lower() if len(zone) > len(self.zone) else ''
+
+    def records(self, name):
+        """ゾーンの頂点の DNSKEY/DS/SOA ({レコード種別: [値]})。頂点でなければ空"""
+        import dns.dnssec
+        if self.zone_of(name) != name:
+            return {}
+        label = self._label(name)
+        records = {'SOA': [f'ns1.{self.zone} hostmaster.{self.zone} 1 3600 600 86400 60']}
+        if label.startswith(UNSIGNED_PREFIX):
+            return records
+        records['DNSKEY'] = [self._zone_key(name)[1].to_text()]
+        if name != dns.name.root and not label.startswith((NODS_PREFIX, NOPROOF_PREFIX)):
+            key = self._key('other')[1] if label.startswith(BOGUS_PREFIX) else self._zone_key(name)[1]
+            records['DS'] = [dns.dnssec.make_ds(name, key, 'SHA256').to_text()]
+        return records
+
+    def ds_denial(self, name):
+        """
+        name (ゾーンの頂点) にDSが無いことを示す、親ゾーン側の NSEC。
+        DSがある・頂点でない・noproof* のゾーンなら None。
+        """
+        if (name == dns.name.root or self.zone_of(name) != name or 'DS' in self.records(name)
+                or self._label(name).startswith(NOPROOF_PREFIX)):
+            return None
+        return dns.rrset.from_text(name, 60, 'IN', 'NSEC', f'\\000.{name} NS RRSIG NSEC')
+
+    def sign(self, rrset):
+        """rrset の RRSIG。署名されていないゾーンなら None"""
+        import dns.dnssec
+        zone = self.zone_of(rrset.name)
+        if rrset.rdtype in (dns.rdatatype.DS, dns.rdatatype.NSEC) and rrset.name == zone and zone != dns.name.root:
+            # 委任点のDSとNSECは親ゾーンのもの
+            zone = self.zone_of(zone.parent())
+        if self._label(zone).startswith(UNSIGNED_PREFIX):
+            return None
+        key = (rrset.name, rrset.rdtype)
+        with self._lock:
+            rrsig = self._signatures.get(key)
+        if rrsig is None:
+            private_key, dnskey = self._zone_key(zone)
+            rrsig = dns.rrset.from_rdata(rrset.name, rrset.ttl, dns.dnssec.sign(
+                rrset, private_key, zone, dnskey, lifetime=86400))
+            with self._lock:
+                self._signatures[key] = rrsig
+        return rrsig
+
+class StubDNSServer:
+    """
+    合成したゾーンを返すUDPのDNSサーバー。
+    latency 秒待ってから応答し、loss の確率で応答しない (パケットロスの代わり)。
+    DNSSEC用にルートから zone までを署名した連鎖も返す (trust_anchor をトラストアンカーにして検証できる)。
+    """
+    def __init__(self, zone=ZONE, latency=0.0, loss=0.0, seed=None):
+        self.zone = zone
+        self.latency = latency
+        self.loss = loss
+        self.queries = 0
+        self.dropped = 0
+        self._random = random.Random(seed)
+        self.signer = _ZoneSigner(zone)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self.port = self._sock.getsockname()[1]
+        self._stopped = threading.Event()
+
+    @property
+    def trust_anchor(self):
+        return self.signer.trust_anchor
+
+    def start(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except OSError:
+                return
+            self.queries += 1
+            if self.loss and self._random.random() < self.loss:
+                self.dropped += 1
+                continue
+            if self.latency:
+                threading.Timer(self.latency, self._reply, args=(data, addr)).start()
+            else:
+                self._reply(data, addr)
+
+    def _reply(self, data, addr):
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text()
+        rdtype = dns.rdatatype.to_text(question.rdtype)
+        records = {**self.signer.records(question.name), **(_zone_records(name, self.zone) or {})}
+        if not records:
+            # zone の外や、合成しない名前 (当たらないDKIMセレクタなど) は存在しない
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif rdtype in records:
+            rrset = dns.rrset.from_text(name, 300, 'IN', rdtype, *records[rdtype])
+            response.answer.append(rrset)
+            if query.ednsflags & dns.flags.DO:
+                rrsig = self.signer.sign(rrset)
+                if rrsig is not None:
+                    response.answer.append(rrsig)
+        if not response.answer:
+            # 否定応答にはSOAを付ける (否定応答のキャッシュ時間の計算に使われる)
+            response.authority.append(dns.rrset.from_text(
+                f'{self.zone}.', 60, 'IN', 'SOA', f'ns1.{self.zone}. hostmaster.{self.zone}. 1 3600 600 86400 60'))
+            denial = self.signer.ds_denial(question.name) if rdtype == 'DS' else None
+            if denial is not None and query.ednsflags & dns.flags.DO:
+                response.authority.append(denial)
+                rrsig = self.signer.sign(denial)
+                if rrsig is not None:
+                    response.authority.append(rrsig)
+        try:
+            self._sock.sendto(response.to_wire(), addr)
+        except OSError:
+            pass
+
+class _WhoisHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        query = self.request.recv(1024).decode('utf-8', 'ignore').strip().lower()
+        if '.' not in query:
+            # IANA への問い合わせ: TLDのWhoisサーバーとしてこのサーバー自身を返す
+            body = f"domain:       {query.upper()}\nwhois:        127.0.0.1\n"
+        else:
+            body = (f"Domain Name: {query.upper()}\n"
+                    f"Registrar: Bench Registrar\n"
+                    f"Name Server: NS1.{query.upper()}\n"
+                    f"Name Server: NS2.{query.upper()}\n"
+                    f"Registry Expiry Date: 2030-01-01T00:00:00Z\n"
+                    f"Domain Status: clientTransferProhibited\n")
+        self.request.sendall(body.encode('utf-8'))
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class StubWhoisServer:
+    """ポート43の代わりのWhoisサーバー。IANA役とレジストリ役の両方をこなす。"""
+    def __init__(self):
+        self._server = _ThreadingTCPServer(('127.0.0.1', 0), _WhoisHandler)
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class _RDAPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/rdap+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        base = f"http://127.0.0.1:{self.server.server_address[1]}/rdap/"
+        if self.path == '/dns.json':
+            data = {'version': '1.0', 'services': [[[ZONE.split('.')[-1]], [base]]]}
+        elif self.path.startswith('/rdap/domain/'):
+            name = self.path.rsplit('/', 1)[1].lower()
+            data = {
+                'objectClassName': 'domain',
+                'ldhName': name,
+                'status': ['active'],
+                'events': [{'eventAction': 'registration', 'eventDate': '2020-01-01T00:00:00Z'},
+                           {'eventAction': 'expiration', 'eventDate': '2030-01-01T00:00:00Z'}],
+                'nameservers': [{'objectClassName': 'nameserver', 'ldhName': f'ns1.{name}'},
+                                {'objectClassName': 'nameserver', 'ldhName': f'ns2.{name}'}],
+                'entities': [{'objectClassName': 'entity', 'roles': ['registrar'],
+                              'vcardArray': ['vcard', [['version', {}, 'text', '4.0'], ['fn', {}, 'text', 'Bench Registrar']]]}],
+            }
+        else:
+            self._send(404)
+            return
+        self._send(200, json.dumps(data).encode('utf-8'))
+
+class _TrackingHTTPServer(ThreadingHTTPServer):
+    """受け付けた接続を数え、開いている接続をまとめて切れるHTTPサーバー"""
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.connections = 0
+        self._open = set()
+        self._open_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._open_lock:
+            self.connections += 1
+            self._open.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._open_lock:
+            self._open.discard(request)
+        super().shutdown_request(request)
+
+    def drop_connections(self):
+        with self._open_lock:
+            for request in self._open:
+                try:
+                    request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+class StubRDAPServer:
+    """RDAPのブートストラップ (/dns.json) とドメイン情報 (/rdap/domain/<名前>) を返すHTTPサーバー"""
+    def __init__(self):
+        self._server = _TrackingHTTPServer(('127.0.0.1', 0), _RDAPHandler)
+        self.port = self._server.server_address[1]
+        self.bootstrap_url = f"http://127.0.0.1:{self.port}/dns.json"
+
+    @property
+    def connections(self):
+        """これまでに受け付けたTCP接続の数"""
+        return self._server.connections
+
+    def drop_connections(self):
+        """Keep-Alive で待っている接続をサーバー側から切る"""
+        self._server.drop_connections()
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class TCPListeners:
+    """
+    ポート確認・スキャン用に、接続を受け付けてすぐ閉じるTCPポートを count 個開く。
+    closed_ports は待ち受けていない (接続が拒否される) ポート。
+    """
+    def __init__(self, count=5, closed=5):
+        self._socks = []
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(128)
+            self._socks.append(sock)
+        self.open_ports = [sock.getsockname()[1] for sock in self._socks]
+        self.closed_ports = []
+        for _ in range(closed):
+            # 一度確保してすぐ閉じたポートは、しばらく誰も待ち受けていない
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind(('127.0.0.1', 0))
+                self.closed_ports.append(sock.getsockname()[1])
+        self._stopped = threading.Event()
+
+    def start(self):
+        for sock in self._socks:
+            threading.Thread(target=self._accept, args=(sock,), daemon=True).start()
+        return self
+
+    def _accept(self, sock):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            conn.close()
+
+    def stop(self):
+        self._stopped.set()
+        for sock in self._socks:
+            sock.close()
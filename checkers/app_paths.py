@@ -0,0 +1,27 @@
+# checkers/app_paths.py
+import os
+import sys
+
+def get_app_dir():
+    """実行ファイル(ソース実行時はプロジェクト)のあるディレクトリを返す。ログファイルと同じ場所。"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_resource_path(*parts):
+    """
+    同梱ファイル (web/ 以下など) のパスを返す。
+    PyInstaller の展開先、ソース実行時はプロジェクトのディレクトリを基準にするため、
+    カレントディレクトリに依存しない (cron などから実行しても読める)。
+    """
+    base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, *parts)
+
+# キャッシュの保存先を変える環境変数 (ベンチマークなどで実際の履歴を汚さないため)
+CACHE_DIR_ENV = 'RENTALSERVERCHECKER_CACHE_DIR'
+
+def get_cache_dir():
+    """キャッシュや履歴を保存するディレクトリを返す (なければ作る)"""
+    path = os.environ.get(CACHE_DIR_ENV) or os.path.join(get_app_dir(), 'cache')
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,100 @@
+# checkers/bulk_checker.py
+import csv
+import io
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from checkers.metrics import percentile
+
+# 同時にチェックするドメイン数の上限
+DEFAULT_MAX_WORKERS = 4
+
+_DOMAIN_RE = re.compile(r'^(?=.{1,253}$)(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$')
+
+def parse_domains(text):
+    """
+    貼り付けたテキストまたはCSVの内容からドメイン名を取り出す。
+    カンマ・空白・改行のどれで区切られていてもよく、見出し行やドメインでないセルは無視する。
+    重複は除き、最初に現れた順に返す。
+    """
+    domains = []
+    seen = set()
+    for row in csv.reader(io.StringIO(text or '')):
+        for cell in row:
+            for token in cell.split():
+                token = token.strip().strip('"\'').rstrip('.').lower()
+                try:
+                    token = token.encode('idna').decode('ascii')
+                except UnicodeError:
+                    continue
+                if _DOMAIN_RE.match(token) and token not in seen:
+                    seen.add(token)
+                    domains.append(token)
+    return domains
+
+def _audit_domain(index, domain, checks, cancel_event):
+    """1ドメイン分のチェックを順に実行し、結果の辞書を返す"""
+    started = time.monotonic()
+    result = {'index': index, 'domain': domain, 'results': {}, 'errors': {}, 'timings': {}}
+    for name, check in checks.items():
+        if cancel_event is not None and cancel_event.is_set():
+            result['cancelled'] = True
+            break
+        check_started = time.monotonic()
+        try:
+            result['results'][name] = check(domain)
+        except Exception as e:
+            result['errors'][name] = f"{type(e).__name__}: {e}"
+        result['timings'][name] = round(time.monotonic() - check_started, 3)
+    result['elapsed'] = round(time.monotonic() - started, 3)
+    return result
+
+def run_audit(domains, checks, on_result=None, cancel_event=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    domains の各ドメインに checks ({名前: callable(domain)}) を実行する。
+    最大 max_workers ドメインを並行して処理し、終わったものから on_result(result) で通知する。
+    戻り値は件数・所要時間・スループット・レイテンシ分布の統計。
+    """
+    started = time.monotonic()
+    latencies = []
+    completed = failed = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(domains) or 1)))
+    try:
+        futures = [
+            executor.submit(_audit_domain, index, domain, checks, cancel_event)
+            for index, domain in enumerate(domains)
+        ]
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            result = future.result()
+            if result.get('cancelled'):
+                continue
+            completed += 1
+            if result['errors']:
+                failed += 1
+            latencies.append(result['elapsed'])
+            if on_result:
+                on_result(result)
+            if cancel_event is not None and cancel_event.is_set():
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        'total': len(domains),
+        'completed': completed,
+        'failed': failed,
+        'cancelled': bool(cancel_event is not None and cancel_event.is_set()),
+        'elapsed': round(elapsed, 3),
+        'throughput': round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+        'latency': {
+            'min': latencies[0] if latencies else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+    }
@@ -1,69 +1,260 @@
 # checkers/dkim_checker.py
 import os
-import sys
 import json
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import dns.resolver # 非同期から同期ライブラリへ
 
-def _load_dkim_selectors(filename='dkim_selectors.json'):
+from checkers import app_paths, dns_resolver, net_policy
+
+# 同時に問い合わせるセレクタ数の上限
+DEFAULT_MAX_WORKERS = 8
+# セレクタの当たり回数を保存するファイル (cache/ 以下)
+STATS_CACHE_FILE = 'dkim_selector_stats.json'
+# 中央値の計算に使う直近の検索回数
+STATS_HISTORY_SIZE = 500
+# 全プロバイダをまとめた当たり回数のキー
+ALL_PROVIDERS = '*'
+
+_selector_files = {}
+_selectors_lock = threading.Lock()
+_stats = None
+_stats_lock = threading.Lock()
+
+def _load_selector_file(filename='dkim_selectors.json'):
     """
-    JSONファイルからDKIMセレクタのリストを読み込む。
+    セレクタのJSONファイル ({'selectors': [...], 'provider_suffixes': [...]}) を読み込む。
+    読み込めた内容はプロセス内で使い回す (読み込みに失敗した場合は次回また読む)。
     """
+    with _selectors_lock:
+        if filename in _selector_files:
+            return _selector_files[filename]
     try:
-        base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else '.'
-        file_path = os.path.join(base_path, 'web', 'dns', filename)
-        
+        file_path = app_paths.get_resource_path('web', 'dns', filename)
+
         if not os.path.exists(file_path):
             print(f"WARNING: Selector file not found at '{file_path}'")
-            return []
-        
+            return {}
+
         with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f).get('selectors', [])
+            data = json.load(f)
     except Exception as e:
         print(f"ERROR: Failed to load selector file: {e}")
-        return []
+        return {}
+    data = {
+        'selectors': tuple(data.get('selectors', [])),
+        'provider_suffixes': frozenset(s.lower() for s in data.get('provider_suffixes', [])),
+    }
+    with _selectors_lock:
+        _selector_files[filename] = data
+    return data
+
+def _load_dkim_selectors(filename='dkim_selectors.json'):
+    """JSONファイルからDKIMセレクタのリストを読み込む"""
+    return list(_load_selector_file(filename).get('selectors', ()))
+
+# --- セレクタの当たり回数 ---
+
+def _stats_path():
+    return os.path.join(app_paths.get_cache_dir(), STATS_CACHE_FILE)
+
+def _get_stats():
+    """
+    保存済みの当たり回数 {'hits': {プロバイダ: {セレクタ: 回数}}, 'lookups': [...]} を返す。
+    _stats_lock を取った状態で呼ぶこと。
+    """
+    global _stats
+    if _stats is None:
+        _stats = {'hits': {}, 'lookups': []}
+        try:
+            with open(_stats_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _stats['hits'] = data.get('hits', {})
+            _stats['lookups'] = data.get('lookups', [])[-STATS_HISTORY_SIZE:]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"WARNING: Failed to load DKIM selector stats: {e}")
+    return _stats
 
-def find_dkim_record(domain, dkim_selector="", progress_callback=None): # 関数名を変更
+def _save_stats(stats):
+    """書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える"""
+    path = _stats_path()
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"WARNING: Failed to save DKIM selector stats: {e}")
+
+def _provider_of(host, suffixes=None):
+    """
+    MXホスト名からプロバイダを表すドメインを取り出す (aspmx.l.google.com -> google.com、xx.sakura.ne.jp -> sakura.ne.jp)。
+    suffixes (省略時はセレクタのJSONの provider_suffixes) に載っている co.jp / co.uk のようなサフィックスは1つ多く残す。
     """
-    DKIMレコードを同期的に検索する。
+    if suffixes is None:
+        suffixes = _load_selector_file().get('provider_suffixes', ())
+    labels = host.lower().rstrip('.').split('.')
+    keep = 3 if len(labels) >= 3 and '.'.join(labels[-2:]) in suffixes else 2
+    return '.'.join(labels[-keep:])
+
+def detect_mx_provider(domain, deadline=None):
+    """ドメインの最優先MXからメールのプロバイダを推定する。MXが引けなければ None。"""
+    try:
+        answers = dns_resolver.resolve(domain, 'MX', deadline=deadline)
+    except Exception:
+        return None
+    records = sorted(answers, key=lambda rdata: rdata.preference)
+    if not records or records[0].exchange.to_text() in ('.', ''):
+        return None
+    return _provider_of(records[0].exchange.to_text())
+
+def order_selectors(selectors, provider=None):
+    """
+    当たり回数の多いセレクタが先になるよう並べ替える。
+    同じプロバイダでの回数、全体での回数、ファイルの順の優先度で比べる。
+    """
+    with _stats_lock:
+        hits = _get_stats()['hits']
+        provider_hits = dict(hits.get(provider, {})) if provider else {}
+        all_hits = dict(hits.get(ALL_PROVIDERS, {}))
+    position = {selector: i for i, selector in enumerate(selectors)}
+    return sorted(selectors, key=lambda s: (-provider_hits.get(s, 0), -all_hits.get(s, 0), position[s]))
+
+def record_hit(selector, provider, probes, rank, file_order_probes):
+    """
+    見つかったセレクタの当たり回数を加算して保存する。
+    probes は見つかるまでに実際に送った問い合わせの数 (並行して送った分を含む)。
+    rank は並べ替えた順での、file_order_probes はファイルの順での何番目に当たったか。
+    """
+    with _stats_lock:
+        stats = _get_stats()
+        for key in filter(None, (ALL_PROVIDERS, provider)):
+            counts = stats['hits'].setdefault(key, {})
+            counts[selector] = counts.get(selector, 0) + 1
+        stats['lookups'].append({'provider': provider, 'selector': selector, 'probes': probes,
+                                 'rank': rank, 'file_order_probes': file_order_probes})
+        del stats['lookups'][:-STATS_HISTORY_SIZE]
+        _save_stats(stats)
+
+def get_selector_stats(top=5):
+    """
+    並べ替えの効果を測るための統計。直近の検索で実際に送った問い合わせ数の中央値と、
+    何番目のセレクタで当たったかの中央値 (学習した順とファイルの順) を返す。プロバイダごとの上位セレクタも返す。
+    """
+    with _stats_lock:
+        stats = _get_stats()
+        lookups = list(stats['lookups'])
+        hits = {provider: dict(counts) for provider, counts in stats['hits'].items()}
+    return {
+        'lookups': len(lookups),
+        'median_probes_to_hit': statistics.median(l['probes'] for l in lookups) if lookups else None,
+        # 以前の記録には rank がなく、probes が並べ替えた順での順位だった
+        'median_rank': statistics.median(l.get('rank', l['probes']) for l in lookups) if lookups else None,
+        'median_rank_file_order': statistics.median(l['file_order_probes'] for l in lookups) if lookups else None,
+        'top_selectors': {
+            provider: sorted(counts, key=lambda s: -counts[s])[:top] for provider, counts in hits.items()
+        },
+    }
+
+def _query_selector(domain, selector, stop_event, cancel_event, deadline, sent):
+    """
+    1つのセレクタを問い合わせ、(クエリ名, DKIMレコード or None, 問い合わせに失敗したか) を返す。
+    他のワーカーが既にレコードを見つけているか、キャンセル済みか、持ち時間を使い切っていれば問い合わせずに戻る。
+    実際に問い合わせたセレクタは sent に加える。
+    """
+    query_domain = f'{selector}._domainkey.{domain}'
+    if stop_event.is_set() or (cancel_event is not None and cancel_event.is_set()) or deadline.expired():
+        return query_domain, None, False
+    sent.append(selector)
+    try:
+        answers = dns_resolver.resolve(query_domain, 'TXT', deadline=deadline)
+        for rdata in answers:
+            if 'v=dkim1' in rdata.to_text().lower():
+                return query_domain, rdata.to_text().strip('"'), False
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+        pass # 見つからないのは正常
+    except Exception as e:
+        print(f"Query Error for {query_domain}: {e}")
+        return query_domain, None, True
+    return query_domain, None, False
+
+def find_dkim_record(domain, dkim_selector="", progress_callback=None,
+                     max_workers=DEFAULT_MAX_WORKERS, cancel_event=None, adaptive=True, deadline=None):
+    """
+    DKIMレコードを検索する。
+    セレクタ候補は最大 max_workers 件ずつ並行して問い合わせ、最初に見つかった時点で
+    残りの問い合わせを打ち切る。cancel_event がセットされた場合や、
+    持ち時間 deadline (省略時は net_policy の 'dkim' の値) を使い切った場合も途中で終了する。
+    キャンセル・時間切れ・問い合わせの失敗で全候補を確かめられなかった場合は failed: True を付ける
+    (「DKIMレコードが無い」とは区別する)。
+    adaptive なら、MXのプロバイダごとに過去よく当たったセレクタから順に問い合わせる。
     """
     dkim_data = {'records': []}
-    
+    provider = None
+    deadline = net_policy.resolve_deadline(deadline, 'dkim')
+
     if dkim_selector:
         selectors_to_check = [dkim_selector]
+        file_order = selectors_to_check
     else:
-        selectors_to_check = _load_dkim_selectors()
-    
+        file_order = _load_dkim_selectors()
+        selectors_to_check = file_order
+        if adaptive and file_order:
+            provider = detect_mx_provider(domain, deadline)
+            selectors_to_check = order_selectors(file_order, provider)
+
     checked_selectors_list = list(selectors_to_check)
     total_selectors = len(selectors_to_check)
     if not selectors_to_check:
         dkim_data['status'] = "確認するDKIMセレクタがありませんでした。"
         return dkim_data, []
 
-    resolver = dns.resolver.Resolver()
-    
-    # 一つずつ順番に問い合わせる
-    for i, selector in enumerate(selectors_to_check):
-        query_domain = f'{selector}._domainkey.{domain}'
-        try:
-            answers = resolver.resolve(query_domain, 'TXT')
-            for rdata in answers:
-                if 'v=dkim1' in rdata.to_text().lower():
-                    dkim_data['query'] = query_domain
-                    dkim_data['records'] = [rdata.to_text().strip('"')]
-                    print("INFO: Record found. Stopping further checks.")
-                    # 見つかった時点で終了
-                    if progress_callback:
-                        progress_callback(i + 1, total_selectors)
-                    return dkim_data, checked_selectors_list
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
-            pass # 見つからないのは正常
-        except Exception as e:
-            print(f"Query Error for {query_domain}: {e}")
+    stop_event = threading.Event()
+    sent = []
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total_selectors)))
+
+    try:
+        futures = {
+            executor.submit(_query_selector, domain, selector, stop_event, cancel_event, deadline, sent): selector
+            for selector in selectors_to_check
+        }
+        done = 0
+        query_failed = False
+        for future in as_completed(futures):
+            done += 1
+            query_domain, record, failed = future.result()
+            query_failed = query_failed or failed
+            if progress_callback:
+                progress_callback(done, total_selectors)
 
-        if progress_callback:
-            progress_callback(i + 1, total_selectors)
+            if record:
+                dkim_data['query'] = query_domain
+                dkim_data['records'] = [record]
+                print("INFO: Record found. Stopping further checks.")
+                if not dkim_selector:
+                    selector = futures[future]
+                    dkim_data['probes_to_hit'] = selectors_to_check.index(selector) + 1
+                    dkim_data['probes_sent'] = len(sent)
+                    record_hit(selector, provider, len(sent), dkim_data['probes_to_hit'], file_order.index(selector) + 1)
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                print("INFO: DKIM check cancelled.")
+                dkim_data.update(status="DKIMの確認はキャンセルされました。", failed=True)
+                break
+    finally:
+        # 見つかった/キャンセルされた時点で、未着手の問い合わせは破棄する
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    if not dkim_data.get('records'):
-        dkim_data['status'] = "セレクタ候補ではDKIMレコードが見つかりませんでした。"
+    if not dkim_data.get('records') and 'status' not in dkim_data:
+        if deadline.expired():
+            dkim_data.update(status=f"{deadline.seconds}秒以内にDKIMレコードが見つかりませんでした (時間切れ)。", failed=True)
+        elif query_failed:
+            dkim_data.update(status="問い合わせに失敗したセレクタがあるため、DKIMレコードを確認しきれませんでした。", failed=True)
+        else:
+            dkim_data['status'] = "セレクタ候補ではDKIMレコードが見つかりませんでした。"
 
     return dkim_data, checked_selectors_list
@@ -1,67 +1,244 @@
 # checkers/dns_checker.py
-import dns.resolver
+import json
 import socket
+import time
+import dns.resolver
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+
+from checkers import app_paths, dns_resolver, net_policy
+from checkers.models import DnsRecord, DnsRecordSet, HostAddress
 
-def _get_ip_string(hostname, resolver):
+# レコード種別とグルー解決を同時に投げるワーカー数
+_MAX_WORKERS = 16
+# nslookup で問い合わせるレコード種別 (結果もこの順に並べる)
+RECORD_TYPES = ['A', 'AAAA', 'CNAME', 'MX', 'NS', 'TXT', 'SOA', 'CAA', 'DS', 'DNSKEY']
+
+def _get_addresses(hostname, glue_futures, deadline):
     """
-    指定されたホスト名のAおよびAAAAレコードを解決し、改行された文字列を返す。
-    ★変更: 各IPの前に目印を追加。
+    指定されたホスト名のAおよびAAAAレコードの解決結果を HostAddress のリストで返す。
+    問い合わせ自体は nslookup 側で並行して投げておき、ここでは結果を待つだけ。
+    """
+    addresses = []
+
+    for r_type in ('A', 'AAAA'):
+        future = glue_futures.get((hostname, r_type))
+        if future is None:
+            continue
+        try:
+            answers = future.result(timeout=deadline.remaining())
+            for rdata in answers:
+                addresses.append(HostAddress(r_type, rdata.to_text()))
+        except Exception:
+            pass
+
+    return addresses
+
+def _glue_targets(r_type, answers):
+    """CNAME/MX/NSの応答から、A/AAAAを引く必要のあるホスト名を取り出す"""
+    if r_type == 'MX':
+        return [rdata.exchange.to_text().strip('.') for rdata in answers]
+    if r_type in ('CNAME', 'NS'):
+        return [rdata.target.to_text().strip('.') for rdata in answers]
+    return []
+
+def nslookup(domain, server, timeout=None, record_types=None):
+    """
+    全レコード種別の問い合わせを同時に投げ、CNAME/MX/NSの応答が届き次第
+    そのホスト名のA/AAAAも並行して解決する。結果は record_types の順に並べた DnsRecordSet のリスト。
+    timeout は1回の nslookup 全体の持ち時間(秒) で、省略時は net_policy の 'nslookup' の値。record_types を渡すとその種別だけを問い合わせる。
+    NXDOMAIN/NoAnswer の場合は records が空で、ttl に否定応答をキャッシュしてよい秒数が入る。
     """
-    ips = []
-    
-    # Aレコード (IPv4)
-    try:
-        a_answers = resolver.resolve(hostname, 'A')
-        for rdata in a_answers:
-            ips.append(f"A: [IP]{rdata}") # ★変更
-    except Exception:
-        pass
-        
-    # AAAAレコード (IPv6)
-    try:
-        aaaa_answers = resolver.resolve(hostname, 'AAAA')
-        for rdata in aaaa_answers:
-            ips.append(f"AAAA: [IP]{rdata}") # ★変更
-    except Exception:
-        pass
-    
-    if ips:
-        return "\n    -> " + "\n    -> ".join(ips)
-    return ""
-
-def nslookup(domain, server):
     if not domain: return {'error': "ドメイン名を入力してください。"}
     results = []
-    resolver = dns.resolver.Resolver()
+    server_ip = None
     if server:
         try:
             server_ip = socket.gethostbyname(server)
-            resolver.nameservers = [server_ip]
         except Exception as e: return {'error': f"DNSサーバー '{server}' を解決できませんでした: {e}"}
-    
-    record_types = ['A', 'AAAA', 'CNAME', 'MX', 'NS', 'TXT', 'SOA', 'CAA', 'DS', 'DNSKEY']
-    for r_type in record_types:
-        record_data = {'type': r_type, 'records': []}
+    deadline = net_policy.resolve_deadline(timeout, 'nslookup')
+
+    record_types = record_types or RECORD_TYPES
+    executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+    try:
+        type_futures = {
+            executor.submit(dns_resolver.resolve, domain, r_type, server_ip, deadline=deadline): r_type
+            for r_type in record_types
+        }
+        answers_by_type = {}
+        glue_futures = {}
+
         try:
-            answers = resolver.resolve(domain, r_type)
-            for rdata in answers:
-                if r_type == 'A' or r_type == 'AAAA':
-                    record_data['records'].append(f"[IP]{rdata}") # ★変更
-                elif r_type == 'CNAME':
-                    target = rdata.target.to_text().strip('.')
-                    ip_string = _get_ip_string(target, resolver)
-                    record_data['records'].append(f"{target}{ip_string}")
-                elif r_type == 'MX':
-                    target = rdata.exchange.to_text().strip('.')
-                    ip_string = _get_ip_string(target, resolver)
-                    record_data['records'].append(f"{rdata.preference} {target}{ip_string}")
-                elif r_type == 'NS':
-                    target = rdata.target.to_text().strip('.')
-                    ip_string = _get_ip_string(target, resolver)
-                    record_data['records'].append(f"{target}{ip_string}")
+            for future in as_completed(type_futures, timeout=deadline.remaining()):
+                r_type = type_futures[future]
+                try:
+                    answers = future.result()
+                except Exception as e:
+                    answers_by_type[r_type] = e
+                    continue
+                answers_by_type[r_type] = answers
+                # グルーは同じホスト名を何度も引かないようにまとめて投げる
+                for target in _glue_targets(r_type, answers):
+                    for glue_type in ('A', 'AAAA'):
+                        key = (target, glue_type)
+                        if key not in glue_futures:
+                            glue_futures[key] = executor.submit(dns_resolver.resolve, target, glue_type, server_ip, deadline=deadline)
+        except FutureTimeoutError:
+            pass # 間に合わなかった種別はタイムアウトとして扱う
+
+        for r_type in record_types:
+            record_set = DnsRecordSet(r_type)
+            answers = answers_by_type.get(r_type)
+            if answers is None:
+                record_set.status = f"クエリ失敗: {deadline.seconds}秒以内に応答がありませんでした。"
+                record_set.failed = True
+            elif isinstance(answers, Exception):
+                record_set.status = f"クエリ失敗: {answers}"
+                if isinstance(answers, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+                    record_set.ttl = dns_resolver.negative_ttl(answers)
                 else:
-                    record_data['records'].append(str(rdata))
-        except Exception as e:
-            record_data['status'] = f"クエリ失敗: {e}"
-        results.append(record_data)
+                    record_set.failed = True
+            else:
+                record_set.ttl = answers.rrset.ttl
+                for rdata in answers:
+                    if r_type == 'MX':
+                        target = rdata.exchange.to_text().strip('.')
+                        record_set.records.append(DnsRecord(
+                            f"{rdata.preference} {target}", target, rdata.preference,
+                            _get_addresses(target, glue_futures, deadline)))
+                    elif r_type in ('CNAME', 'NS'):
+                        target = rdata.target.to_text().strip('.')
+                        record_set.records.append(DnsRecord(
+                            target, target, addresses=_get_addresses(target, glue_futures, deadline)))
+                    else:
+                        record_set.records.append(DnsRecord(rdata.to_text()))
+            results.append(record_set)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     return results
+
+# --- 浸透確認 ---
+
+# 浸透確認で比較するレコード種別
+PROPAGATION_RECORD_TYPES = ['A', 'AAAA', 'CNAME', 'MX', 'NS', 'TXT']
+_MAX_PROPAGATION_WORKERS = 32
+# configure() で差し替えた浸透確認のDNSサーバー (None なら dns_servers.json)
+_propagation_servers = None
+
+def configure(propagation_servers=None):
+    """
+    浸透確認で問い合わせるDNSサーバー ({'name', 'ip'[, 'port', 'group']} のリスト) を差し替える。
+    None なら dns_servers.json に戻す。ローカルのテスト用のサーバーに向ける場合に使う。
+    """
+    global _propagation_servers
+    _propagation_servers = list(propagation_servers) if propagation_servers else None
+
+def load_dns_servers(filename='dns_servers.json'):
+    """dns_servers.json の public / authoritative を {'name', 'ip', 'group'} のリストにして返す"""
+    file_path = app_paths.get_resource_path('web', 'dns', filename)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    servers = []
+    for group in ('public', 'authoritative'):
+        for server in data.get(group, []):
+            if server.get('ip'):
+                servers.append({'name': server.get('name', server['ip']), 'ip': server['ip'], 'group': group})
+    return servers
+
+def _rdata_values(r_type, answers):
+    """比較しやすいよう、応答を正規化した文字列のソート済みリストにする"""
+    if r_type == 'MX':
+        values = [f"{rdata.preference} {rdata.exchange.to_text().lower()}" for rdata in answers]
+    elif r_type in ('CNAME', 'NS'):
+        values = [rdata.target.to_text().lower() for rdata in answers]
+    else:
+        values = [rdata.to_text() for rdata in answers]
+    return sorted(values)
+
+def _query_server(domain, r_type, server_ip, port, deadline):
+    """1台のサーバーに1種別を問い合わせ、値・TTL・応答時間を返す (キャッシュは使わない)"""
+    started = time.perf_counter()
+    entry = {'values': [], 'ttl': None, 'latency_ms': None, 'status': 'ok'}
+    try:
+        answers = dns_resolver.resolve(domain, r_type, server_ip, port=port, use_cache=False, deadline=deadline)
+        entry['values'] = _rdata_values(r_type, answers)
+        entry['ttl'] = answers.rrset.ttl
+    except dns.resolver.NXDOMAIN:
+        entry['status'] = 'NXDOMAIN'
+    except dns.resolver.NoAnswer:
+        entry['status'] = 'NOANSWER'
+    except Exception as e:
+        entry['status'] = 'error'
+        entry['error'] = f"{type(e).__name__}: {e}"
+        return entry
+    entry['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return entry
+
+def _compare_answers(servers, r_type):
+    """サーバーごとの応答をグループ分けし、食い違いがあるかを判定する。応答のなかったサーバーは比較から外す。"""
+    variants = {}
+    for server in servers:
+        entry = server.get('records', {}).get(r_type)
+        if entry is None or entry['status'] == 'error':
+            continue
+        key = (entry['status'], tuple(entry['values']))
+        variant = variants.setdefault(key, {'status': entry['status'], 'values': entry['values'], 'servers': []})
+        variant['servers'].append(server['name'])
+    # 多数派を先頭に並べる
+    ordered = sorted(variants.values(), key=lambda v: -len(v['servers']))
+    return {'consistent': len(ordered) <= 1, 'variants': ordered}
+
+def check_propagation(domain, record_types=None, servers=None, timeout=None):
+    """
+    同じレコードを全DNSサーバーへ同時に問い合わせ、サーバーごとの値・TTL・応答時間と
+    サーバー間の食い違いを返す。servers は {'name', 'ip'[, 'port']} のリストで、省略時は configure() の設定か dns_servers.json。
+    全体の所要時間は、最も遅いサーバー1台分 (最大 timeout 秒、省略時は net_policy の 'propagation' の値) になる。
+    """
+    if not domain: return {'error': "ドメイン名を入力してください。"}
+    record_types = record_types or PROPAGATION_RECORD_TYPES
+    if servers is None:
+        servers = _propagation_servers
+    if servers is None:
+        try:
+            servers = load_dns_servers()
+        except Exception as e:
+            return {'error': f"dns_servers.jsonが読み込めませんでした: {e}"}
+    servers = [dict(server, records={}) for server in servers]
+
+    started = time.perf_counter()
+    deadline = net_policy.resolve_deadline(timeout, 'propagation')
+    executor = ThreadPoolExecutor(max_workers=_MAX_PROPAGATION_WORKERS)
+    try:
+        # ホスト名で書かれたサーバー (権威DNSなど) のIPも並行して引く
+        ip_futures = {i: executor.submit(socket.gethostbyname, server['ip']) for i, server in enumerate(servers)}
+        query_futures = {}
+        for i, server in enumerate(servers):
+            try:
+                server['address'] = ip_futures[i].result(timeout=deadline.remaining())
+            except Exception as e:
+                server['error'] = f"DNSサーバー '{server['ip']}' を解決できませんでした: {e}"
+                continue
+            for r_type in record_types:
+                future = executor.submit(_query_server, domain, r_type, server['address'], server.get('port', 53), deadline)
+                query_futures[future] = (server, r_type)
+
+        try:
+            for future in as_completed(query_futures, timeout=deadline.remaining() + 1):
+                server, r_type = query_futures[future]
+                server['records'][r_type] = future.result()
+        except FutureTimeoutError:
+            pass
+        for server, r_type in query_futures.values():
+            server['records'].setdefault(r_type, {'values': [], 'ttl': None, 'latency_ms': None,
+                                                  'status': 'error', 'error': 'タイムアウト'})
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    consistency = {r_type: _compare_answers(servers, r_type) for r_type in record_types}
+    return {
+        'domain': domain,
+        'record_types': record_types,
+        'servers': servers,
+        'consistency': consistency,
+        'propagated': all(c['consistent'] for c in consistency.values()),
+        'elapsed': round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,211 @@
+# checkers/dns_resolver.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import dns.flags
+import dns.resolver
+
+from checkers import metrics, net_policy
+from checkers.ttl_cache import TTLCache
+
+# 全チェッカーで共有するDNS応答キャッシュの上限件数
+CACHE_MAX_SIZE = 4096
+# SOAが付いていない否定応答をキャッシュする秒数と、否定応答キャッシュの上限秒数
+NEGATIVE_TTL_DEFAULT = 60
+NEGATIVE_TTL_MAX = 900
+
+_cache = TTLCache(CACHE_MAX_SIZE)
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+_MISS = object()
+# nameserver/port を指定しなかった問い合わせの送り先 (None ならOSの設定)
+_default_nameserver = None
+_default_port = 53
+# OSの設定にネームサーバーが複数あるとき、ヘッジの問い合わせを投げるワーカー
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='dns-hedge')
+
+def configure(nameserver=None, port=53):
+    """
+    nameserver/port を指定しない問い合わせの送り先を変える (ベンチマークでローカルのDNSへ向ける場合など)。
+    port は nameserver を指定した問い合わせにも使われる。キャッシュは破棄する。
+    """
+    global _default_nameserver, _default_port
+    with _resolvers_lock:
+        _default_nameserver, _default_port = nameserver, port
+        _resolvers.clear()
+    _cache.clear()
+
+def get_resolver(nameserver=None, port=None, dnssec=False):
+    """
+    ネームサーバーごとに共有の Resolver を返す。1回の送信の待ち時間は net_policy.DNS_ATTEMPT_TIMEOUT で、
+    lifetime の間は応答がなければ送り直す。
+    nameserver が None なら configure() の設定 (既定はOSの設定) を使う。返した Resolver の設定は変更しないこと。
+    dnssec なら DO ビットを立てて RRSIG も受け取り、CD ビットでリゾルバ側の検証を止める
+    (検証に失敗するドメインでも SERVFAIL にならず、どこで切れているかを自分で調べられる)。
+    """
+    nameserver = nameserver or _default_nameserver
+    port = port or _default_port
+    key = (nameserver, port, dnssec)
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            resolver = dns.resolver.Resolver()
+            if nameserver:
+                resolver.nameservers = [nameserver]
+            resolver.port = port
+            resolver.timeout = net_policy.DNS_ATTEMPT_TIMEOUT
+            if dnssec:
+                resolver.use_edns(0, dns.flags.DO, 1232)
+                resolver.flags = dns.flags.RD | dns.flags.CD
+            _resolvers[key] = resolver
+        return resolver
+
+def negative_ttl(e):
+    """否定応答のSOAからキャッシュしてよい秒数を求める (RFC 2308)"""
+    if isinstance(e, dns.resolver.NXDOMAIN):
+        responses = list(e.responses().values())
+    else:
+        responses = [e.kwargs.get('response')]
+    for response in responses:
+        if response is None:
+            continue
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA and len(rrset):
+                return min(rrset.ttl, rrset[0].minimum, NEGATIVE_TTL_MAX)
+    return NEGATIVE_TTL_DEFAULT
+
+def _system_nameservers():
+    """OSの設定のネームサーバー。読めなければ [None] (dnspython に任せる)"""
+    try:
+        nameservers = [ns for ns in dns.resolver.get_default_resolver().nameservers if isinstance(ns, str)]
+    except Exception:
+        nameservers = []
+    return nameservers or [None]
+
+def _record_failure(name, rdtype, nameserver, e, seconds):
+    """タイムアウト・SERVFAIL などの失敗を計測に記録する。タイムアウトは送った回数も残す。"""
+    if isinstance(e, dns.resolver.LifetimeTimeout):
+        metrics.record_dns_query(name, rdtype, nameserver, 'TIMEOUT', seconds,
+                                 attempts=max(1, len(e.kwargs.get('errors') or [])))
+    else:
+        metrics.record_dns_query(name, rdtype, nameserver, type(e).__name__, seconds)
+
+def _breaker_key(nameserver, port):
+    """サーキットブレーカーと応答時間の記録に使うキー ('dns:<IP>'、53以外のポートなら 'dns:<IP>:<ポート>')"""
+    port = port or _default_port
+    return f"dns:{nameserver or 'system'}" + (f":{port}" if port != 53 else '')
+
+def _query(name, rdtype, nameserver, port, lifetime, dnssec=False):
+    """
+    1台のネームサーバーに問い合わせる。応答時間はヘッジの待ち時間の計算に、
+    成否はサーキットブレーカーに記録する (NXDOMAIN/NoAnswer も応答があったので成功)。
+    """
+    breaker_key = _breaker_key(nameserver, port)
+    net_policy.breaker.check(breaker_key)
+    resolver = get_resolver(nameserver, port, dnssec)
+    started = time.perf_counter()
+    try:
+        answer = resolver.resolve(name, rdtype, lifetime=lifetime)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        seconds = time.perf_counter() - started
+        net_policy.breaker.record_success(breaker_key)
+        net_policy.record_latency(breaker_key, seconds)
+        rcode = 'NXDOMAIN' if isinstance(e, dns.resolver.NXDOMAIN) else 'NOANSWER'
+        metrics.record_dns_query(name, rdtype, nameserver, rcode, seconds)
+        raise
+    except Exception as e:
+        net_policy.breaker.record_failure(breaker_key)
+        _record_failure(name, rdtype, nameserver, e, time.perf_counter() - started)
+        raise
+    seconds = time.perf_counter() - started
+    net_policy.breaker.record_success(breaker_key)
+    net_policy.record_latency(breaker_key, seconds)
+    metrics.record_dns_query(name, rdtype, nameserver, 'NOERROR', seconds)
+    return answer
+
+def _query_hedged(name, rdtype, nameservers, port, lifetime, dnssec=False):
+    """
+    先頭のネームサーバーに問い合わせ、そのサーバーの応答時間の p95 (net_policy.hedge_delay) を過ぎても
+    応答がないか失敗した場合は、次のネームサーバーにも同じ問い合わせを投げ、最初に届いた応答を使う。
+    """
+    deadline = net_policy.Deadline(lifetime)
+    waiting = list(nameservers)
+    futures = {}
+    last_error = None
+
+    def launch():
+        server = waiting.pop(0)
+        futures[_hedge_executor.submit(_query, name, rdtype, server, port, deadline.remaining(), dnssec)] = server
+        return server
+
+    current = launch()
+    while futures:
+        timeout = deadline.remaining()
+        if waiting:
+            timeout = min(timeout, net_policy.hedge_delay(_breaker_key(current, port)))
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            del futures[future]
+            try:
+                return future.result()
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                raise
+            except Exception as e:
+                last_error = e
+        if deadline.expired():
+            break
+        if waiting:
+            if not done:
+                metrics.increment('dns_hedged_total', server=current)
+            current = launch()
+    if futures or last_error is None:
+        raise dns.resolver.LifetimeTimeout(timeout=lifetime, errors=[])
+    raise last_error
+
+def resolve(name, rdtype, nameserver=None, port=None, lifetime=None, use_cache=True, deadline=None, dnssec=False):
+    """
+    (名前, レコード種別, ネームサーバー) 単位でキャッシュしつつ問い合わせる。
+    応答はレコードのTTLまで、NXDOMAIN/NoAnswer は否定応答としてSOAのTTLまで保持し、
+    キャッシュから返す場合も dns.resolver と同じ例外を送出する。
+    lifetime は再送・ヘッジを含めた上限 (既定は net_policy.DNS_LIFETIME)。deadline を渡すとその残り時間も上限にする。
+    nameserver を指定せず、OSの設定にネームサーバーが複数あるときは応答の遅いサーバーを待たずにヘッジする。
+    dnssec なら RRSIG 付きで問い合わせる (応答の response から取り出す。get_resolver を参照)。
+    """
+    rdtype = str(rdtype).upper()
+    key = (str(name).lower().rstrip('.'), rdtype, nameserver, port, dnssec)
+    if use_cache:
+        cached = _cache.get(key, _MISS)
+        if cached is not _MISS:
+            metrics.increment('dns_cache_hits_total')
+            if isinstance(cached, tuple):
+                exc_class, kwargs = cached
+                raise exc_class(**kwargs)
+            return cached
+
+    lifetime = lifetime or net_policy.DNS_LIFETIME
+    if deadline is not None:
+        lifetime = deadline.timeout(lifetime)
+    nameserver = nameserver or _default_nameserver
+    nameservers = [nameserver] if nameserver else _system_nameservers()
+    try:
+        if len(nameservers) == 1:
+            answer = _query(name, rdtype, nameservers[0], port, lifetime, dnssec)
+        else:
+            # 応答の速いサーバーから先に問い合わせる (サンプルが少ないうちはOSの設定順)
+            nameservers.sort(key=lambda ns: net_policy.hedge_delay(_breaker_key(ns, port)))
+            answer = _query_hedged(name, rdtype, nameservers, port, lifetime, dnssec)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        if use_cache:
+            _cache.put(key, (type(e), e.kwargs), negative_ttl(e))
+        raise
+
+    if use_cache:
+        _cache.put(key, answer, answer.expiration - time.time())
+    return answer
+
+def get_cache_stats():
+    """キャッシュのヒット/ミス数などを返す"""
+    return _cache.stats()
+
+def clear_cache():
+    _cache.clear()
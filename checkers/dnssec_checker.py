@@ -0,0 +1,372 @@
+# checkers/dnssec_checker.py
+"""
+DNSSECの信頼の連鎖の検証。
+ルートのトラストアンカーから対象のドメインまで、各ゾーンについて
+親ゾーンのDS (親の鍵で署名) → DSに一致するDNSKEY (その鍵で自己署名) → ゾーンのSOAの署名 を順に確かめ、
+どのゾーンで連鎖が切れているかを返す。
+
+- DS/DNSKEY/SOA の問い合わせは全ゾーン分を同時に投げる。
+- 検証済みの途中のゾーン (ルート、jp. など) の鍵は、TTLと署名の有効期限の早い方まで覚えておくので、
+  同じTLDの2件目以降のドメインは、そのドメイン自身の分しか問い合わせない。
+- DSが無いゾーンは、親ゾーンが署名した NSEC/NSEC3 でDSが無いことを確かめられたときだけ insecure にする。
+  否定応答に証明が付いていなければ unproven-insecure、証明の署名や内容がおかしければ bogus。
+"""
+import base64
+import socket
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError, ThreadPoolExecutor
+
+import dns.dnssec
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+
+from checkers import dns_resolver, net_policy
+from checkers.models import DnssecLink, DnssecResult
+from checkers.ttl_cache import TTLCache
+
+# ルートゾーンのトラストアンカー (IANA が公開している KSK-2017 と KSK-2024 のDS)
+ROOT_TRUST_ANCHORS = [
+    '20326 8 2 E06D44B80B8F1D39A95C0B0D7C65D08458E880409BBC683457104237C7F8EC8D',
+    '38696 8 2 683D2D0ACB8C9B712A1948B27F741219298D0A450D612C483AF444A4C0FB2B16',
+]
+# 検証済みのゾーンを覚えておく件数
+KEY_CACHE_MAX_SIZE = 1024
+_MAX_WORKERS = 32
+
+# configure() で差し替えたトラストアンカー (None なら ROOT_TRUST_ANCHORS)
+_trust_anchors = None
+# (名前, ネームサーバー, ポート, トラストアンカー) → その名前までたどった連鎖の状態 (_ChainState)
+_chain_cache = TTLCache(KEY_CACHE_MAX_SIZE)
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix='dnssec')
+# NSEC3 のハッシュ (base32hex) と比べるため、rdata.next (バイト列) の base32 を base32hex に直す表
+_B32_TO_B32HEX = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ234567', '0123456789ABCDEFGHIJKLMNOPQRSTUV')
+
+class _ChainState:
+    """ある名前までたどった連鎖。keys はその名前を含むゾーンの検証済みのDNSKEY (insecure なら None)。"""
+    __slots__ = ('zone', 'keys', 'links', 'expires_at')
+
+    def __init__(self, zone, keys, links, expires_at):
+        self.zone = zone
+        self.keys = keys
+        self.links = links
+        self.expires_at = expires_at
+
+def configure(trust_anchors=None):
+    """
+    トラストアンカー (ルートのDSを 'タグ アルゴリズム ダイジェスト種別 ダイジェスト' の文字列で) を差し替える。
+    None ならルートの公開鍵に戻す。ローカルで署名したテスト用のゾーンを検証する場合に使う。キャッシュは破棄する。
+    """
+    global _trust_anchors
+    _trust_anchors = list(trust_anchors) if trust_anchors else None
+    _chain_cache.clear()
+
+def get_cache_stats():
+    return _chain_cache.stats()
+
+def clear_cache():
+    _chain_cache.clear()
+
+def _ancestors(domain):
+    """'www.example.jp' → [., jp., example.jp., www.example.jp.] (dns.name.Name)"""
+    name = dns.name.from_text(domain)
+    names = [name]
+    while name != dns.name.root:
+        name = name.parent()
+        names.append(name)
+    return names[::-1]
+
+def _fetch(name, rdtype, nameserver, port, deadline):
+    """RRSIG付きで問い合わせ、(rrset, rrsigの rrset, 応答の有効期限) を返す"""
+    answer = dns_resolver.resolve(name.to_text(), rdtype, nameserver, port, deadline=deadline, dnssec=True)
+    rrset = answer.rrset
+    rrsigs = answer.response.get_rrset(answer.response.answer, rrset.name, rrset.rdclass,
+                                       dns.rdatatype.RRSIG, rrset.rdtype)
+    return rrset, rrsigs, answer.expiration
+
+def _result(future, deadline):
+    """問い合わせの結果。失敗なら例外をそのまま返す (NoAnswer/NXDOMAIN は「無い」の意味で使う)。"""
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        return net_policy.DeadlineExceeded(f"{deadline.seconds}秒以内に応答がありませんでした。")
+    except Exception as e:
+        return e
+
+def _absent(result):
+    return isinstance(result, (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN))
+
+def _describe_ds(rdata):
+    return f"{rdata.key_tag} {dns.dnssec.algorithm_to_text(rdata.algorithm)} digest={rdata.digest_type}"
+
+def _describe_key(rdata):
+    role = 'KSK' if rdata.flags & 0x0001 else 'ZSK'
+    return f"{dns.dnssec.key_id(rdata)} {role} {dns.dnssec.algorithm_to_text(rdata.algorithm)}"
+
+def _signature_expiration(rrsigs):
+    """署名の有効期限のうち最も早いもの"""
+    return min((rdata.expiration for rdata in rrsigs), default=float('inf')) if rrsigs else float('inf')
+
+def _verify(rrset, rrsigs, keys, what):
+    """rrset の署名を keys ({ゾーン名: DNSKEYの rrset}) で検証する。失敗なら理由を返す。"""
+    if not rrsigs:
+        return f"{what}に署名 (RRSIG) がありません。"
+    try:
+        dns.dnssec.validate(rrset, rrsigs, keys)
+    except (dns.dnssec.ValidationFailure, dns.dnssec.UnsupportedAlgorithm) as e:
+        return f"{what}の署名を検証できません: {e}"
+    return None
+
+def _types(rdata):
+    """NSEC/NSEC3 のタイプビットマップにあるレコード種別の集合"""
+    fields = rdata.to_text().split()
+    return set(fields[1:] if rdata.rdtype == dns.rdatatype.NSEC else fields[5:])
+
+def _covers(owner, target, next_name):
+    """正規順序で owner < target < next_name (末尾から先頭に戻る最後のレコードも含む)"""
+    if owner < next_name:
+        return owner < target < next_name
+    return target > owner or target < next_name
+
+def _negative_response(absent, name):
+    """NoAnswer/NXDOMAIN の元になった応答"""
+    try:
+        if isinstance(absent, dns.resolver.NXDOMAIN):
+            return next(iter(absent.responses().values()), None)
+        return absent.response()
+    except Exception:
+        return None
+
+def _ds_denial(name, absent, parent):
+    """
+    DSの否定応答に付いた NSEC/NSEC3 で、親ゾーン parent に name のDSが無いことを確かめる。
+    (状態, 説明) を返す。状態は insecure (証明できた) / unproven-insecure (証明が無い) / bogus (証明が不正)。
+    """
+    response = _negative_response(absent, name)
+    if response is None:
+        return 'unproven-insecure', "否定応答の内容を確認できません。"
+    keys = {parent.zone: parent.keys}
+    proofs = []
+    for rrset in response.authority:
+        if rrset.rdtype not in (dns.rdatatype.NSEC, dns.rdatatype.NSEC3):
+            continue
+        rrsigs = response.get_rrset(response.authority, rrset.name, rrset.rdclass, dns.rdatatype.RRSIG, rrset.rdtype)
+        proofs.append((rrset, rrsigs))
+    if not proofs:
+        return 'unproven-insecure', "DSが無いことの証明 (NSEC/NSEC3) が応答に付いていません。"
+
+    for rrset, rrsigs in proofs:
+        rdata = rrset[0]
+        if rrset.rdtype == dns.rdatatype.NSEC:
+            if rrset.name == name:
+                matched, covered = True, False
+            else:
+                matched, covered = False, _covers(rrset.name, name, rdata.next)
+        else:
+            hashed = dns.dnssec.nsec3_hash(name, rdata.salt, rdata.iterations, rdata.algorithm)
+            owner = rrset.name.labels[0].decode().upper()
+            next_hash = base64.b32encode(rdata.next).decode().translate(_B32_TO_B32HEX)
+            matched = owner == hashed
+            # opt-out の NSEC3 に覆われる名前は、署名されていない委任の可能性がある
+            covered = not matched and bool(rdata.flags & 0x01) and _covers(owner, hashed, next_hash)
+        if not (matched or covered):
+            continue
+        kind = dns.rdatatype.to_text(rrset.rdtype)
+        error = _verify(rrset, rrsigs, keys, f"親ゾーン ({parent.zone}) の{kind}")
+        if error:
+            return 'bogus', error
+        if matched and 'DS' in _types(rdata):
+            return 'bogus', f"{kind}ではDSがあることになっていますが、DSを取得できません。"
+        if matched and 'SOA' in _types(rdata):
+            return 'bogus', f"{kind}が親ゾーンではなく子ゾーンのものです。"
+        how = "opt-out の NSEC3" if rrset.rdtype == dns.rdatatype.NSEC3 and covered else kind
+        return 'insecure', f"{how}でDSが無いことを確かめました。"
+    return 'bogus', "応答の NSEC/NSEC3 は、DSが無いことを証明していません。"
+
+def _matching_keys(name, ds_rdatas, dnskey_rrset):
+    """DSのどれかに一致するDNSKEYの一覧"""
+    matching = []
+    for key in dnskey_rrset:
+        key_tag = dns.dnssec.key_id(key)
+        for ds in ds_rdatas:
+            if ds.key_tag != key_tag or ds.algorithm != key.algorithm:
+                continue
+            try:
+                if dns.dnssec.make_ds(name, key, ds.digest_type) == ds:
+                    matching.append(key)
+                    break
+            except dns.dnssec.UnsupportedAlgorithm:
+                continue
+    return matching
+
+def _check_zone(name, parent, ds_rdatas, ds_result, dnskey_result, soa_result):
+    """
+    1つのゾーンを検証し、(DnssecLink, 検証済みのDNSKEY または None, 有効期限) を返す。
+    ds_rdatas はルートならトラストアンカー、それ以外は親ゾーンのDS (ds_result に署名も入っている)。
+    """
+    link = DnssecLink(name.to_text())
+    expires_at = float('inf')
+    if ds_result is not None:
+        ds_rrset, ds_rrsigs, ds_expires = ds_result
+        error = _verify(ds_rrset, ds_rrsigs, {parent.zone: parent.keys}, f"親ゾーン ({parent.zone}) のDS")
+        if error:
+            link.status, link.detail = 'bogus', error
+            return link, None, expires_at
+        expires_at = min(ds_expires, _signature_expiration(ds_rrsigs))
+    link.ds = [_describe_ds(rdata) for rdata in ds_rdatas]
+
+    if isinstance(dnskey_result, Exception):
+        link.status = 'bogus'
+        link.detail = f"DSはありますが、DNSKEYを取得できません: {dnskey_result}"
+        return link, None, expires_at
+    dnskey_rrset, dnskey_rrsigs, dnskey_expires = dnskey_result
+    link.dnskey = [_describe_key(rdata) for rdata in dnskey_rrset]
+    matching = _matching_keys(name, ds_rdatas, dnskey_rrset)
+    if not matching:
+        link.status = 'bogus'
+        link.detail = "DSに一致するDNSKEYがありません (鍵の入れ替え後にDSを更新していない可能性があります)。"
+        return link, None, expires_at
+    # DNSKEY はDSに一致する鍵 (KSK) で署名されている必要がある
+    trusted = dns.rrset.from_rdata_list(name, dnskey_rrset.ttl, matching)
+    error = _verify(dnskey_rrset, dnskey_rrsigs, {name: trusted}, 'DNSKEY')
+    if error:
+        link.status, link.detail = 'bogus', error
+        return link, None, expires_at
+    expires_at = min(expires_at, dnskey_expires, _signature_expiration(dnskey_rrsigs))
+
+    # ゾーンのデータがその鍵で署名されていることを SOA で確かめる
+    if isinstance(soa_result, Exception):
+        link.status = 'error'
+        link.detail = f"SOAを取得できません: {soa_result}"
+        return link, None, expires_at
+    soa_rrset, soa_rrsigs, soa_expires = soa_result
+    error = _verify(soa_rrset, soa_rrsigs, {name: dnskey_rrset}, 'SOA')
+    if error:
+        link.status, link.detail = 'bogus', error
+        return link, None, expires_at
+    link.status = 'secure'
+    return link, dnskey_rrset, min(expires_at, soa_expires, _signature_expiration(soa_rrsigs))
+
+def _cache_key(name, nameserver, port, anchors):
+    return (name.to_text().lower(), nameserver, port, tuple(anchors))
+
+def validate_chain(domain, nameserver=None, port=None, timeout=None, trust_anchors=None):
+    """
+    domain までの信頼の連鎖を検証し、DnssecResult を返す。links はルートから順のゾーンごとの結果。
+    nameserver/port は問い合わせ先 (省略時は dns_resolver の設定)、timeout は全体の持ち時間 (省略時は net_policy の 'dnssec')、
+    trust_anchors はルートのDS (省略時は configure() の設定)。
+    """
+    if not domain:
+        return DnssecResult(domain, status='error', error="ドメイン名を入力してください。")
+    nameserver = nameserver or None
+    if nameserver:
+        try:
+            nameserver = socket.gethostbyname(nameserver)
+        except Exception as e:
+            return DnssecResult(domain, status='error', error=f"DNSサーバー '{nameserver}' を解決できませんでした: {e}")
+    started = time.perf_counter()
+    result = DnssecResult(domain)
+    anchors = list(trust_anchors or _trust_anchors or ROOT_TRUST_ANCHORS)
+    deadline = net_policy.resolve_deadline(timeout, 'dnssec')
+    try:
+        names = _ancestors(domain)
+        anchor_rdatas = [dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.DS, text) for text in anchors]
+    except Exception as e:
+        result.status, result.error = 'error', f"ドメイン名またはトラストアンカーが正しくありません: {e}"
+        return result
+
+    # 検証済みの途中のゾーンがあれば、その下から始める (対象のドメイン自身は毎回検証し直す)
+    state = None
+    start = 0
+    for i in range(len(names) - 2, -1, -1):
+        state = _chain_cache.get(_cache_key(names[i], nameserver, port, anchors))
+        if state is not None:
+            start = i + 1
+            break
+    if state is not None:
+        result.links = [DnssecLink(link.zone, link.status, link.ds, link.dnskey, link.detail, cached=True)
+                        for link in state.links]
+
+    # 残りのゾーンの DS/DNSKEY/SOA を全部同時に問い合わせる
+    futures = {}
+    for name in names[start:]:
+        for rdtype in ('DS', 'DNSKEY', 'SOA'):
+            if rdtype == 'DS' and name == dns.name.root:
+                continue
+            futures[(name, rdtype)] = _executor.submit(_fetch, name, rdtype, nameserver, port, deadline)
+    result.queries = len(futures)
+
+    def fail(link):
+        # 連鎖が切れたゾーンまでの結果を返す
+        if state is not None:
+            result.links.extend(state.links[len(result.links):])
+        result.links.append(link)
+        result.status, result.failed_at = link.status, link.zone
+        result.error = f"{link.zone} で連鎖が切れています: {link.detail}"
+        return result
+
+    try:
+        for index in range(start, len(names)):
+            name = names[index]
+            ds_result = _result(futures[(name, 'DS')], deadline) if name != dns.name.root else None
+            soa_result = _result(futures[(name, 'SOA')], deadline)
+            for fetched in (ds_result, soa_result):
+                if isinstance(fetched, Exception) and not _absent(fetched):
+                    return fail(DnssecLink(name.to_text(), 'error', detail=f"問い合わせに失敗しました: {fetched}"))
+            if isinstance(soa_result, dns.resolver.NXDOMAIN):
+                return fail(DnssecLink(name.to_text(), 'error', detail="ドメインが存在しません (NXDOMAIN)。"))
+            is_apex = name == dns.name.root or (not _absent(soa_result) and soa_result[0].name == name)
+            has_ds = ds_result is not None and not _absent(ds_result)
+
+            if not is_apex and not has_ds:
+                # ゾーンの境界ではない (co.jp. など)。親ゾーンの鍵をそのまま使う
+                expires_at = state.expires_at
+                if _absent(ds_result):
+                    expires_at = min(expires_at, time.time() + dns_resolver.negative_ttl(ds_result))
+                state = _ChainState(state.zone, state.keys, state.links, expires_at)
+            elif state is not None and state.keys is None:
+                link = DnssecLink(name.to_text(), 'insecure', detail="親ゾーンが署名されていないため、検証できません。")
+                state = _ChainState(name, None, state.links + [link], state.expires_at)
+            elif not has_ds and name != dns.name.root:
+                status, proof = _ds_denial(name, ds_result, state)
+                if status == 'bogus':
+                    return fail(DnssecLink(name.to_text(), 'bogus', detail=proof))
+                dnskey_result = _result(futures[(name, 'DNSKEY')], deadline)
+                link = DnssecLink(name.to_text(), status)
+                if _absent(dnskey_result) or isinstance(dnskey_result, Exception):
+                    link.detail = f"署名されていません (親ゾーン {state.zone} にDSがありません)。{proof}"
+                else:
+                    link.dnskey = [_describe_key(rdata) for rdata in dnskey_result[0]]
+                    link.detail = (f"DNSKEYはありますが、親ゾーン {state.zone} にDSがありません "
+                                   f"(登録の漏れの可能性があります)。{proof}")
+                expires_at = min(state.expires_at, time.time() + dns_resolver.negative_ttl(ds_result))
+                state = _ChainState(name, None, state.links + [link], expires_at)
+            else:
+                ds_rdatas = anchor_rdatas if name == dns.name.root else list(ds_result[0])
+                dnskey_result = _result(futures[(name, 'DNSKEY')], deadline)
+                link, keys, expires_at = _check_zone(name, state, ds_rdatas, ds_result, dnskey_result, soa_result)
+                if keys is None:
+                    return fail(link)
+                expires_at = min(expires_at, state.expires_at) if state is not None else expires_at
+                state = _ChainState(name, keys, (state.links if state is not None else []) + [link], expires_at)
+
+            if index < len(names) - 1:
+                _chain_cache.put(_cache_key(name, nameserver, port, anchors), state, state.expires_at - time.time())
+        result.links.extend(state.links[len(result.links):])
+        # 署名の途切れたゾーンの状態 (insecure / unproven-insecure) を全体の状態にする
+        first_unsigned = next((link for link in result.links if link.status != 'secure'), None)
+        result.status = first_unsigned.status if first_unsigned else 'secure'
+        if first_unsigned:
+            result.failed_at = first_unsigned.zone
+        return result
+    except ImportError as e:
+        # 署名の検証には cryptography が必要
+        result.status, result.error = 'error', f"署名を検証できません ({e})。cryptography をインストールしてください。"
+        return result
+    finally:
+        result.elapsed = round(time.perf_counter() - started, 3)
+        for future in futures.values():
+            future.cancel()
@@ -0,0 +1,640 @@
+# checkers/email_auth_checker.py
+"""
+メール認証まわりの設定 (SPF/DMARC/DKIM/MTA-STS/TLS-RPT/BIMI) の確認。
+SPFは include:/redirect=/a/mx をたどってツリー全体を展開し、RFC 7208 のDNS参照回数 (上限10回) と
+展開後のIPアドレスを求める。たどったレコードはTTLの間ドメインをまたいで使い回すので、
+_spf.google.com のように多くのドメインが include するレコードは1回しか引かない。
+"""
+import ipaddress
+import re
+import threading
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import dns.resolver
+
+from checkers import dkim_checker, dns_resolver, net_policy
+from checkers.ttl_cache import TTLCache
+
+# RFC 7208 4.6.4: DNS参照を伴う項 (include/a/mx/ptr/exists/redirect) の上限と、空応答になった参照の上限
+SPF_LOOKUP_LIMIT = 10
+SPF_VOID_LOOKUP_LIMIT = 2
+# mx 1つで参照してよいMXホストの数
+SPF_MX_LIMIT = 10
+# 1回の確認で問い合わせる include/redirect 先の数と、ツリーに展開するノード数の上限 (ループや極端に大きいツリーへの備え)
+SPF_MAX_RECORDS = 50
+SPF_MAX_NODES = 200
+# 展開したSPFレコードとa/mxのアドレスを覚えておく件数 (期限はDNSのTTL)
+SPF_CACHE_SIZE = 1024
+# MTA-STSのポリシーファイルの上限バイト数 (RFC 8461 3.3 の目安)
+MTA_STS_MAX_POLICY_SIZE = 64 * 1024
+# DNS参照を伴うSPFの項
+_SPF_LOOKUP_TERMS = ('include', 'a', 'mx', 'ptr', 'exists')
+_A_MX_PATTERN = re.compile(r'^(a|mx)(?::([^/]+))?(?:/(\d+))?(?://(\d+))?$', re.IGNORECASE)
+
+# SPF/DMARC/MTA-STS などの確認を並行して進めるワーカー、SPFのレコードやa/mxを引くワーカー、
+# a/mx のホストのA/AAAAを引くワーカー。上のワーカーは下のワーカーだけを待つので、埋まっても詰まらない
+_check_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='email-auth')
+_lookup_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='spf-lookup')
+_address_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='spf-address')
+_spf_cache = TTLCache(SPF_CACHE_SIZE)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _txt_value(rdata):
+    """TXTレコードの文字列 (255バイトごとに分かれたものはつなげる)"""
+    return b''.join(rdata.strings).decode('utf-8', 'replace')
+
+def parse_tags(record):
+    """'v=DMARC1; p=none; rua=...' のようなタグ=値の並びを辞書にする (タグ名は小文字)"""
+    tags = {}
+    for part in record.split(';'):
+        name, sep, value = part.partition('=')
+        if sep and name.strip():
+            tags[name.strip().lower()] = value.strip()
+    return tags
+
+def _find_txt(name, prefix, deadline):
+    """
+    name のTXTレコードのうち prefix (小文字) で始まるものを探す。
+    (レコードのリスト, 失敗したときの status) を返す。見つからないのは失敗ではない。
+    """
+    try:
+        answers = dns_resolver.resolve(name, 'TXT', deadline=deadline)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return [], None
+    except Exception as e:
+        return [], f"クエリ失敗: {e}"
+    records = [_txt_value(rdata) for rdata in answers]
+    return [record for record in records if record.lower().startswith(prefix)], None
+
+# --- SPF ---
+
+def _memoized(key, fetch, deadline):
+    """
+    key の値をキャッシュから返す Future か、fetch(deadline) -> (値, TTL) をワーカーで実行する Future を返す。
+    同じ key を同時に引こうとした場合 (一括チェックで同じ include を持つドメインなど) は、先に始めた問い合わせを共有する。
+    先の問い合わせの持ち時間がこちらより短ければ、それが値を得られずに (時間切れなどで) 終わったときに、
+    こちらの残りの持ち時間で引き直す。
+    """
+    cached = _spf_cache.get(key)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        if entry is None:
+            future = _lookup_executor.submit(_fetch_and_store, key, fetch, deadline)
+            _inflight[key] = (future, deadline)
+            return future
+        shared, shared_deadline = entry
+    if shared_deadline.expires_at >= deadline.expires_at:
+        return shared
+
+    future = Future()
+    def retry(done):
+        cached = _spf_cache.get(key)
+        if cached is not None:
+            future.set_result(cached)
+        elif deadline.expired():
+            _copy_future(done, future)
+        else:
+            _memoized(key, fetch, deadline).add_done_callback(lambda again: _copy_future(again, future))
+    shared.add_done_callback(retry)
+    return future
+
+def _copy_future(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def _fetch_and_store(key, fetch, deadline):
+    try:
+        value, ttl = fetch(deadline)
+        # TTLがないもの (タイムアウトなど) は覚えない
+        if ttl:
+            _spf_cache.put(key, value, ttl)
+        return value
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def _spf_record_fetcher(domain):
+    def fetch(deadline):
+        try:
+            answers = dns_resolver.resolve(domain, 'TXT', deadline=deadline)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            return {'records': [], 'void': True}, dns_resolver.negative_ttl(e)
+        except Exception as e:
+            return {'records': [], 'error': f"クエリ失敗: {e}"}, None
+        records = [_txt_value(rdata) for rdata in answers]
+        records = [r for r in records if r.lower() == 'v=spf1' or r.lower().startswith('v=spf1 ')]
+        return {'records': records, 'void': False}, answers.rrset.ttl
+    return fetch
+
+def _spf_address_fetcher(mechanism, domain):
+    """a/mx の項が指すIPアドレスを引く関数を返す。mx はMXホストそれぞれのA/AAAAを引く。"""
+    def fetch(deadline):
+        hosts = [domain]
+        ttls = []
+        result = {'addresses': [], 'void': False}
+        if mechanism == 'mx':
+            try:
+                answers = dns_resolver.resolve(domain, 'MX', deadline=deadline)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+                return dict(result, void=True), dns_resolver.negative_ttl(e)
+            except Exception as e:
+                return dict(result, error=f"クエリ失敗: {e}"), None
+            ttls.append(answers.rrset.ttl)
+            hosts = [rdata.exchange.to_text().rstrip('.') for rdata in answers if rdata.exchange.to_text() != '.']
+            result['mx_hosts'] = len(hosts)
+            hosts = hosts[:SPF_MX_LIMIT]
+        # MXホストが複数あっても待つのは1回分で済むよう、A/AAAAはまとめて並行して引く
+        futures = [_address_executor.submit(dns_resolver.resolve, host, rdtype, deadline=deadline)
+                   for host in hosts for rdtype in ('A', 'AAAA')]
+        for future in futures:
+            try:
+                answers = future.result()
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+                ttls.append(dns_resolver.negative_ttl(e))
+                continue
+            except Exception as e:
+                return dict(result, error=f"クエリ失敗: {e}"), None
+            ttls.append(answers.rrset.ttl)
+            result['addresses'].extend(rdata.address for rdata in answers)
+        if mechanism == 'a' and not result['addresses']:
+            result['void'] = True
+        return result, min(ttls) if ttls else None
+    return fetch
+
+def parse_spf(record):
+    """
+    SPFレコードを項のリストにする。仕組みは {'qualifier', 'mechanism', 'value', 'cidr4', 'cidr6'}、
+    修飾子は {'modifier', 'value'}。a/mx の value はドメイン部分だけで、省略時は None。
+    プレフィックス長が範囲外 (a/33、ip6:…/129 など) の項には 'error' が付く (PermError)。
+    """
+    terms = []
+    for token in record.split()[1:]:
+        name, sep, value = token.partition('=')
+        if sep and name and ':' not in name and '/' not in name:
+            terms.append({'modifier': name.lower(), 'value': value, 'text': token})
+            continue
+        qualifier = '+'
+        if token[0] in '+-~?':
+            qualifier, token = token[0], token[1:]
+        name, _, value = token.partition(':')
+        mechanism = name.lower()
+        cidr4 = cidr6 = None
+        match = _A_MX_PATTERN.match(token)
+        if match:
+            # a, a/24, a:host/24//64, mx//64 などの形
+            mechanism, value = match.group(1).lower(), match.group(2)
+            cidr4 = int(match.group(3)) if match.group(3) else None
+            cidr6 = int(match.group(4)) if match.group(4) else None
+        term = {'qualifier': qualifier, 'mechanism': mechanism, 'value': value or None,
+                'cidr4': cidr4, 'cidr6': cidr6, 'text': token if qualifier == '+' else qualifier + token}
+        error = _cidr_error(mechanism, value, cidr4, cidr6)
+        if error:
+            term['error'] = f"{term['text']}: {error} (PermError)。"
+        terms.append(term)
+    return terms
+
+def _cidr_error(mechanism, value, cidr4, cidr6):
+    """項のアドレス・プレフィックス長が正しくなければ理由を返す"""
+    if mechanism in ('a', 'mx'):
+        if cidr4 is not None and cidr4 > 32:
+            return f"IPv4のプレフィックス長 /{cidr4} は 0〜32 の範囲外です"
+        if cidr6 is not None and cidr6 > 128:
+            return f"IPv6のプレフィックス長 /{cidr6} は 0〜128 の範囲外です"
+    elif mechanism in ('ip4', 'ip6'):
+        address, _, prefix = (value or '').partition('/')
+        version, max_prefix = (4, 32) if mechanism == 'ip4' else (6, 128)
+        try:
+            if ipaddress.ip_address(address).version != version:
+                raise ValueError(address)
+        except ValueError:
+            return f"IPv{version}のアドレスではありません"
+        if prefix and (not prefix.isdigit() or int(prefix) > max_prefix):
+            return f"プレフィックス長 /{prefix} は 0〜{max_prefix} の範囲外です"
+    return None
+
+def _spf_targets(domain, record):
+    """レコードからたどる先を取り出す。(include/redirect のドメイン, a/mx の (種類, ドメイン))"""
+    records, addresses = [], []
+    for term in parse_spf(record):
+        target = term.get('value')
+        if target and '%' in target:
+            continue # マクロは送信元ごとに変わるので展開できない
+        if term.get('modifier') == 'redirect' or term.get('mechanism') == 'include':
+            if target:
+                records.append(target.lower().rstrip('.'))
+        elif term.get('mechanism') in ('a', 'mx'):
+            addresses.append((term['mechanism'], (target or domain).lower().rstrip('.')))
+    return records, addresses
+
+def _collect_spf(domain, deadline):
+    """
+    domain から include/redirect を幅優先でたどり、段ごとにまとめて並行して問い合わせる。
+    ({ドメイン: レコード情報}, {(a/mx, ドメイン): アドレス情報}) を返す。間に合わなかったものは含まない。
+    """
+    records, addresses = {}, {}
+    address_futures = {}
+    frontier = [domain]
+    while frontier and not deadline.expired():
+        futures = {name: _memoized(('spf', name), _spf_record_fetcher(name), deadline) for name in frontier}
+        next_frontier = []
+        for name, future in futures.items():
+            try:
+                records[name] = future.result(timeout=deadline.remaining())
+            except Exception:
+                continue
+            for record in records[name]['records'][:1]:
+                targets, address_targets = _spf_targets(name, record)
+                for target in targets:
+                    if (target not in records and target not in futures and target not in next_frontier
+                            and len(records) + len(next_frontier) < SPF_MAX_RECORDS):
+                        next_frontier.append(target)
+                for key in address_targets:
+                    if key not in address_futures:
+                        address_futures[key] = _memoized(key, _spf_address_fetcher(*key), deadline)
+        frontier = next_frontier
+    for key, future in address_futures.items():
+        try:
+            addresses[key] = future.result(timeout=deadline.remaining())
+        except Exception:
+            pass
+    return records, addresses
+
+def _networks(addresses, cidr4, cidr6):
+    networks = []
+    for address in addresses:
+        ip = ipaddress.ip_address(address)
+        prefix = cidr4 if ip.version == 4 else cidr6
+        networks.append(ipaddress.ip_network(f"{address}/{prefix}" if prefix is not None else address, strict=False))
+    return networks
+
+def _evaluate_spf(domain, records, addresses, stack=(), budget=None):
+    """
+    集めたレコードから domain のSPFを展開する。ノードは
+    {'domain', 'record', 'lookups' (このレコードの参照数), 'total_lookups', 'void_lookups', 'includes', 'redirect', 'errors'}
+    と、許可 (+) されるネットワークの集合 '_pass' と展開できない項 '_unflattenable' を持つ。
+    同じ include が何度も出てくるツリーで展開が膨らみすぎないよう、展開するノード数は SPF_MAX_NODES までにする。
+    """
+    budget = budget if budget is not None else [SPF_MAX_NODES]
+    budget[0] -= 1
+    node = {'domain': domain, 'record': None, 'lookups': 0, 'total_lookups': 0, 'void_lookups': 0,
+            'includes': [], 'redirect': None, 'all': None, 'errors': [], 'warnings': [],
+            '_pass': set(), '_unflattenable': []}
+    if budget[0] < 0:
+        node['errors'].append(f"{domain}: 展開するレコードが多すぎるため、ここで打ち切りました。")
+        return node
+    info = records.get(domain)
+    if info is None:
+        node['errors'].append(f"{domain}: 時間内に参照できませんでした。")
+        return node
+    if info.get('error'):
+        node['errors'].append(f"{domain}: {info['error']}")
+        return node
+    if info.get('void'):
+        node['void_lookups'] += 1
+    if not info['records']:
+        node['errors'].append(f"{domain}: SPFレコードがありません (PermError)。")
+        return node
+    if len(info['records']) > 1:
+        node['errors'].append(f"{domain}: SPFレコードが {len(info['records'])} 件あります (PermError)。")
+    node['record'] = info['records'][0]
+    stack = stack + (domain,)
+    redirect = None
+
+    def add_child(target):
+        if target in stack:
+            node['errors'].append(f"{domain}: {target} を循環して参照しています。")
+            return None
+        child = _evaluate_spf(target, records, addresses, stack, budget)
+        node['total_lookups'] += child['total_lookups']
+        node['void_lookups'] += child['void_lookups']
+        node['errors'].extend(child['errors'])
+        node['warnings'].extend(child['warnings'])
+        node['_unflattenable'].extend(child['_unflattenable'])
+        return child
+
+    for term in parse_spf(node['record']):
+        target = term.get('value')
+        if 'modifier' in term:
+            if term['modifier'] == 'redirect':
+                redirect = target
+            continue
+        mechanism = term['mechanism']
+        if mechanism in _SPF_LOOKUP_TERMS:
+            node['lookups'] += 1
+        if term.get('error'):
+            node['errors'].append(f"{domain}: {term['error']}")
+            continue
+        if target and '%' in target:
+            node['_unflattenable'].append(term['text'])
+            continue
+        if mechanism == 'include':
+            child = add_child(target.lower().rstrip('.')) if target else None
+            if child is not None:
+                node['includes'].append(child)
+                if term['qualifier'] == '+':
+                    node['_pass'] |= child['_pass']
+        elif mechanism in ('a', 'mx'):
+            info = addresses.get((mechanism, (target or domain).lower().rstrip('.')))
+            if info is None:
+                node['errors'].append(f"{domain}: {term['text']} のアドレスを時間内に参照できませんでした。")
+                continue
+            if info.get('error'):
+                node['errors'].append(f"{domain}: {term['text']}: {info['error']}")
+                continue
+            node['void_lookups'] += 1 if info.get('void') else 0
+            if info.get('mx_hosts', 0) > SPF_MX_LIMIT:
+                node['errors'].append(f"{domain}: {term['text']} のMXホストが {info['mx_hosts']} 台あり、"
+                                      f"上限の {SPF_MX_LIMIT} 台を超えています (PermError)。")
+            if term['qualifier'] == '+':
+                node['_pass'].update(_networks(info['addresses'], term['cidr4'], term['cidr6']))
+        elif mechanism in ('ip4', 'ip6'):
+            try:
+                network = ipaddress.ip_network(target, strict=False)
+            except (TypeError, ValueError):
+                node['errors'].append(f"{domain}: {term['text']} は正しいアドレスではありません。")
+                continue
+            if term['qualifier'] == '+':
+                node['_pass'].add(network)
+        elif mechanism in ('ptr', 'exists'):
+            node['_unflattenable'].append(term['text'])
+            if mechanism == 'ptr':
+                node['warnings'].append(f"{domain}: ptr は使わないことが推奨されています (RFC 7208 5.5)。")
+        elif mechanism == 'all':
+            node['all'] = term['qualifier']
+        else:
+            node['errors'].append(f"{domain}: 不明な項 '{term['text']}' があります (PermError)。")
+
+    # redirect は all がないときだけ使われる
+    if redirect and node['all'] is None:
+        node['lookups'] += 1
+        if '%' in redirect:
+            node['_unflattenable'].append(f"redirect={redirect}")
+        else:
+            child = add_child(redirect.lower().rstrip('.'))
+            if child is not None:
+                node['redirect'] = child
+                node['_pass'] |= child['_pass']
+                node['all'] = child['all']
+    node['total_lookups'] += node['lookups']
+    return node
+
+def _public_tree(node):
+    """結果に載せるツリー (内部用の集合などは除く)"""
+    return {
+        'domain': node['domain'],
+        'record': node['record'],
+        'lookups': node['lookups'],
+        'total_lookups': node['total_lookups'],
+        'includes': [_public_tree(child) for child in node['includes']],
+        'redirect': _public_tree(node['redirect']) if node['redirect'] else None,
+    }
+
+def flatten_spf(domain, deadline=None):
+    """
+    domain のSPFを include/redirect までたどって展開し、DNS参照回数と許可されるIPアドレスを返す。
+    同じ段の include や a/mx は並行して問い合わせる。
+    """
+    deadline = net_policy.resolve_deadline(deadline, 'email_auth')
+    domain = domain.lower().rstrip('.')
+    records, addresses = _collect_spf(domain, deadline)
+    node = _evaluate_spf(domain, records, addresses)
+    networks = list(ipaddress.collapse_addresses(n for n in node['_pass'] if n.version == 4))
+    networks6 = list(ipaddress.collapse_addresses(n for n in node['_pass'] if n.version == 6))
+    root = records.get(domain, {'records': [], 'error': "クエリ失敗: 時間内に応答がありませんでした。"})
+    return {
+        'records': root['records'],
+        'error': root.get('error'),
+        'lookups': node['total_lookups'],
+        'void_lookups': node['void_lookups'],
+        'all': node['all'],
+        'flattened': {'ip4': [str(n) for n in networks], 'ip6': [str(n) for n in networks6]},
+        'unflattenable': node['_unflattenable'],
+        'errors': node['errors'],
+        'warnings': node['warnings'],
+        'tree': _public_tree(node),
+    }
+
+def check_spf(domain, deadline=None):
+    """
+    ドメインのSPFレコードを探し、include/redirect を展開した結果カード用の辞書を返す。
+    DNS参照回数が上限を超える・レコードが複数あるなど、受信側で PermError になる設定は warnings に入れる。
+    """
+    spf_data = {'type': 'SPF', 'records': []}
+    flattened = flatten_spf(domain, deadline)
+    if flattened['error']:
+        spf_data.update(status=flattened['error'], failed=True)
+        return spf_data
+    spf_data['records'] = flattened['records']
+    if not spf_data['records']:
+        spf_data['status'] = "レコードが見つかりませんでした。"
+        return spf_data
+
+    warnings = list(flattened['errors'])
+    if flattened['lookups'] > SPF_LOOKUP_LIMIT:
+        warnings.insert(0, f"DNS参照が {flattened['lookups']} 回あり、上限の {SPF_LOOKUP_LIMIT} 回を超えています (PermError)。")
+    if flattened['void_lookups'] > SPF_VOID_LOOKUP_LIMIT:
+        warnings.append(f"存在しない参照先が {flattened['void_lookups']} 件あり、上限の {SPF_VOID_LOOKUP_LIMIT} 件を超えています (PermError)。")
+    if flattened['all'] in ('+', '?'):
+        warnings.append(f"'{flattened['all']}all' のため、どの送信元からのメールも拒否されません。")
+    elif flattened['all'] is None:
+        warnings.append("all がないため、記載のない送信元は Neutral として扱われます。")
+    warnings.extend(flattened['warnings'])
+    spf_data.update({
+        'lookups': flattened['lookups'],
+        'lookup_limit': SPF_LOOKUP_LIMIT,
+        'void_lookups': flattened['void_lookups'],
+        'flattened': flattened['flattened'],
+        'unflattenable': flattened['unflattenable'],
+        'tree': flattened['tree'],
+        'warnings': warnings,
+    })
+    return spf_data
+
+# --- DMARC / MTA-STS / TLS-RPT / BIMI ---
+
+def check_dmarc(domain, deadline=None):
+    """_dmarc サブドメインのDMARCレコードを探し、タグを読み取った結果カード用の辞書を返す"""
+    dmarc_data = {'type': 'DMARC', 'records': []}
+    records, status = _find_txt(f'_dmarc.{domain}', 'v=dmarc1', deadline)
+    if status:
+        dmarc_data.update(status=status, failed=True)
+        return dmarc_data
+    dmarc_data['records'] = records
+    if not records:
+        dmarc_data['status'] = "DMARCレコードが見つかりませんでした。"
+        return dmarc_data
+    tags = parse_tags(records[0])
+    warnings = []
+    if len(records) > 1:
+        warnings.append(f"DMARCレコードが {len(records)} 件あり、受信側では無視されます。")
+    if tags.get('p', '').lower() not in ('none', 'quarantine', 'reject'):
+        warnings.append("p タグがないか不正なため、受信側では無視されます。")
+    elif tags['p'].lower() == 'none':
+        warnings.append("p=none のため、認証に失敗したメールも隔離・拒否されません。")
+    if not tags.get('rua'):
+        warnings.append("rua がないため、集計レポートが届きません。")
+    dmarc_data.update({'tags': tags, 'warnings': warnings})
+    return dmarc_data
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """MTA-STSのポリシーはリダイレクトを追ってはいけない (RFC 8461 3.3)"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+_sts_opener = urllib.request.build_opener(_NoRedirect)
+
+def _fetch_mta_sts_policy(domain, timeout):
+    """https://mta-sts.<ドメイン>/.well-known/mta-sts.txt を取得し、{'version', 'mode', 'max_age', 'mx': [...]} にする"""
+    url = f"https://mta-sts.{domain}/.well-known/mta-sts.txt"
+    with _sts_opener.open(url, timeout=timeout) as response:
+        text = response.read(MTA_STS_MAX_POLICY_SIZE).decode('utf-8', 'replace')
+    policy = {'mx': []}
+    for line in text.splitlines():
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key, value = key.strip().lower(), value.strip()
+        if key == 'mx':
+            policy['mx'].append(value.lower())
+        else:
+            policy[key] = value
+    return policy
+
+def _mx_matches(host, pattern):
+    """MXホスト名が mx: の指定 (先頭の '*.' は1ラベル分に一致) に合うか"""
+    host, pattern = host.lower().rstrip('.'), pattern.lower().rstrip('.')
+    if pattern.startswith('*.'):
+        return host.endswith(pattern[1:]) and '.' not in host[:-len(pattern) + 1]
+    return host == pattern
+
+def check_mta_sts(domain, deadline=None):
+    """MTA-STSのTXTレコードとポリシーファイルを確認し、MXがポリシーに載っているかを結果カード用の辞書で返す"""
+    deadline = net_policy.resolve_deadline(deadline, 'email_auth')
+    sts_data = {'type': 'MTA-STS', 'records': []}
+    records, status = _find_txt(f'_mta-sts.{domain}', 'v=stsv1', deadline)
+    if status:
+        sts_data.update(status=status, failed=True)
+        return sts_data
+    sts_data['records'] = records
+    if not records:
+        sts_data['status'] = "MTA-STSのレコードが見つかりませんでした。"
+        return sts_data
+    warnings = []
+    try:
+        policy = _fetch_mta_sts_policy(domain, deadline.timeout(net_policy.HTTP_TIMEOUT))
+    except Exception as e:
+        sts_data['warnings'] = [f"ポリシーファイルを取得できませんでした: {e}"]
+        return sts_data
+    sts_data['policy'] = policy
+    if policy.get('version') != 'STSv1':
+        warnings.append("ポリシーファイルの version が STSv1 ではありません。")
+    if policy.get('mode') not in ('enforce', 'testing', 'none'):
+        warnings.append(f"ポリシーファイルの mode '{policy.get('mode')}' は不正です。")
+    elif policy['mode'] != 'enforce':
+        warnings.append(f"mode が {policy['mode']} のため、TLSでの配送は強制されません。")
+    try:
+        answers = dns_resolver.resolve(domain, 'MX', deadline=deadline)
+        mx_hosts = [rdata.exchange.to_text().rstrip('.') for rdata in answers]
+    except Exception:
+        mx_hosts = []
+    for host in mx_hosts:
+        if not any(_mx_matches(host, pattern) for pattern in policy['mx']):
+            warnings.append(f"MX {host} がポリシーファイルの mx に含まれていません。")
+    sts_data['warnings'] = warnings
+    return sts_data
+
+def check_tls_rpt(domain, deadline=None):
+    """_smtp._tls のTLS-RPTレコードを確認し、結果カード用の辞書を返す"""
+    rpt_data = {'type': 'TLS-RPT', 'records': []}
+    records, status = _find_txt(f'_smtp._tls.{domain}', 'v=tlsrptv1', deadline)
+    if status:
+        rpt_data.update(status=status, failed=True)
+        return rpt_data
+    rpt_data['records'] = records
+    if not records:
+        rpt_data['status'] = "TLS-RPTのレコードが見つかりませんでした。"
+        return rpt_data
+    rpt_data['tags'] = parse_tags(records[0])
+    if not rpt_data['tags'].get('rua'):
+        rpt_data['warnings'] = ["rua がないため、レポートが届きません。"]
+    return rpt_data
+
+def check_bimi(domain, deadline=None):
+    """default._bimi のBIMIレコードを確認し、結果カード用の辞書を返す"""
+    bimi_data = {'type': 'BIMI', 'records': []}
+    records, status = _find_txt(f'default._bimi.{domain}', 'v=bimi1', deadline)
+    if status:
+        bimi_data.update(status=status, failed=True)
+        return bimi_data
+    bimi_data['records'] = records
+    if not records:
+        bimi_data['status'] = "BIMIのレコードが見つかりませんでした。"
+        return bimi_data
+    bimi_data['tags'] = parse_tags(records[0])
+    if not bimi_data['tags'].get('l'):
+        bimi_data['warnings'] = ["l (ロゴのURL) がありません。"]
+    return bimi_data
+
+def check_dkim(domain, dkim_selector="", progress_callback=None, cancel_event=None, deadline=None):
+    """DKIMセレクタ候補を検索し、(結果カード用の辞書, 確認したセレクタ) を返す"""
+    # セレクタ候補は並行して問い合わせ、キャンセル要求にも応じる
+    dkim_result, checked_selectors = dkim_checker.find_dkim_record(
+        domain, dkim_selector,
+        progress_callback=progress_callback,
+        cancel_event=cancel_event,
+        deadline=deadline
+    )
+    dkim_data = {'type': 'DKIM'}
+    dkim_data.update(dkim_result)
+    return dkim_data, checked_selectors
+
+# DKIM以外の確認 (この順に結果カードを並べる。DKIMはDMARCの次)
+_POSTURE_CHECKS = [('SPF', check_spf), ('DMARC', check_dmarc), ('MTA-STS', check_mta_sts),
+                   ('TLS-RPT', check_tls_rpt), ('BIMI', check_bimi)]
+
+def check_email_auth(domain, dkim_selector="", progress_callback=None, cancel_event=None):
+    """
+    SPF/DMARC/DKIM/MTA-STS/TLS-RPT/BIMIを確認し、UIの finish_auth_check に渡す形の辞書を返す。
+    問い合わせの失敗・時間切れ・キャンセルで値が分からなかったカードには failed: True が付く。
+    DKIM以外は並行して確認し、その間にDKIMのセレクタ検索を進める。全体で net_policy の 'email_auth' の持ち時間を共有する。
+    """
+    if not domain: return {'error': "ドメイン名を入力してください。"}
+    domain = domain.strip().rstrip('.')
+    deadline = net_policy.Deadline.for_action('email_auth')
+    futures = [(name, _check_executor.submit(check, domain, deadline)) for name, check in _POSTURE_CHECKS]
+    dkim_data, checked_selectors = check_dkim(domain, dkim_selector, progress_callback, cancel_event, deadline)
+
+    results = []
+    for name, future in futures:
+        try:
+            results.append(future.result(timeout=deadline.remaining()))
+        except FutureTimeoutError:
+            results.append({'type': name, 'records': [], 'failed': True,
+                            'status': f"クエリ失敗: {deadline.seconds}秒以内に終わりませんでした。"})
+        except Exception as e:
+            results.append({'type': name, 'records': [], 'failed': True,
+                            'status': f"クエリ失敗: {type(e).__name__}: {e}"})
+    results.insert(2, dkim_data)
+
+    # BIMIはDMARCで隔離か拒否を指定していないと表示されない
+    by_type = {item['type']: item for item in results}
+    dmarc_policy = by_type['DMARC'].get('tags', {}).get('p', '').lower()
+    if by_type['BIMI']['records'] and dmarc_policy not in ('quarantine', 'reject'):
+        by_type['BIMI'].setdefault('warnings', []).append(
+            "DMARCが p=quarantine か p=reject でないため、BIMIのロゴは表示されません。")
+    return {'results': results, 'checked_selectors': checked_selectors}
+
+def get_cache_stats():
+    """展開したSPFレコード・アドレスのキャッシュの統計"""
+    return _spf_cache.stats()
+
+def clear_cache():
+    _spf_cache.clear()
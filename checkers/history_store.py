@@ -0,0 +1,307 @@
+# checkers/history_store.py
+"""
+チェック結果の履歴 (SQLite)。
+nslookup / メール認証 / Whois / ポートの結果をドメインと日時ごとに保存し、
+比較用の値 (fields) が前回から変わったものを changes テーブルに記録する。
+recheck() / recheck_records() は、保存済みの結果のうち保存期間やTTLが切れた部分だけを問い合わせ直す。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from checkers import app_paths, models
+
+HISTORY_FILE = 'history.sqlite3'
+# DNS以外の結果を問い合わせ直さずに使う秒数
+MAX_AGE = {'email_auth': 3600, 'whois': 24 * 3600, 'port': 600}
+# TTLが分からないDNSレコードを使い回す秒数
+DEFAULT_RECORD_TTL = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL,
+    check_name TEXT NOT NULL,
+    variant TEXT NOT NULL DEFAULT '',
+    checked_at REAL NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_domain ON snapshots (domain, check_name, variant, checked_at);
+
+CREATE TABLE IF NOT EXISTS fields (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    data TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (snapshot_id, field)
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    domain TEXT NOT NULL,
+    check_name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_field ON changes (check_name, field, changed_at);
+CREATE INDEX IF NOT EXISTS idx_changes_domain ON changes (domain, changed_at);
+"""
+
+def _whois_fields(result):
+    """RDAP/Whoisの結果から、変化を追う項目 (ステータス・ネームサーバー・有効期限・レジストラ) を取り出す"""
+    fields = {'status': [], 'nameservers': [], 'expiration': [], 'registrar': []}
+    if result.get('source') == 'rdap':
+        data = result.get('data') or {}
+        fields['status'] = list(data.get('status', []))
+        fields['nameservers'] = [ns.get('ldhName', '').lower().rstrip('.') for ns in data.get('nameservers', [])]
+        fields['expiration'] = [e.get('eventDate', '') for e in data.get('events', []) if e.get('eventAction') == 'expiration']
+        for entity in data.get('entities', []):
+            if 'registrar' in entity.get('roles', []):
+                for item in (entity.get('vcardArray') or [None, []])[1]:
+                    if item[0] == 'fn':
+                        fields['registrar'].append(item[3])
+        return fields
+
+    # テキストのWhoisは「項目: 値」(gTLD) と「[項目] 値」(JPRS) の両方を見る
+    for line in (result.get('text') or '').splitlines():
+        match = re.match(r'^\s*(?:[a-z]\.\s*)?\[(.+?)\]\s+(.+)$', line, re.I) or re.match(r'^\s*([^:]+):\s*(.+)$', line)
+        if not match:
+            continue
+        key, value = match.group(1).strip().lower(), match.group(2).strip()
+        if key in ('name server', 'nserver', 'ネームサーバ'):
+            fields['nameservers'].append(value.lower().rstrip('.'))
+        elif 'expir' in key or key == '有効期限':
+            fields['expiration'].append(value)
+        elif key in ('domain status', 'status', '状態'):
+            fields['status'].append(value)
+        elif key == 'registrar':
+            fields['registrar'].append(value)
+    return fields
+
+def extract_fields(check, result):
+    """
+    結果から比較用の値を {項目名: (値のリスト, TTL or None, 再利用するデータ or None)} で返す。
+    タイムアウト・キャンセルなどで値が分からなかった項目 (チェッカーが failed を付けたもの) は含めない
+    (前回から変わったとは扱わない)。
+    """
+    result = models.serialize(result)
+    if isinstance(result, dict) and result.get('error'):
+        return {}
+    fields = {}
+    if check == 'nslookup':
+        for record_set in result:
+            # NXDOMAIN/NoAnswer は ttl 付きの空の値として扱う
+            if record_set.get('failed'):
+                continue
+            values = sorted(record['value'] for record in record_set['records'])
+            fields[record_set['type']] = (values, record_set['ttl'], record_set)
+    elif check == 'email_auth':
+        for item in result.get('results', []):
+            if item.get('failed'):
+                continue
+            fields[item['type']] = (sorted(item.get('records', [])), None, None)
+            if item.get('flattened'):
+                # include 先の変更で許可されるIPが変わった場合も差分として残す
+                fields['SPF_IPS'] = (item['flattened']['ip4'] + item['flattened']['ip6'], None, None)
+    elif check == 'whois':
+        for name, values in _whois_fields(result).items():
+            fields[name] = (sorted(values), None, None)
+    elif check == 'port':
+        for probe in (result if isinstance(result, list) else [result]):
+            if probe.get('state') in ('open', 'closed', 'filtered'):
+                fields[str(probe['port'])] = ([probe['state']], None, None)
+    return fields
+
+def _diff(field, old, new):
+    return {'field': field, 'old': old, 'new': new,
+            'added': [v for v in new if v not in old], 'removed': [v for v in old if v not in new]}
+
+class HistoryStore:
+    """
+    チェック結果の履歴。1つの接続を複数スレッドで共有するため、操作はロックで直列化する。
+    variant には DNSサーバーやDKIMセレクタなど、同じドメインでも結果が変わる条件を入れる。
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_paths.get_cache_dir(), HISTORY_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _latest_fields(self, domain, check, variant):
+        """項目ごとに、最後に値が分かったときの値と取得日時を返す"""
+        rows = self._conn.execute(
+            """SELECT f.field, f.value, f.data, f.fetched_at, f.expires_at, MAX(s.checked_at)
+               FROM snapshots s JOIN fields f ON f.snapshot_id = s.id
+               WHERE s.domain = ? AND s.check_name = ? AND s.variant = ?
+               GROUP BY f.field""",
+            (domain, check, variant)).fetchall()
+        return {row['field']: row for row in rows}
+
+    def _latest_snapshot(self, domain, check, variant):
+        return self._conn.execute(
+            """SELECT id, checked_at, result FROM snapshots
+               WHERE domain = ? AND check_name = ? AND variant = ?
+               ORDER BY checked_at DESC LIMIT 1""",
+            (domain, check, variant)).fetchone()
+
+    def save(self, domain, check, result, variant='', reused=None):
+        """
+        結果を保存し、前回から値が変わった項目の差分のリストを返す。
+        reused ({項目名: (取得日時, 期限)}) の項目は前回の値を使い回したものとして、取得日時を引き継ぐ。
+        """
+        domain = domain.lower().rstrip('.')
+        now = time.time()
+        result = models.serialize(result)
+        fields = extract_fields(check, result)
+        if not domain or (not fields and isinstance(result, dict) and result.get('error')):
+            return []
+        reused = reused or {}
+        changes = []
+        with self._lock, self._conn:
+            previous = self._latest_fields(domain, check, variant)
+            cursor = self._conn.execute(
+                "INSERT INTO snapshots (domain, check_name, variant, checked_at, result) VALUES (?, ?, ?, ?, ?)",
+                (domain, check, variant, now, json.dumps(result, ensure_ascii=False)))
+            snapshot_id = cursor.lastrowid
+            for field, (values, ttl, data) in fields.items():
+                if field in reused:
+                    fetched_at, expires_at = reused[field]
+                else:
+                    fetched_at = now
+                    expires_at = now + (ttl if ttl is not None else MAX_AGE.get(check, DEFAULT_RECORD_TTL))
+                value = json.dumps(values, ensure_ascii=False)
+                self._conn.execute(
+                    "INSERT INTO fields (snapshot_id, field, value, data, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (snapshot_id, field, value,
+                     json.dumps(data, ensure_ascii=False) if data is not None else None, fetched_at, expires_at))
+                old = previous.get(field)
+                if old is not None and old['value'] != value:
+                    self._conn.execute(
+                        """INSERT INTO changes (snapshot_id, domain, check_name, field, old_value, new_value, changed_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                        (snapshot_id, domain, check, field, old['value'], value, now))
+                    changes.append(_diff(field, json.loads(old['value']), values))
+        return changes
+
+    def recheck(self, domain, check, run, variant='', force=False):
+        """
+        前回の結果が MAX_AGE 以内ならそれを返し、古ければ run(domain) で問い合わせ直して保存する。
+        戻り値は {'result', 'checked_at', 'cached', 'changes'}。
+        """
+        key = domain.lower().rstrip('.')
+        if not force:
+            with self._lock:
+                row = self._latest_snapshot(key, check, variant)
+            if row is not None and time.time() - row['checked_at'] < MAX_AGE.get(check, 0):
+                return {'result': json.loads(row['result']), 'checked_at': row['checked_at'],
+                        'cached': True, 'changes': []}
+        result = models.serialize(run(domain))
+        changes = self.save(key, check, result, variant)
+        return {'result': result, 'checked_at': time.time(), 'cached': False, 'changes': changes}
+
+    def recheck_records(self, domain, run, record_types, variant='', force=False):
+        """
+        nslookup の差分確認。TTLが切れた (または前回失敗した) 種別だけを run(種別のリスト) で問い合わせ直し、
+        残りは保存済みのレコードと組み合わせて record_types の順に返す。
+        戻り値は {'result', 'checked_at', 'requeried', 'reused', 'changes'}。
+        """
+        key = domain.lower().rstrip('.')
+        now = time.time()
+        with self._lock:
+            previous = {} if force else self._latest_fields(key, 'nslookup', variant)
+        fresh = {t: previous[t] for t in record_types
+                 if t in previous and previous[t]['expires_at'] > now and previous[t]['data']}
+        stale = [t for t in record_types if t not in fresh]
+
+        queried = {}
+        if stale:
+            result = run(stale)
+            if isinstance(result, dict) and result.get('error'):
+                return result
+            queried = {record_set['type']: record_set for record_set in models.serialize(result)}
+
+        merged = []
+        for r_type in record_types:
+            if r_type in queried:
+                merged.append(queried[r_type])
+            elif r_type in fresh:
+                merged.append(json.loads(fresh[r_type]['data']))
+        changes = []
+        if stale:
+            reused = {t: (row['fetched_at'], row['expires_at']) for t, row in fresh.items()}
+            changes = self.save(key, 'nslookup', merged, variant, reused=reused)
+        return {'result': merged, 'checked_at': now, 'requeried': stale, 'reused': list(fresh), 'changes': changes}
+
+    def history(self, domain, check=None, limit=20):
+        """ドメインの保存済み結果を新しい順に返す"""
+        sql = "SELECT id, check_name, variant, checked_at, result FROM snapshots WHERE domain = ?"
+        params = [domain.lower().rstrip('.')]
+        if check:
+            sql += " AND check_name = ?"
+            params.append(check)
+        sql += " ORDER BY checked_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{'id': row['id'], 'check': row['check_name'], 'variant': row['variant'],
+                 'checked_at': row['checked_at'], 'result': json.loads(row['result'])} for row in rows]
+
+    def changes(self, check=None, field=None, since=None, domain=None, limit=1000):
+        """
+        記録された変化を新しい順に返す。
+        例: changes('nslookup', 'MX', since=time.time() - 7 * 86400) で、今週MXが変わったドメイン。
+        """
+        conditions, params = [], []
+        for column, value in (('check_name', check), ('field', field), ('domain', domain)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value.lower().rstrip('.') if column == 'domain' else value)
+        if since is not None:
+            conditions.append("changed_at >= ?")
+            params.append(since)
+        sql = "SELECT domain, check_name, field, old_value, new_value, changed_at FROM changes"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY changed_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(_diff(row['field'], json.loads(row['old_value']), json.loads(row['new_value'])),
+                     domain=row['domain'], check=row['check_name'], changed_at=row['changed_at'])
+                for row in rows]
+
+    def changed_domains(self, check, field, since):
+        """since 以降に指定した項目が変わったドメインの一覧"""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT DISTINCT domain FROM changes
+                   WHERE check_name = ? AND field = ? AND changed_at >= ? ORDER BY domain""",
+                (check, field, since)).fetchall()
+        return [row['domain'] for row in rows]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """アプリ全体で共有する履歴 (cache/history.sqlite3) を返す"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,173 @@
+# checkers/metrics.py
+"""
+処理時間の計測 (診断用)。
+Api の呼び出しごとの所要時間・結果・結果のサイズと、DNSの問い合わせごとの応答時間・rcode・タイムアウトを
+ヒストグラムとカウンタに集計し、JSON または Prometheus のテキスト形式で書き出す。
+無効 (既定) のときは enabled を見て何もせずに戻るだけなので、計測の負担はほぼない。
+環境変数 RENTALSERVERCHECKER_METRICS=1 か enable() で有効にする。
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_ENV = 'RENTALSERVERCHECKER_METRICS'
+# ヒストグラムのバケットの上限 (秒)。Prometheus の既定に近い刻み
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# パーセンタイルを出す直近の範囲 (秒) とサンプル数の上限
+ROLLING_WINDOW = 300
+ROLLING_SAMPLES = 1024
+# 診断パネルに出す直近のDNS問い合わせの件数
+RECENT_QUERIES = 200
+
+enabled = os.environ.get(METRICS_ENV, '') not in ('', '0')
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_recent_queries = deque(maxlen=RECENT_QUERIES)
+
+def enable(flag=True):
+    global enabled
+    enabled = bool(flag)
+
+def percentile(sorted_values, percent):
+    """ソート済みの値から最近傍法でパーセンタイルを求める (空なら 0.0)。一括チェックやベンチマークの集計でも使う。"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Histogram:
+    """
+    累積のバケット数 (Prometheus 用) と、直近 ROLLING_WINDOW 秒のサンプル (パーセンタイル用) を持つ。
+    ロックはモジュールの _lock を使う。
+    """
+    __slots__ = ('bucket_counts', 'count', 'sum', 'recent')
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=ROLLING_SAMPLES)
+
+    def observe(self, value, now):
+        self.bucket_counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append((now, value))
+
+    def snapshot(self, now):
+        values = sorted(v for t, v in self.recent if now - t <= ROLLING_WINDOW)
+        ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'recent': {
+                'count': len(values),
+                'p50_ms': ms(percentile(values, 50)) if values else None,
+                'p95_ms': ms(percentile(values, 95)) if values else None,
+                'p99_ms': ms(percentile(values, 99)) if values else None,
+                'max_ms': ms(values[-1]) if values else None,
+            },
+        }
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def observe(name, seconds, **labels):
+    """ヒストグラム name に秒数を1件加える"""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    now = time.monotonic()
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds, now)
+
+def increment(name, amount=1, **labels):
+    """カウンタ name を加算する"""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def record_call(function, seconds, outcome, size=None):
+    """Api の1回の呼び出しを記録する。outcome は ok / error / exception"""
+    if not enabled:
+        return
+    observe('api_call_seconds', seconds, function=function)
+    increment('api_calls_total', function=function, outcome=outcome)
+    if size is not None:
+        increment('api_result_bytes_total', size, function=function)
+
+def record_dns_query(name, rdtype, server, rcode, seconds, attempts=1):
+    """
+    DNSの1回の問い合わせを記録する。rcode は NOERROR / NXDOMAIN / NOANSWER / TIMEOUT / 例外名。
+    attempts はタイムアウトまでに送った回数 (2以上なら再送があった)。
+    """
+    if not enabled:
+        return
+    server = server or 'system'
+    observe('dns_query_seconds', seconds, rdtype=rdtype, server=server, rcode=rcode)
+    increment('dns_queries_total', rdtype=rdtype, server=server, rcode=rcode)
+    if rcode == 'TIMEOUT':
+        increment('dns_timeouts_total', server=server)
+    if attempts > 1:
+        increment('dns_retries_total', attempts - 1, server=server)
+    with _lock:
+        _recent_queries.append({'at': time.time(), 'name': name, 'type': rdtype, 'server': server,
+                                'rcode': rcode, 'latency_ms': round(seconds * 1000, 3), 'attempts': attempts})
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent_queries.clear()
+
+def export_json():
+    """診断パネル・CLI 用に、全ヒストグラムとカウンタと直近のDNS問い合わせを辞書で返す"""
+    now = time.monotonic()
+    with _lock:
+        histograms = [dict(name=name, labels=dict(labels), **histogram.snapshot(now))
+                      for (name, labels), histogram in sorted(_histograms.items())]
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        recent = list(_recent_queries)
+    return {'enabled': enabled, 'histograms': histograms, 'counters': counters, 'recent_dns_queries': recent}
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+def export_prometheus(prefix='rentalserverchecker_'):
+    """Prometheus のテキスト形式 (exposition format 0.0.4) で書き出す"""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for (h_name, labels), histogram in histograms:
+                if h_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_format_labels(labels)} {histogram.count}")
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for (c_name, labels), value in counters:
+                if c_name == name:
+                    lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,182 @@
+# checkers/models.py
+"""
+チェッカーが返す結果オブジェクト。
+表示用の文字列に整形せず値のまま保持し、UI (Api) やCLIへ渡す直前に serialize() で辞書に変換する。
+__slots__ を使うので、一括チェックで大量に作ってもキャッシュや比較の負担が小さい。
+"""
+
+class _Model:
+    __slots__ = ()
+
+    def to_dict(self):
+        return {name: serialize(getattr(self, name)) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class HostAddress(_Model):
+    """CNAME/MX/NSの参照先ホストを解決したアドレス"""
+    __slots__ = ('type', 'address')
+
+    def __init__(self, type, address):
+        self.type = type
+        self.address = address
+
+class DnsRecord(_Model):
+    """
+    1件のDNSレコード。value は表示用の値、target/preference は CNAME/MX/NS の参照先と優先度、
+    addresses は参照先ホストの A/AAAA。
+    """
+    __slots__ = ('value', 'target', 'preference', 'addresses')
+
+    def __init__(self, value, target=None, preference=None, addresses=None):
+        self.value = value
+        self.target = target
+        self.preference = preference
+        self.addresses = addresses or []
+
+class DnsRecordSet(_Model):
+    """
+    1種別分のレコード。取得できなかった場合は status に理由が入る。
+    failed はタイムアウトなどで値が分からなかったこと (NXDOMAIN/NoAnswer は値が「無い」と分かったので False)。
+    """
+    __slots__ = ('type', 'records', 'ttl', 'status', 'failed')
+
+    def __init__(self, type, records=None, ttl=None, status=None, failed=False):
+        self.type = type
+        self.records = records or []
+        self.ttl = ttl
+        self.status = status
+        self.failed = failed
+
+class PortProbe(_Model):
+    """1ポートへの接続結果。state は open/closed/filtered/error のいずれか。"""
+    __slots__ = ('host', 'ip', 'port', 'state', 'latency_ms', 'error')
+
+    def __init__(self, host, ip, port, state=None, latency_ms=None, error=None):
+        self.host = host
+        self.ip = ip
+        self.port = port
+        self.state = state
+        self.latency_ms = latency_ms
+        self.error = error
+
+class PingProbe(_Model):
+    __slots__ = ('seq', 'rtt_ms')
+
+    def __init__(self, seq, rtt_ms=None):
+        self.seq = seq
+        self.rtt_ms = rtt_ms
+
+class PingStats(_Model):
+    """Pingの結果。method は icmp または tcp:<ポート>。"""
+    __slots__ = ('host', 'ip', 'method', 'probes', 'sent', 'received', 'loss_pct',
+                 'min_ms', 'avg_ms', 'max_ms', 'jitter_ms', 'error')
+
+    def __init__(self, host, ip=None, method=None, probes=None, sent=0, received=0, loss_pct=0.0,
+                 min_ms=None, avg_ms=None, max_ms=None, jitter_ms=None, error=None):
+        self.host = host
+        self.ip = ip
+        self.method = method
+        self.probes = probes or []
+        self.sent = sent
+        self.received = received
+        self.loss_pct = loss_pct
+        self.min_ms = min_ms
+        self.avg_ms = avg_ms
+        self.max_ms = max_ms
+        self.jitter_ms = jitter_ms
+        self.error = error
+
+class TraceHop(_Model):
+    __slots__ = ('ttl', 'address', 'rtts_ms')
+
+    def __init__(self, ttl, address=None, rtts_ms=None):
+        self.ttl = ttl
+        self.address = address
+        self.rtts_ms = rtts_ms or []
+
+class TraceResult(_Model):
+    """
+    Tracerouteの結果。raw ソケットが使えずOSのコマンドで代用した場合は、
+    hops は空で output にコマンドの出力が入る。
+    """
+    __slots__ = ('host', 'ip', 'method', 'reached', 'max_hops', 'hops', 'output', 'error')
+
+    def __init__(self, host, ip=None, method=None, reached=False, max_hops=None, hops=None, output=None, error=None):
+        self.host = host
+        self.ip = ip
+        self.method = method
+        self.reached = reached
+        self.max_hops = max_hops
+        self.hops = hops or []
+        self.output = output
+        self.error = error
+
+class WhoisResult(_Model):
+    """
+    RDAP/Whoisの結果。source が 'rdap' なら data に解析済みのJSON、
+    'whois' なら text にサーバーの応答がそのまま入る。
+    """
+    __slots__ = ('query', 'source', 'server', 'data', 'text', 'error')
+
+    def __init__(self, query, source=None, server=None, data=None, text=None, error=None):
+        self.query = query
+        self.source = source
+        self.server = server
+        self.data = data
+        self.text = text
+        self.error = error
+
+class DnssecLink(_Model):
+    """
+    信頼の連鎖の1つのゾーン。status は secure / insecure / unproven-insecure / bogus / error のいずれか
+    (unproven-insecure は、DSが無いことの証明 (NSEC/NSEC3) が否定応答に付いていなかったもの)。
+    ds は親ゾーンのDS、dnskey はゾーンの鍵 (どちらも '鍵タグ アルゴリズム ...' の文字列)。cached は検証済みの鍵を再利用した場合。
+    """
+    __slots__ = ('zone', 'status', 'ds', 'dnskey', 'detail', 'cached')
+
+    def __init__(self, zone, status=None, ds=None, dnskey=None, detail=None, cached=False):
+        self.zone = zone
+        self.status = status
+        self.ds = ds or []
+        self.dnskey = dnskey or []
+        self.detail = detail
+        self.cached = cached
+
+class DnssecResult(_Model):
+    """
+    DNSSECの検証結果。status は連鎖全体の結果 (secure / insecure / unproven-insecure / bogus / error)、
+    failed_at は連鎖が切れたゾーン、queries は問い合わせたレコードの数 (検証済みのゾーンの分は含まない)。
+    """
+    __slots__ = ('domain', 'status', 'links', 'failed_at', 'queries', 'elapsed', 'error')
+
+    def __init__(self, domain, status=None, links=None, failed_at=None, queries=0, elapsed=None, error=None):
+        self.domain = domain
+        self.status = status
+        self.links = links or []
+        self.failed_at = failed_at
+        self.queries = queries
+        self.elapsed = elapsed
+        self.error = error
+
+def serialize(value):
+    """結果オブジェクトを (入れ子も含めて) JSONにできる辞書・リストへ変換する"""
+    if isinstance(value, _Model):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: serialize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize(item) for item in value]
+    return value
+
+def json_default(value):
+    """json.dumps(default=...) 用。結果オブジェクトだけを辞書に変換する。"""
+    if isinstance(value, _Model):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,195 @@
+# checkers/net_policy.py
+"""
+ネットワーク操作のタイムアウト・再送・遮断の方針。
+全チェッカーはここの値と Deadline / ヘッジの待ち時間 / サーキットブレーカーを使う。
+
+- Deadline: ユーザーの1操作 (nslookup 1回、Whois 1回など) 全体の持ち時間。個々の問い合わせには残り時間を分けて渡す。
+- hedge_delay: 同じ問い合わせを別のネームサーバーへも投げるまでの待ち時間。そのサーバーの直近の応答時間の p95。
+- CircuitBreaker: 失敗が続くサーバーはしばらく問い合わせずにすぐ失敗として扱う。
+"""
+import math
+import threading
+import time
+from collections import deque
+
+# ユーザーの1操作全体の持ち時間 (秒)
+ACTION_DEADLINES = {
+    'nslookup': 5.0,
+    'propagation': 5.0,
+    'whois': 20.0,
+    'email_auth': 10.0,
+    'dkim': 10.0,
+    'dnssec': 10.0,
+}
+DEFAULT_DEADLINE = 10.0
+# 1回の問い合わせ・接続の上限 (秒)。Deadline の残りがこれより短ければ残りの方を使う
+DNS_ATTEMPT_TIMEOUT = 2.0
+# DNSの問い合わせ1件 (再送・ヘッジを含む) の上限
+DNS_LIFETIME = 5.0
+TCP_CONNECT_TIMEOUT = 5.0
+# ポートスキャンの1接続と、Ping/traceroute の1プローブの応答を待つ秒数
+SCAN_CONNECT_TIMEOUT = 3.0
+PROBE_TIMEOUT = 2.0
+WHOIS_TIMEOUT = 10.0
+HTTP_TIMEOUT = 10.0
+# ヘッジ (別のネームサーバーへの同じ問い合わせ) を投げるまでの待ち時間。
+# 応答時間のサンプルが HEDGE_MIN_SAMPLES 件たまるまでは HEDGE_DEFAULT_DELAY を使う
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 8
+HEDGE_DEFAULT_DELAY = 0.5
+HEDGE_MIN_DELAY = 0.02
+HEDGE_MAX_DELAY = 1.0
+LATENCY_SAMPLES = 64
+# 連続して BREAKER_FAILURES 回失敗したサーバーは BREAKER_OPEN_SECONDS 秒のあいだ問い合わせない
+BREAKER_FAILURES = 5
+BREAKER_OPEN_SECONDS = 30.0
+
+class DeadlineExceeded(TimeoutError):
+    """Deadline の持ち時間を使い切った"""
+
+class CircuitOpenError(ConnectionError):
+    """失敗が続いているため、サーバーへの問い合わせを見送った"""
+
+class Deadline:
+    """1操作全体の持ち時間。スレッドをまたいで共有してよい (読むだけなので)。"""
+    __slots__ = ('seconds', 'expires_at')
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def for_action(cls, action):
+        return cls(ACTION_DEADLINES.get(action, DEFAULT_DEADLINE))
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """次の1回の問い合わせに使える秒数 (cap が上限)。使い切っていれば DeadlineExceeded を送出する。"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{self.seconds}秒の持ち時間を使い切りました。")
+        return min(remaining, cap) if cap else remaining
+
+    def share(self, parts, cap=None):
+        """
+        この後に順番に行う parts 回の問い合わせのうち、次の1回に割り当てる秒数。
+        残り時間を均等に分けるので、最初の問い合わせが持ち時間を使い切ることがない。
+        """
+        return min(self.timeout(cap), self.remaining() / max(1, parts))
+
+def resolve_deadline(deadline, action):
+    """deadline が None なら action の既定の持ち時間で作る。数値なら秒数とみなす。"""
+    if deadline is None:
+        return Deadline.for_action(action)
+    if isinstance(deadline, (int, float)):
+        return Deadline(deadline)
+    return deadline
+
+# --- 応答時間とヘッジ ---
+
+_latency_lock = threading.Lock()
+_latencies = {}
+
+def record_latency(server, seconds):
+    """サーバーの応答時間を記録する (ヘッジの待ち時間の計算用)"""
+    with _latency_lock:
+        samples = _latencies.get(server)
+        if samples is None:
+            samples = _latencies[server] = deque(maxlen=LATENCY_SAMPLES)
+        samples.append(seconds)
+
+def hedge_delay(server):
+    """server への問い合わせに応答がなければ、この秒数後に別のサーバーへも同じ問い合わせを投げる"""
+    with _latency_lock:
+        samples = sorted(_latencies.get(server, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    index = max(0, math.ceil(HEDGE_PERCENTILE / 100 * len(samples)) - 1)
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, samples[index]))
+
+# --- サーキットブレーカー ---
+
+class CircuitBreaker:
+    """
+    サーバーごとに連続失敗数を数え、failures 回続いたら open_seconds 秒のあいだ遮断する。
+    遮断が明けたら1回だけ試し (半開)、成功すれば元に戻し、失敗すればまた遮断する。
+    """
+    def __init__(self, failures=BREAKER_FAILURES, open_seconds=BREAKER_OPEN_SECONDS):
+        self.failures = failures
+        self.open_seconds = open_seconds
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def allow(self, server):
+        """server へ問い合わせてよいか"""
+        with self._lock:
+            state = self._state.get(server)
+            if state is None or state['open_until'] is None:
+                return True
+            now = time.monotonic()
+            if now < state['open_until']:
+                return False
+            # 試しの1回が終わるまでは他の問い合わせを通さない (戻ってこなければ open_seconds 後にまた試す)
+            if state['trial_at'] is not None and now - state['trial_at'] < self.open_seconds:
+                return False
+            state['trial_at'] = now
+            return True
+
+    def check(self, server):
+        """遮断中なら CircuitOpenError を送出する"""
+        if not self.allow(server):
+            raise CircuitOpenError(f"{server} は失敗が続いているため、しばらく問い合わせを見送ります。")
+
+    def record_success(self, server):
+        with self._lock:
+            self._state.pop(server, None)
+
+    def record_failure(self, server):
+        with self._lock:
+            state = self._state.setdefault(server, {'failures': 0, 'open_until': None, 'trial_at': None})
+            state['failures'] += 1
+            if state['trial_at'] is None and state['failures'] < self.failures:
+                return
+            if state['open_until'] is None:
+                print(f"WARNING: {server} failed {state['failures']} times in a row; "
+                      f"skipping it for {self.open_seconds} seconds.")
+            state['open_until'] = time.monotonic() + self.open_seconds
+            state['trial_at'] = None
+
+    def stats(self):
+        """遮断中・失敗中のサーバーの一覧"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                server: {
+                    'failures': state['failures'],
+                    'open_for': round(max(0.0, state['open_until'] - now), 1) if state['open_until'] else 0.0,
+                }
+                for server, state in self._state.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._state.clear()
+
+# 全チェッカー共有のブレーカー。キーは 'dns:<IP>' / 'whois:<ホスト>' / 'rdap:<ホスト>'
+breaker = CircuitBreaker()
+
+def get_stats():
+    """診断パネル用に、遮断の状態とヘッジの待ち時間を返す"""
+    with _latency_lock:
+        servers = list(_latencies)
+    return {
+        'breaker': breaker.stats(),
+        'hedge_delay_ms': {server: round(hedge_delay(server) * 1000, 1) for server in servers},
+    }
+
+def reset():
+    breaker.reset()
+    with _latency_lock:
+        _latencies.clear()
@@ -1,33 +1,548 @@
 # checkers/network_checker.py
+import asyncio
+import os
+import select
 import socket
+import struct
 import subprocess
 import locale
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from checkers import net_policy
+from checkers.models import PingProbe, PingStats, PortProbe, TraceHop, TraceResult
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_TIME_EXCEEDED = 11
+
+DEFAULT_PING_COUNT = 4
+# 各プローブの応答を待つ秒数
+DEFAULT_PROBE_TIMEOUT = net_policy.PROBE_TIMEOUT
+# Pingのプローブを送る間隔(秒)。応答を待たずに次を送る
+DEFAULT_PING_INTERVAL = 0.2
+DEFAULT_MAX_HOPS = 30
+# IPヘッダーのTTLの上限 (シーケンス番号の下位8ビットにTTLを入れるので、これを超えるホップ数は扱えない)
+MAX_TTL = 255
+DEFAULT_PROBES_PER_HOP = 3
+# Tracerouteで応答を待っているプローブの上限。
+# 全TTLを一度に送るとルーターのICMPのレート制限に掛かり、ホップが * になりやすい
+DEFAULT_TRACE_WINDOW = 8
+# ICMPが使えない場合に接続時間を測るTCPポート
+TCP_FALLBACK_PORTS = (443, 80)
+# 複数ホストへ同時にPingする上限
+_MAX_PING_WORKERS = 16
+
+# ポートスキャンで名前指定できるポートの組み合わせ
+PORT_PRESETS = {
+    'mail': [25, 465, 587, 110, 143, 993, 995],
+    'web': [80, 443],
+    'ftp': [21, 22],
+    'server': [21, 22, 25, 80, 110, 143, 443, 465, 587, 993, 995],
+}
+# 同時に張る接続数と、1接続あたりの待ち時間(秒)の既定値
+DEFAULT_SCAN_CONCURRENCY = 100
+DEFAULT_CONNECT_TIMEOUT = net_policy.SCAN_CONNECT_TIMEOUT
+# 1回のスキャンで扱う (ホスト, ポート) の組の上限
+MAX_SCAN_TARGETS = 10000
+
+_ident_lock = threading.Lock()
+_next_ident = os.getpid() & 0xFFFF
 
 def _run_command(command):
     try:
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        result = subprocess.run(command, capture_output=True, text=True, encoding=locale.getpreferredencoding(), errors='ignore', startupinfo=startupinfo)
+        kwargs = {}
+        if os.name == 'nt':
+            # Windowsではコンソールウィンドウを表示しない
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+            kwargs['startupinfo'] = startupinfo
+        result = subprocess.run(command, capture_output=True, text=True, encoding=locale.getpreferredencoding(), errors='ignore', **kwargs)
         return result.stdout or result.stderr
     except Exception as e: return f"コマンド実行中にエラーが発生しました: {e}"
 
 def test_port_connection(host, port_str):
-    if not host or not port_str: return "エラー: ホストとポート番号の両方を入力してください。"
+    """1ポートに接続し、結果を PortProbe で返す。入力が不正なら {'error': ...}。"""
+    if not host or not port_str: return {'error': "ホストとポート番号の両方を入力してください。"}
     try:
         port = int(port_str)
         if not (1 <= port <= 65535): raise ValueError("ポート番号は1から65535の間でなければなりません。")
-    except ValueError as e: return f"エラー: 無効なポート番号です。\n{e}"
+    except ValueError as e: return {'error': f"無効なポート番号です。\n{e}"}
+    started = time.perf_counter()
     try:
-        with socket.create_connection((host, port), timeout=5) as sock:
+        with socket.create_connection((host, port), timeout=net_policy.TCP_CONNECT_TIMEOUT) as sock:
             remote_ip = sock.getpeername()[0]
-            return f"✅ 成功: {host} ({remote_ip}) のポート {port} に接続できました。"
-    except Exception as e: return f"❌ 失敗: 予期せぬエラーが発生しました。\n{type(e).__name__}: {e}"
+            return PortProbe(host, remote_ip, port, 'open', round((time.perf_counter() - started) * 1000, 3))
+    # scan_ports と同じく、拒否は closed、応答なしは filtered とし、それ以外の失敗だけを error にする
+    except ConnectionRefusedError:
+        return PortProbe(host, None, port, 'closed', round((time.perf_counter() - started) * 1000, 3))
+    except socket.timeout:
+        return PortProbe(host, None, port, 'filtered')
+    except Exception as e: return PortProbe(host, None, port, 'error', error=f"{type(e).__name__}: {e}")
+
+# --- ポートスキャン ---
+
+def parse_hosts(spec):
+    """カンマ・空白・改行区切りのホスト指定をリストにする (重複は除く)"""
+    if isinstance(spec, (list, tuple)):
+        spec = ' '.join(spec)
+    hosts = []
+    for host in (spec or '').replace(',', ' ').split():
+        if host not in hosts:
+            hosts.append(host)
+    return hosts
+
+def parse_ports(spec):
+    """
+    "25,80,8000-8010,mail" のようなポート指定を、重複のない昇順のリストにする。
+    名前は PORT_PRESETS のキー。不正な指定は ValueError を送出する。
+    """
+    if isinstance(spec, (list, tuple)):
+        spec = ','.join(str(p) for p in spec)
+    ports = set()
+    for token in (spec or '').replace(' ', ',').split(','):
+        token = token.strip().lower()
+        if not token:
+            continue
+        if token in PORT_PRESETS:
+            ports.update(PORT_PRESETS[token])
+            continue
+        try:
+            if '-' in token:
+                start, end = (int(p) for p in token.split('-', 1))
+            else:
+                start = end = int(token)
+        except ValueError:
+            raise ValueError(f"ポート指定 '{token}' を解釈できません。")
+        if not (1 <= start <= end <= 65535):
+            raise ValueError(f"ポート指定 '{token}' は1から65535の範囲でなければなりません。")
+        ports.update(range(start, end + 1))
+    return sorted(ports)
+
+async def _resolve_host(loop, host):
+    """ホストのIPアドレスを1つ返す。IPv4を優先し、解決できなければ None。"""
+    try:
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return None
+    infos.sort(key=lambda info: info[0] != socket.AF_INET)
+    return infos[0][4][0] if infos else None
+
+async def _probe_port(host, ip, port, timeout, semaphore, cancel_event):
+    """1ポートに接続を試み、open/closed/filtered/error のいずれかの状態を返す"""
+    async with semaphore:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        result = PortProbe(host, ip, port)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+            result.latency_ms = round((loop.time() - started) * 1000, 3)
+            result.state = 'open'
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        except ConnectionRefusedError:
+            result.latency_ms = round((loop.time() - started) * 1000, 3)
+            result.state = 'closed'
+        except asyncio.TimeoutError:
+            result.state = 'filtered'
+        except OSError as e:
+            result.state = 'error'
+            result.error = f"{type(e).__name__}: {e}"
+        return result
+
+async def scan_ports_async(hosts, ports, concurrency=DEFAULT_SCAN_CONCURRENCY,
+                           timeout=DEFAULT_CONNECT_TIMEOUT, on_result=None, cancel_event=None):
+    """
+    hosts × ports の全組にTCP接続を試みる。同時接続数は concurrency まで。
+    結果は届いた順に on_result(result) で通知し、最後にホスト・ポート順に並べたリストを返す。
+    """
+    loop = asyncio.get_running_loop()
+    ips = await asyncio.gather(*(_resolve_host(loop, host) for host in hosts))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    results = []
+    tasks = []
+    for host, ip in zip(hosts, ips):
+        if ip is None:
+            for port in ports:
+                result = PortProbe(host, None, port, 'error', error=f"ホスト '{host}' を解決できませんでした。")
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            continue
+        tasks.extend(_probe_port(host, ip, port, timeout, semaphore, cancel_event) for port in ports)
+
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        if result is None:
+            continue
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    order = {host: i for i, host in enumerate(hosts)}
+    results.sort(key=lambda r: (order[r.host], r.port))
+    return results
+
+def scan_ports(hosts, ports, concurrency=DEFAULT_SCAN_CONCURRENCY, timeout=DEFAULT_CONNECT_TIMEOUT,
+               on_result=None, cancel_event=None):
+    """
+    scan_ports_async の同期版。hosts/ports は文字列指定でもよい。
+    戻り値は {'results': [...], 'summary': {...}}、指定が不正なら {'error': ...}。
+    """
+    try:
+        hosts = parse_hosts(hosts)
+        ports = parse_ports(ports)
+    except ValueError as e:
+        return {'error': str(e)}
+    if not hosts or not ports:
+        return {'error': "ホストとポート番号の両方を入力してください。"}
+    if len(hosts) * len(ports) > MAX_SCAN_TARGETS:
+        return {'error': f"一度にスキャンできるのは {MAX_SCAN_TARGETS} 組までです。"}
+
+    started = time.perf_counter()
+    results = asyncio.run(scan_ports_async(hosts, ports, concurrency, timeout, on_result, cancel_event))
+    summary = {'hosts': len(hosts), 'ports': len(ports), 'scanned': len(results),
+               'elapsed': round(time.perf_counter() - started, 3)}
+    for state, key in (('open', 'open'), ('closed', 'closed'), ('filtered', 'filtered'), ('error', 'errors')):
+        summary[key] = sum(1 for r in results if r.state == state)
+    return {'results': results, 'summary': summary}
+
+# --- ICMPエンジン ---
+
+def _new_ident():
+    """同時に走る他のPing/Tracerouteと区別するための識別子を払い出す"""
+    global _next_ident
+    with _ident_lock:
+        _next_ident = (_next_ident + 1) & 0xFFFF
+        return _next_ident
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _build_echo_request(ident, seq):
+    payload = struct.pack('!d', time.perf_counter()) + b'RentalServerChecker'
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+def _open_icmp_socket():
+    """
+    ICMPソケットを開き、(種類, ソケット) を返す。
+    raw ソケットが使えなければ、LinuxなどのICMP用 dgram ソケットを試す。どちらも使えなければ (None, None)。
+    """
+    for kind, sock_type in (('raw', socket.SOCK_RAW), ('dgram', socket.SOCK_DGRAM)):
+        try:
+            return kind, socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except (PermissionError, OSError):
+            continue
+    return None, None
+
+def _parse_icmp(packet, kind):
+    """
+    受信したパケットから (ICMP種別, 識別子, シーケンス番号) を取り出す。
+    Time Exceeded の場合は、中に含まれる元の Echo Request の識別子とシーケンス番号を返す。
+    """
+    if kind == 'raw':
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', packet[:8])
+    if icmp_type == ICMP_TIME_EXCEEDED:
+        inner = packet[8:]
+        if len(inner) < 20:
+            return None
+        inner = inner[(inner[0] & 0x0F) * 4:]
+        if len(inner) < 8:
+            return None
+        _, _, _, ident, seq = struct.unpack('!BBHHH', inner[:8])
+    return icmp_type, ident, seq
+
+def _resolve_ipv4(host):
+    try:
+        return socket.gethostbyname(host)
+    except socket.error:
+        return None
+
+def _tcp_probe(ip, port, timeout):
+    """TCP接続にかかった時間(秒)を返す。接続拒否(RST)も到達できたとみなし、無応答なら None。"""
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            pass
+    except ConnectionRefusedError:
+        pass
+    except OSError:
+        return None
+    return time.perf_counter() - started
+
+def _summarize(rtts):
+    """RTTのリスト(秒、未応答は None)から統計を作る (ミリ秒)"""
+    received = [rtt * 1000 for rtt in rtts if rtt is not None]
+    stats = {
+        'sent': len(rtts),
+        'received': len(received),
+        'loss_pct': round((len(rtts) - len(received)) / len(rtts) * 100, 1) if rtts else 0.0,
+        'min_ms': None, 'avg_ms': None, 'max_ms': None, 'jitter_ms': None,
+    }
+    if received:
+        stats['min_ms'] = round(min(received), 3)
+        stats['avg_ms'] = round(sum(received) / len(received), 3)
+        stats['max_ms'] = round(max(received), 3)
+        # 連続する応答どうしの差の平均をジッターとする
+        diffs = [abs(b - a) for a, b in zip(received, received[1:])]
+        stats['jitter_ms'] = round(sum(diffs) / len(diffs), 3) if diffs else 0.0
+    return stats
+
+def _icmp_ping(sock, kind, ip, count, timeout, interval):
+    """
+    Echo Request を interval 間隔で送り、応答を待たずに次を送る。(RTT(秒)のリスト, 最後の送信エラー) を返す。
+    送れなかったプローブ (経路がないなど) は応答なしとして数える。
+    """
+    ident = _new_ident()
+    sent_at = {}
+    rtts = [None] * count
+    send_error = None
+    next_seq = 0
+    next_send = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if next_seq < count and now >= next_send:
+            sent_at[next_seq] = now
+            try:
+                sock.sendto(_build_echo_request(ident, next_seq), (ip, 0))
+            except OSError as e:
+                send_error = e
+            next_seq += 1
+            next_send = now + interval
+            continue
+        last_deadline = sent_at[next_seq - 1] + timeout
+        if next_seq >= count and (now >= last_deadline or all(r is not None for r in rtts)):
+            break
+        wait = last_deadline - now if next_seq >= count else next_send - now
+        readable, _, _ = select.select([sock], [], [], max(0, wait))
+        if not readable:
+            continue
+        try:
+            packet, addr = sock.recvfrom(2048)
+        except OSError:
+            continue
+        received_at = time.perf_counter()
+        parsed = _parse_icmp(packet, kind)
+        if parsed is None or addr[0] != ip:
+            continue
+        icmp_type, reply_ident, seq = parsed
+        # dgram ソケットでは識別子がカーネルに書き換えられるため照合しない
+        if icmp_type != ICMP_ECHO_REPLY or (kind == 'raw' and reply_ident != ident):
+            continue
+        if seq in sent_at and rtts[seq] is None and received_at - sent_at[seq] <= timeout:
+            rtts[seq] = received_at - sent_at[seq]
+    return rtts, send_error
+
+def _system_icmp_ping(ip, count, timeout, interval):
+    """
+    OSのICMP API (Windowsの IcmpSendEcho) で1回ずつPingし、RTT(秒)のリストを返す。管理者権限は要らない。
+    Windows以外や、APIが使えなければ None。
+    """
+    if os.name != 'nt':
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+        iphlpapi = ctypes.WinDLL('iphlpapi')
+    except (ImportError, OSError, AttributeError):
+        return None
+
+    class _IpOptions(ctypes.Structure):
+        _fields_ = [('Ttl', ctypes.c_ubyte), ('Tos', ctypes.c_ubyte), ('Flags', ctypes.c_ubyte),
+                    ('OptionsSize', ctypes.c_ubyte), ('OptionsData', ctypes.c_void_p)]
+
+    class _EchoReply(ctypes.Structure):
+        _fields_ = [('Address', wintypes.ULONG), ('Status', wintypes.ULONG), ('RoundTripTime', wintypes.ULONG),
+                    ('DataSize', wintypes.USHORT), ('Reserved', wintypes.USHORT), ('Data', ctypes.c_void_p),
+                    ('Options', _IpOptions)]
+
+    iphlpapi.IcmpCreateFile.restype = wintypes.HANDLE
+    iphlpapi.IcmpCloseHandle.argtypes = [wintypes.HANDLE]
+    iphlpapi.IcmpSendEcho.argtypes = [wintypes.HANDLE, wintypes.ULONG, ctypes.c_void_p, wintypes.WORD,
+                                      ctypes.c_void_p, ctypes.c_void_p, wintypes.DWORD, wintypes.DWORD]
+    iphlpapi.IcmpSendEcho.restype = wintypes.DWORD
+    handle = iphlpapi.IcmpCreateFile()
+    if not handle or handle == wintypes.HANDLE(-1).value:
+        return None
+
+    address = struct.unpack('=I', socket.inet_aton(ip))[0]
+    payload = b'RentalServerChecker'
+    # 応答の構造体・データに加え、ICMPエラーが返った場合の分の余裕を持たせる
+    reply_size = ctypes.sizeof(_EchoReply) + len(payload) + 8 + 64
+    reply_buffer = ctypes.create_string_buffer(reply_size)
+    rtts = [None] * count
+    try:
+        for seq in range(count):
+            started = time.perf_counter()
+            replies = iphlpapi.IcmpSendEcho(handle, address, payload, len(payload), None,
+                                            reply_buffer, reply_size, max(1, int(timeout * 1000)))
+            elapsed = time.perf_counter() - started
+            reply = _EchoReply.from_buffer(reply_buffer)
+            # Status 0 (IP_SUCCESS) で、宛先からの Echo Reply
+            if replies and reply.Status == 0 and reply.Address == address:
+                rtts[seq] = reply.RoundTripTime / 1000 if reply.RoundTripTime else elapsed
+            if seq < count - 1 and elapsed < interval:
+                time.sleep(interval - elapsed)
+    finally:
+        iphlpapi.IcmpCloseHandle(handle)
+    return rtts
+
+def ping_host(host, count=DEFAULT_PING_COUNT, timeout=DEFAULT_PROBE_TIMEOUT,
+              interval=DEFAULT_PING_INTERVAL, tcp_ports=TCP_FALLBACK_PORTS):
+    """
+    外部コマンドを使わずにPingし、プローブごとのRTTと統計を PingStats で返す。
+    ICMPソケットが開けない(権限がない)場合は、OSのICMP API (WindowsのIcmpSendEcho) を使い、
+    それも使えなければ tcp_ports へのTCP接続時間で代用する。
+    """
+    if not host: return PingStats(host, error="ホストを入力してください。")
+    count = max(1, int(count))
+    ip = _resolve_ipv4(host)
+    if ip is None:
+        return PingStats(host, error=f"ホスト '{host}' を解決できませんでした。")
+
+    error = None
+    kind, sock = _open_icmp_socket()
+    if sock is not None:
+        with sock:
+            rtts, send_error = _icmp_ping(sock, kind, ip, count, timeout, interval)
+        method = 'icmp'
+        if send_error is not None and not any(rtt is not None for rtt in rtts):
+            error = f"Echo Request を送信できませんでした: {send_error}"
+    else:
+        rtts = _system_icmp_ping(ip, count, timeout, interval)
+        method = 'icmp'
+    if rtts is None:
+        rtts = [None] * count
+        method = 'tcp'
+        for port in tcp_ports:
+            # 最初に応答のあったポートで残りのプローブも測る
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                rtts = list(executor.map(lambda _: _tcp_probe(ip, port, timeout), range(count)))
+            if any(rtt is not None for rtt in rtts):
+                method = f'tcp:{port}'
+                break
+
+    probes = [PingProbe(seq, round(rtt * 1000, 3) if rtt is not None else None) for seq, rtt in enumerate(rtts)]
+    return PingStats(host, ip, method, probes, error=error, **_summarize(rtts))
+
+def ping_many(hosts, **kwargs):
+    """複数ホストへ同時にPingし、hosts と同じ順で結果を返す"""
+    if not hosts:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_MAX_PING_WORKERS, len(hosts))) as executor:
+        return list(executor.map(lambda host: ping_host(host, **kwargs), hosts))
+
+def trace_route(host, max_hops=DEFAULT_MAX_HOPS, timeout=DEFAULT_PROBE_TIMEOUT,
+                probes_per_hop=DEFAULT_PROBES_PER_HOP, window=DEFAULT_TRACE_WINDOW):
+    """
+    TTLを変えたプローブを、応答待ちが window 件を超えないように送り、ホップごとの応答元とRTTを TraceResult で返す。
+    1巡目で全TTLを1回ずつ送ってから2巡目に入るので、同じルーターへのプローブは間があく。
+    宛先に届いたTTLより先のプローブは送らない。各プローブは timeout 秒で応答を諦める。
+    max_hops は 1〜MAX_TTL に収める。送れなかったプローブは応答なしとして扱う。
+    Time Exceeded を受け取るには raw ソケットが必要なため、開けない場合は None を返す。
+    """
+    max_hops = max(1, min(MAX_TTL, int(max_hops)))
+    ip = _resolve_ipv4(host)
+    if ip is None:
+        return TraceResult(host, error=f"ホスト '{host}' を解決できませんでした。")
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    except (PermissionError, OSError):
+        return None
+
+    ident = _new_ident()
+    sent_at = {}
+    in_flight = {}
+    pending = deque((probe, ttl) for probe in range(probes_per_hop) for ttl in range(1, max_hops + 1))
+    hops = {ttl: TraceHop(ttl, rtts_ms=[None] * probes_per_hop) for ttl in range(1, max_hops + 1)}
+    reached_ttl = None
+    send_error = None
+    with sock:
+        while True:
+            now = time.perf_counter()
+            for seq in [seq for seq, sent in in_flight.items() if now - sent >= timeout]:
+                del in_flight[seq]
+            while pending and len(in_flight) < max(1, window):
+                probe, ttl = pending.popleft()
+                if reached_ttl is not None and ttl > reached_ttl:
+                    continue
+                seq = (probe << 8) | ttl
+                try:
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                    sent_at[seq] = in_flight[seq] = time.perf_counter()
+                    sock.sendto(_build_echo_request(ident, seq), (ip, 0))
+                except OSError as e:
+                    send_error = e
+                    in_flight.pop(seq, None)
+            if not in_flight:
+                break
+            wait = min(in_flight.values()) + timeout - time.perf_counter()
+            readable, _, _ = select.select([sock], [], [], max(0.0, wait))
+            if not readable:
+                continue
+            try:
+                packet, addr = sock.recvfrom(2048)
+            except OSError:
+                continue
+            received_at = time.perf_counter()
+            parsed = _parse_icmp(packet, 'raw')
+            if parsed is None:
+                continue
+            icmp_type, reply_ident, seq = parsed
+            if reply_ident != ident or seq not in sent_at:
+                continue
+            if icmp_type == ICMP_ECHO_REPLY and addr[0] != ip:
+                continue
+            if icmp_type not in (ICMP_ECHO_REPLY, ICMP_TIME_EXCEEDED):
+                continue
+            in_flight.pop(seq, None)
+            probe, ttl = seq >> 8, seq & 0xFF
+            hop = hops[ttl]
+            hop.address = hop.address or addr[0]
+            hop.rtts_ms[probe] = round((received_at - sent_at[seq]) * 1000, 3)
+            if icmp_type == ICMP_ECHO_REPLY:
+                reached_ttl = ttl if reached_ttl is None else min(reached_ttl, ttl)
+            # 宛先までの全ホップ・全プローブが揃ったら待たずに終える
+            if reached_ttl is not None and all(
+                    None not in hops[t].rtts_ms for t in range(1, reached_ttl + 1)):
+                break
+
+    last_ttl = reached_ttl or max_hops
+    error = None
+    if send_error is not None and not any(hop.address for hop in hops.values()):
+        error = f"プローブを送信できませんでした: {send_error}"
+    return TraceResult(host, ip, 'icmp', reached_ttl is not None, max_hops,
+                       [hops[ttl] for ttl in range(1, last_ttl + 1)], error=error)
+
+# --- UIからの呼び出し ---
 
 def ping(host):
-    if not host: return "エラー: ホストを入力してください。"
-    return _run_command(['ping', '-n', '4', host])
+    return ping_host(host)
 
 def traceroute(host):
-    if not host: return "エラー: ホストを入力してください。"
-    return _run_command(['tracert', host])
+    if not host: return TraceResult(host, error="ホストを入力してください。")
+    result = trace_route(host)
+    if result is None:
+        # raw ソケットが使えない環境ではOSのコマンドに任せる
+        output = _run_command(['tracert', host] if os.name == 'nt' else ['traceroute', host])
+        return TraceResult(host, method='command', output=output)
+    return result
@@ -1,6 +1,8 @@
 # checkers/update_checker.py
 import urllib.request
 
+from checkers import net_policy
+
 def _compare_versions(v1, v2):
     """バージョン文字列 (例: '1.0.10') を数値として正しく比較する"""
     parts1 = [int(p) for p in v1.split('.')]
@@ -17,7 +19,7 @@ def check(current_version, version_url, window):
             return # ローカルバージョンが読めなければ何もしない
 
         print(f"INFO: Checking for updates from {version_url}")
-        with urllib.request.urlopen(version_url, timeout=5) as response:
+        with urllib.request.urlopen(version_url, timeout=net_policy.HTTP_TIMEOUT) as response:
             if response.status == 200:
                 latest_version = response.read().decode('utf-8').strip()
                 print(f"INFO: Current version: {current_version}, Latest version: {latest_version}")
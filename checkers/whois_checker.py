@@ -1,102 +1,410 @@
 # whois_checker.py
-import socket
+import http.client
+import ipaddress
 import json
-import urllib.request # 標準のHTTPライブラリを使用
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
 
-def _format_rdap_json(data):
-    """受け取ったJSONデータを人間が読みやすい形式の文字列に整形する"""
-    try:
-        parsed_json = json.loads(data)
-        return json.dumps(parsed_json, indent=4, ensure_ascii=False)
-    except json.JSONDecodeError:
-        return data
+from checkers import app_paths, net_policy
+from checkers.models import WhoisResult
+from checkers.ttl_cache import TTLCache
+
+# IANAのRDAPブートストラップ (RFC 9224 の dns.json)
+RDAP_BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+BOOTSTRAP_CACHE_FILE = 'rdap_bootstrap.json'
+# ブートストラップを取り直すまでの秒数
+BOOTSTRAP_MAX_AGE = 7 * 24 * 3600
+# ブートストラップの取得に失敗してから、次に取り直しを試みるまでの秒数
+BOOTSTRAP_RETRY_INTERVAL = 5 * 60
+IANA_WHOIS_SERVER = "whois.iana.org"
+WHOIS_PORT = 43
+# Whois応答の上限バイト数と、参照先(レジストラ)をたどる回数の上限
+MAX_RESPONSE_SIZE = 1024 * 1024
+MAX_REFERRALS = 2
+# 同じWhoisサーバーへ問い合わせる最短間隔(秒)。一括チェックで遮断されないようにする
+WHOIS_MIN_INTERVAL = 1.0
+# TLD→Whoisサーバーの対応を覚えておく秒数
+WHOIS_SERVER_TTL = 24 * 3600
+# Whois/RDAPの応答をキャッシュする件数と秒数
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 3600
+
+_ssl_context = ssl.create_default_context()
+_bootstrap = None
+_bootstrap_loaded_at = 0
+_bootstrap_retry_at = 0
+_bootstrap_lock = threading.Lock()
+
+class _RateLimiter:
+    """サーバーごとに、問い合わせの間隔を min_interval 秒以上あける"""
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, server, max_wait=None):
+        """問い合わせてよい時刻まで待つ。max_wait 秒より長く待つ必要があれば、待たずに False を返す。"""
+        with self._lock:
+            now = time.monotonic()
+            allowed_at = max(now, self._next_allowed.get(server, 0))
+            if max_wait is not None and allowed_at - now > max_wait:
+                return False
+            self._next_allowed[server] = allowed_at + self.min_interval
+        if allowed_at > now:
+            time.sleep(allowed_at - now)
+        return True
 
-def _query_whois(server, query):
-    """指定されたサーバーにWhoisクエリを送信し、応答を取得します。"""
+_rate_limiter = _RateLimiter(WHOIS_MIN_INTERVAL)
+
+def configure(min_interval=WHOIS_MIN_INTERVAL):
+    """同じWhoisサーバーへの問い合わせ間隔 (秒) を変える。ローカルのテスト用のサーバーなら 0 にしてよい。"""
+    _rate_limiter.min_interval = min_interval
+# TLD(IPの場合はブロック)→Whoisサーバー と、Whois/RDAPの応答全体のキャッシュ
+_server_cache = TTLCache(512)
+_result_cache = TTLCache(RESULT_CACHE_SIZE)
+
+def _query_whois(server, query, deadline, parts=1):
+    """
+    指定されたサーバーにWhoisクエリを送信し、応答を取得します。
+    使える時間は deadline の残りを、この後に続く parts 回の問い合わせで分けた分で、応答全体をその間に読み切ります。
+    """
+    breaker_key = f"whois:{server}"
+    try:
+        net_policy.breaker.check(breaker_key)
+        if not _rate_limiter.wait(server, deadline.remaining()):
+            raise net_policy.DeadlineExceeded(f"{server} への問い合わせ間隔をあける時間が残っていません。")
+        timeout = deadline.share(parts, net_policy.WHOIS_TIMEOUT)
+    except OSError as e:
+        return f"Error: Failed to connect to {server}. {e}"
+    expires_at = time.monotonic() + timeout
     try:
-        with socket.create_connection((server, 43), timeout=10) as sock:
+        with socket.create_connection((server, WHOIS_PORT), timeout=timeout) as sock:
             sock.sendall(query)
-            response_bytes = b""
-            while True:
+            response_bytes = bytearray()
+            while len(response_bytes) < MAX_RESPONSE_SIZE:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout(f"{timeout:.1f}秒以内に応答を読み切れませんでした。")
+                sock.settimeout(remaining)
                 data = sock.recv(4096)
                 if not data:
                     break
                 response_bytes += data
-            return response_bytes.decode("utf-8", errors="ignore")
     except socket.error as e:
+        net_policy.breaker.record_failure(breaker_key)
         return f"Error: Failed to connect to {server}. {e}"
+    net_policy.breaker.record_success(breaker_key)
+    truncated = len(response_bytes) >= MAX_RESPONSE_SIZE
+    text = bytes(response_bytes[:MAX_RESPONSE_SIZE]).decode("utf-8", errors="ignore")
+    if truncated:
+        text += f"\n(応答が {MAX_RESPONSE_SIZE} バイトを超えたため、以降を省略しました)"
+    return text
 
-def _get_whois_server(domain):
-    """ドメインのWhoisサーバーをiana.orgに問い合わせて特定します。"""
-    response_iana = _query_whois("whois.iana.org", f"{domain}\r\n".encode("utf-8"))
+# IANAがIPv6をRIRに割り当てている単位。2001::/16 の中は /23、それ以外 (2400::/12 など) は /12
+_IPV6_FINE_BLOCK = ipaddress.ip_network('2001::/16')
+
+def _server_cache_key(query):
+    """
+    IANAへの問い合わせ単位を返す。ドメインはTLD、IPv4は/8、IPv6はIANAの割り当てブロック (/12 か /23) 単位で
+    Whoisサーバーが決まる。
+    """
+    try:
+        address = ipaddress.ip_address(query)
+    except ValueError:
+        tld = query.rstrip('.').split('.')[-1].lower()
+        return tld, tld
+    if address.version == 4:
+        return f"ipv4:{query.split('.')[0]}", query
+    prefix = 23 if address in _IPV6_FINE_BLOCK else 12
+    return f"ipv6:{ipaddress.ip_network(f'{address}/{prefix}', strict=False)}", query
+
+def _get_whois_server(domain, deadline):
+    """ドメインのWhoisサーバーをiana.orgに問い合わせて特定します。結果はTLD単位で覚えておきます。"""
+    cache_key, iana_query = _server_cache_key(domain)
+    cached = _server_cache.get(cache_key)
+    if cached is not None:
+        return cached or None
+
+    # この後にレジストリと参照先への問い合わせが続くので、残り時間の1/3までにする
+    response_iana = _query_whois(IANA_WHOIS_SERVER, f"{iana_query}\r\n".encode("utf-8"), deadline, parts=3)
+    if response_iana.startswith("Error:"):
+        return None
+    server = ""
     for line in response_iana.splitlines():
         if line.strip().startswith("whois:"):
-            return line.split(":", 1)[1].strip()
+            server = line.split(":", 1)[1].strip()
+            break
+    # 見つからなかった場合も空文字として覚え、しばらく問い合わせない
+    _server_cache.put(cache_key, server, WHOIS_SERVER_TTL)
+    return server or None
+
+def _find_referral(response):
+    """レジストリの応答から、レジストラ等の参照先Whoisサーバーを取り出す"""
+    for line in response.splitlines():
+        key, _, value = line.strip().partition(":")
+        key = key.strip().lower()
+        value = value.strip()
+        if not value:
+            continue
+        if key in ("registrar whois server", "whois server"):
+            return value.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0].lower()
+        if key == "referralserver" and value.startswith("whois://"):
+            return value[len("whois://"):].split("/", 1)[0].split(":", 1)[0].lower()
     return None
 
-def _query_rdap(domain):
-    """ドメインのRDAP情報を取得します (urllib.request版)"""
-    tld = domain.split('.')[-1].lower()
-    bootstrap_url = f"https://rdap.iana.org/domain/{tld}" # IANAのエンドポイントを使用
-    
+def _query_whois_chain(server, domain, deadline):
+    """Whoisサーバーに問い合わせ、参照先(Registrar WHOIS Server等)があれば MAX_REFERRALS 回まで続けて問い合わせる"""
+    query = f"{domain}\r\n".encode("utf-8")
+    response = _query_whois(server, query, deadline, parts=2)
+    visited = {server.lower()}
+    for i in range(MAX_REFERRALS):
+        if response.startswith("Error:"):
+            break
+        referral = _find_referral(response.split("\n\n--- ")[-1])
+        if not referral or referral in visited:
+            break
+        visited.add(referral)
+        print(f"INFO: Following Whois referral to {referral}...")
+        referred = _query_whois(referral, query, deadline, parts=MAX_REFERRALS - i)
+        response += f"\n\n--- {referral} からの応答 ---\n{referred}"
+    return response
+
+class _HTTPConnectionPool:
+    """
+    ホストごとにKeep-Alive接続を使い回す簡易コネクションプール。
+    同じRDAPサーバーへの2回目以降の問い合わせでは、TCP/TLSの接続を張り直さない。
+    """
+    def __init__(self, max_idle_per_host=4, timeout=net_policy.HTTP_TIMEOUT):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, scheme, netloc, timeout):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=timeout, context=_ssl_context)
+        return http.client.HTTPConnection(netloc, timeout=timeout)
+
+    def _acquire(self, scheme, netloc, timeout):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self._connect(scheme, netloc, timeout), False
+
+    def _release(self, scheme, netloc, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def get(self, url, headers=None, max_redirects=3, timeout=None):
+        """
+        GETリクエストを送り、(ステータス, 本文) を返す。リダイレクトは max_redirects 回まで追う。
+        timeout は接続と1回の読み込みの待ち時間 (省略時はプールの既定値)。0 以下なら問い合わせずに DeadlineExceeded。
+        """
+        if timeout is None:
+            timeout = self.timeout
+        elif timeout <= 0:
+            raise net_policy.DeadlineExceeded(f"{url} に問い合わせる時間が残っていません。")
+        for _ in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            status, location, body = self._request(parts.scheme, parts.netloc, path, headers or {}, timeout)
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            return status, body
+        return status, body
+
+    def _request(self, scheme, netloc, path, headers, timeout):
+        conn, reused = self._acquire(scheme, netloc, timeout)
+        try:
+            return self._send(scheme, netloc, conn, path, headers, timeout)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not reused:
+                raise
+            # 使い回した接続がサーバー側で切られていた場合だけ、新しく張った接続で1回やり直す
+            # (タイムアウトはやり直さない。持ち時間を二重に使ってしまうため)
+            return self._send(scheme, netloc, self._connect(scheme, netloc, timeout), path, headers, timeout)
+
+    def _send(self, scheme, netloc, conn, path, headers, timeout):
+        # 使い回す接続にも、今回の問い合わせの待ち時間を設定し直す
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(scheme, netloc, conn)
+        return response.status, response.getheader('Location'), body
+
+_pool = _HTTPConnectionPool()
+
+def _read_bootstrap_file(path):
     try:
-        # 1. IANAに問い合わせて、権威RDAPサーバーのURLを取得
-        with urllib.request.urlopen(bootstrap_url) as response:
-            if response.status != 200:
-                return f"Error: IANA bootstrap failed with status {response.status}"
-            bootstrap_data = json.loads(response.read())
-        
-        # linksの中からRDAPサーバーのベースURLを探す
-        rdap_base_url = None
-        if 'links' in bootstrap_data:
-            for link in bootstrap_data['links']:
-                if link.get('rel') == 'related' and 'href' in link:
-                    rdap_base_url = link['href']
-                    break
-        
-        if not rdap_base_url:
-            return f"Error: No RDAP URL found for .{tld} in IANA response"
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _parse_bootstrap(data):
+    """IANAのRDAPブートストラップ (dns.json) を {TLD: [RDAPベースURL]} の辞書にする (RFC 9224)"""
+    services = {}
+    for entry in data.get('services', []):
+        if len(entry) < 2:
+            continue
+        tlds, urls = entry[0], entry[1]
+        # https のURLを優先する
+        urls = sorted(urls, key=lambda u: not u.startswith('https://'))
+        for tld in tlds:
+            services[tld.lower()] = urls
+    return services
+
+def _load_bootstrap(timeout=None):
+    """
+    TLD→RDAPサーバーの対応表を返す。timeout はIANAから取得する場合の待ち時間。
+    メモリ → ディスク (BOOTSTRAP_MAX_AGE 以内) → IANA の順に探し、取得できなければ古いディスクの内容を使う。
+    取得に失敗した後 BOOTSTRAP_RETRY_INTERVAL 秒は、IANAに取り直しに行かない。
+    """
+    global _bootstrap, _bootstrap_loaded_at, _bootstrap_retry_at
+    with _bootstrap_lock:
+        if _bootstrap is not None and time.time() - _bootstrap_loaded_at < BOOTSTRAP_MAX_AGE:
+            return _bootstrap
+        if time.time() < _bootstrap_retry_at:
+            return _bootstrap or {}
+
+        cache_path = os.path.join(app_paths.get_cache_dir(), BOOTSTRAP_CACHE_FILE)
+        cached = _read_bootstrap_file(cache_path)
+        if cached and time.time() - cached.get('fetched_at', 0) < BOOTSTRAP_MAX_AGE:
+            _bootstrap, _bootstrap_loaded_at = cached['services'], cached['fetched_at']
+            return _bootstrap
+
+        try:
+            print(f"INFO: Fetching RDAP bootstrap from {RDAP_BOOTSTRAP_URL}")
+            status, body = _pool.get(RDAP_BOOTSTRAP_URL, timeout=timeout)
+            if status != 200:
+                raise ValueError(f"status {status}")
+            services = _parse_bootstrap(json.loads(body))
+            fetched_at = time.time()
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump({'fetched_at': fetched_at, 'services': services}, f)
+            except OSError as e:
+                print(f"WARNING: Could not save RDAP bootstrap cache: {e}")
+            _bootstrap, _bootstrap_loaded_at = services, fetched_at
+        except Exception as e:
+            print(f"ERROR: Failed to fetch RDAP bootstrap: {e}")
+            # 持ち時間が残っていなかっただけなら、次の問い合わせですぐ取り直す
+            if not isinstance(e, net_policy.DeadlineExceeded):
+                _bootstrap_retry_at = time.time() + BOOTSTRAP_RETRY_INTERVAL
+            if not cached:
+                return {}
+            # 古い内容は取得した時刻のまま使い、取り直しは短い間隔で試みる
+            _bootstrap, _bootstrap_loaded_at = cached['services'], cached.get('fetched_at', 0)
+        return _bootstrap
+
+def _query_rdap(domain, deadline):
+    """
+    ドメインのRDAP情報を取得します (ブートストラップはキャッシュ、接続はプールから)。
+    失敗したらWhoisに切り替えるので、使うのは deadline の残りの半分までです。
+    """
+    tld = domain.rstrip('.').split('.')[-1].lower()
+
+    try:
+        # 1. キャッシュしたブートストラップから、権威RDAPサーバーのURLを取得
+        rdap_urls = _load_bootstrap(deadline.share(2, net_policy.HTTP_TIMEOUT)).get(tld)
+        if not rdap_urls:
+            return f"Error: No RDAP URL found for .{tld} in IANA bootstrap"
 
         # 2. 取得したURLを使って、実際のRDAPサーバーに問い合わせ
+        rdap_base_url = rdap_urls[0]
         if not rdap_base_url.endswith('/'):
             rdap_base_url += '/'
-        
+
         final_rdap_url = f"{rdap_base_url}domain/{domain}"
-        
-        req = urllib.request.Request(
-            final_rdap_url,
-            headers={'Accept': 'application/rdap+json'}
-        )
-
-        with urllib.request.urlopen(req) as response:
-            if response.status != 200:
-                return f"Error: RDAP server failed with status {response.status}"
-            return response.read().decode('utf-8', 'ignore')
-
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
+        breaker_key = f"rdap:{urllib.parse.urlsplit(final_rdap_url).netloc}"
+        net_policy.breaker.check(breaker_key)
+        try:
+            status, body = _pool.get(final_rdap_url, headers={'Accept': 'application/rdap+json'},
+                                     timeout=deadline.share(2, net_policy.HTTP_TIMEOUT))
+        except Exception:
+            net_policy.breaker.record_failure(breaker_key)
+            raise
+        if status >= 500:
+            net_policy.breaker.record_failure(breaker_key)
+        else:
+            net_policy.breaker.record_success(breaker_key)
+
+        if status == 404:
             return f"RDAP Error: {domain} not found on the server."
-        return f"Error: RDAP HTTP query failed. Code: {e.code}, Reason: {e.reason}"
+        if status != 200:
+            return f"Error: RDAP HTTP query failed. Code: {status}"
+        return body.decode('utf-8', 'ignore')
+
     except Exception as e:
         return f"Error: RDAP query failed. {e}"
 
-def get_whois_info(domain):
+def get_whois_info(domain, deadline=None):
     """
     まずRDAPで問い合わせ、失敗したら従来のWhoisにフォールバックします。
+    結果は WhoisResult で返し、成功した応答は RESULT_CACHE_TTL 秒の間キャッシュから返します。
+    全体の持ち時間は deadline (省略時は net_policy の 'whois' の値) で、RDAPとWhoisの各問い合わせに分けて使います。
     """
+    if not domain: return WhoisResult(domain, error="ドメイン名またはIPアドレスを入力してください。")
+    cache_key = domain.strip().rstrip('.').lower()
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        print(f"INFO: Whois result for {domain} served from cache.")
+        return cached
+
+    deadline = net_policy.resolve_deadline(deadline, 'whois')
     print(f"INFO: Performing RDAP lookup for {domain}...")
-    rdap_info = _query_rdap(domain)
-    
+    rdap_info = _query_rdap(domain, deadline)
+
     if rdap_info and rdap_info.strip().startswith('{'):
-        print("INFO: RDAP lookup successful.")
-        return _format_rdap_json(rdap_info)
-    
+        try:
+            result = WhoisResult(domain, 'rdap', data=json.loads(rdap_info))
+            print("INFO: RDAP lookup successful.")
+            _result_cache.put(cache_key, result, RESULT_CACHE_TTL)
+            return result
+        except ValueError:
+            rdap_info = "Error: RDAP response was not valid JSON."
+
     print(f"INFO: RDAP failed or not supported, falling back to legacy Whois.")
     print(f"(RDAP message: {rdap_info})")
-    
-    whois_server = _get_whois_server(domain)
+
+    whois_server = _get_whois_server(domain, deadline)
     if not whois_server:
-        return f"Error: {domain} のWhoisサーバーを特定できませんでした。"
+        return WhoisResult(domain, error=f"{domain} のWhoisサーバーを特定できませんでした。")
 
     print(f"INFO: Performing legacy Whois lookup via {whois_server}...")
-    return _query_whois(whois_server, f"{domain}\r\n".encode("utf-8"))
+    text = _query_whois_chain(whois_server, domain, deadline)
+    if text.startswith("Error:"):
+        return WhoisResult(domain, 'whois', whois_server, error=text)
+    result = WhoisResult(domain, 'whois', whois_server, text=text)
+    _result_cache.put(cache_key, result, RESULT_CACHE_TTL)
+    return result
+
+def get_cache_stats():
+    """Whoisサーバー対応表と応答キャッシュの統計を返す"""
+    return {'servers': _server_cache.stats(), 'results': _result_cache.stats()}
+
+def clear_cache():
+    _server_cache.clear()
+    _result_cache.clear()
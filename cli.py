@@ -0,0 +1,233 @@
+# cli.py
+"""
+ウィンドウを使わずに各チェックを実行するコマンドライン/ライブラリ用の入口。
+pywebview・api.py・logger_setup は読み込まず、コマンドに必要なチェッカーだけを実行時に import する。
+
+    python cli.py nslookup example.com --server 8.8.8.8
+    python cli.py --format ndjson port example.com mail,web
+    python cli.py ping 8.8.8.8 1.1.1.1
+    python cli.py whois example.jp
+    python cli.py email-auth example.com --selector google
+    python cli.py dnssec example.jp
+    python cli.py dkim-stats
+"""
+import time
+
+_STARTED = time.perf_counter()
+# 起動(コマンド振り分けまで)にかける時間の目標。--timings で超えたら警告する
+STARTUP_TARGET_MS = 50
+
+import argparse
+import importlib
+import json
+import sys
+
+_import_seconds = 0.0
+
+def _checker(name):
+    """チェッカーモジュールを必要になった時点で読み込む (読み込み時間は --timings で表示)"""
+    global _import_seconds
+    started = time.perf_counter()
+    module = importlib.import_module(f'checkers.{name}')
+    _import_seconds += time.perf_counter() - started
+    return module
+
+def _nslookup(args, emit):
+    dns_checker = _checker('dns_checker')
+    for domain in args.targets:
+        emit(domain, dns_checker.nslookup(domain, args.server, timeout=args.timeout))
+
+def _propagation(args, emit):
+    dns_checker = _checker('dns_checker')
+    for domain in args.targets:
+        emit(domain, dns_checker.check_propagation(domain, timeout=args.timeout))
+
+def _port(args, emit):
+    network_checker = _checker('network_checker')
+    # ndjson では届いたポートから1行ずつ出力する
+    on_result = (lambda r: emit(f"{r.host}:{r.port}", r)) if args.format == 'ndjson' else None
+    result = network_checker.scan_ports(args.hosts, args.ports, concurrency=args.concurrency,
+                                        timeout=args.timeout, on_result=on_result)
+    if on_result is None or 'error' in result:
+        emit(args.hosts, result)
+
+def _ping(args, emit):
+    network_checker = _checker('network_checker')
+    for host, result in zip(args.targets, network_checker.ping_many(args.targets, count=args.count)):
+        emit(host, result)
+
+def _traceroute(args, emit):
+    network_checker = _checker('network_checker')
+    models = _checker('models')
+    for host in args.targets:
+        result = network_checker.trace_route(host, max_hops=args.max_hops)
+        if result is None:
+            result = models.TraceResult(host, error="raw ソケットを開く権限がないため、Tracerouteを実行できません。")
+        emit(host, result)
+
+def _whois(args, emit):
+    whois_checker = _checker('whois_checker')
+    for query in args.targets:
+        emit(query, whois_checker.get_whois_info(query))
+
+def _email_auth(args, emit):
+    email_auth_checker = _checker('email_auth_checker')
+    for domain in args.targets:
+        emit(domain, email_auth_checker.check_email_auth(domain, args.selector))
+
+def _dnssec(args, emit):
+    dnssec_checker = _checker('dnssec_checker')
+    for domain in args.targets:
+        emit(domain, dnssec_checker.validate_chain(domain, args.server, args.port, timeout=args.timeout,
+                                                   trust_anchors=args.trust_anchor))
+
+def _dkim_stats(args, emit):
+    dkim_checker = _checker('dkim_checker')
+    emit('dkim', dkim_checker.get_selector_stats(top=args.top))
+
+def _propagation_failed(result):
+    return any(server.get('error') or any(entry.get('status') == 'error' for entry in server['records'].values())
+               for server in result.get('servers', []))
+
+# コマンドごとの、結果に失敗が含まれるかの判定 (トップレベルの error はすべてのコマンドで見る)。
+# 値が「無い」と分かったもの (NXDOMAIN、DNSSECの insecure、ポートの closed/filtered など) は失敗ではない
+_FAILURE_CHECKS = {
+    'nslookup': lambda result: any(record_set.get('failed') for record_set in result),
+    'propagation': _propagation_failed,
+    'port': lambda result: result.get('state') == 'error' or bool(result.get('summary', {}).get('errors')),
+    'ping': lambda result: result.get('received') == 0,
+    'email-auth': lambda result: any(item.get('failed') for item in result.get('results', [])),
+    'dnssec': lambda result: result.get('status') in ('bogus', 'error'),
+}
+
+def has_failure(command, result):
+    """結果 (結果オブジェクトも可) に、エラーや問い合わせの失敗・検証の失敗が含まれるか"""
+    result = _checker('models').serialize(result)
+    if isinstance(result, dict) and result.get('error'):
+        return True
+    check = _FAILURE_CHECKS.get(command)
+    return bool(check and check(result))
+
+def _max_hops(value):
+    """--max-hops の値。TTLに使うので 1〜255 に限る"""
+    try:
+        hops = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数ではありません: {value}")
+    if not 1 <= hops <= 255:
+        raise argparse.ArgumentTypeError(f"1〜255 の範囲で指定してください: {value}")
+    return hops
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='レンタルサーバ確認ツール (ヘッドレス版)')
+    parser.add_argument('--format', choices=('json', 'ndjson'), default='json',
+                        help='json: 全結果を1つの配列で出力 / ndjson: 結果ごとに1行で出力')
+    parser.add_argument('--timings', action='store_true', help='起動時間と実行時間を標準エラーに出力する')
+    parser.add_argument('--metrics', choices=('json', 'prometheus'),
+                        help='DNS問い合わせごとの応答時間などを計測し、終了時に標準エラーへ出力する')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('nslookup', help='主要なDNSレコードを一括で引く')
+    p.add_argument('targets', nargs='+', metavar='DOMAIN')
+    p.add_argument('--server', default='', help='問い合わせるDNSサーバー (省略時はOSの設定)')
+    p.add_argument('--timeout', type=float, help='全体の持ち時間(秒)。省略時は checkers/net_policy.py の値')
+    p.set_defaults(handler=_nslookup)
+
+    p = sub.add_parser('propagation', help='dns_servers.json の全サーバーで応答を比較する')
+    p.add_argument('targets', nargs='+', metavar='DOMAIN')
+    p.add_argument('--timeout', type=float, help='全体の持ち時間(秒)。省略時は checkers/net_policy.py の値')
+    p.set_defaults(handler=_propagation)
+
+    p = sub.add_parser('port', help='TCPポートへの接続を確認する')
+    p.add_argument('hosts', help='ホスト (カンマ区切りで複数可)')
+    p.add_argument('ports', help='ポート (例: 25,80,8000-8010 / mail, web, ftp, server)')
+    p.add_argument('--timeout', type=float, default=3.0)
+    p.add_argument('--concurrency', type=int, default=100)
+    p.set_defaults(handler=_port)
+
+    p = sub.add_parser('ping', help='Ping (ICMP、権限がなければTCP) を送る',
+                       description='ICMPソケットを開く権限がない場合は、WindowsではOSのICMP API (IcmpSendEcho) を使う。'
+                                   'それも使えなければ 443/80番ポートへのTCP接続の時間で代用する '
+                                   '(結果の method が tcp:<ポート> になる)')
+    p.add_argument('targets', nargs='+', metavar='HOST')
+    p.add_argument('--count', type=int, default=4)
+    p.set_defaults(handler=_ping)
+
+    p = sub.add_parser('traceroute', help='経路を追跡する (raw ソケットが必要)')
+    p.add_argument('targets', nargs='+', metavar='HOST')
+    p.add_argument('--max-hops', type=_max_hops, default=30, help='最大ホップ数 (1〜255)')
+    p.set_defaults(handler=_traceroute)
+
+    p = sub.add_parser('whois', help='RDAP/Whois情報を取得する')
+    p.add_argument('targets', nargs='+', metavar='QUERY')
+    p.set_defaults(handler=_whois)
+
+    p = sub.add_parser('email-auth', help='SPF (include を展開) / DMARC / DKIM / MTA-STS / TLS-RPT / BIMI を確認する')
+    p.add_argument('targets', nargs='+', metavar='DOMAIN')
+    p.add_argument('--selector', default='', help='DKIMセレクタ (省略時は候補を総当たり)')
+    p.set_defaults(handler=_email_auth)
+
+    p = sub.add_parser('dnssec', help='ルートからドメインまでのDNSSECの信頼の連鎖を検証する',
+                       description='結果の status は secure / insecure (DSが無いことを NSEC/NSEC3 で確認) / '
+                                   'unproven-insecure (DSが無いことの証明が無い) / bogus / error')
+    p.add_argument('targets', nargs='+', metavar='DOMAIN')
+    p.add_argument('--server', default='', help='問い合わせるDNSサーバー (省略時はOSの設定)')
+    p.add_argument('--port', type=int, help='DNSサーバーのポート (ローカルのテスト用のサーバーなど)')
+    p.add_argument('--trust-anchor', action='append', metavar='DS',
+                   help="ルートのDS ('タグ アルゴリズム ダイジェスト種別 ダイジェスト')。複数指定可。省略時はIANAのルートの鍵")
+    p.add_argument('--timeout', type=float, help='全体の持ち時間(秒)。省略時は checkers/net_policy.py の値')
+    p.set_defaults(handler=_dnssec)
+
+    p = sub.add_parser('dkim-stats', help='DKIMセレクタの当たり回数と、何番目の候補で見つかったかの中央値を表示する')
+    p.add_argument('--top', type=int, default=5, help='プロバイダごとに表示する上位セレクタ数')
+    p.set_defaults(handler=_dkim_stats)
+    return parser
+
+def run(argv=None, out=None):
+    """コマンドを実行し、終了コードを返す (0: 成功 / 1: エラーや失敗を含む結果あり。has_failure を参照)"""
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    metrics = _checker('metrics') if args.metrics else None
+    if metrics:
+        metrics.enable()
+    dispatched = time.perf_counter()
+    records = []
+    failed = False
+    # 結果オブジェクトはJSONにする時点で辞書に変換する
+    json_default = _checker('models').json_default
+
+    def emit(target, result):
+        nonlocal failed
+        if has_failure(args.command, result):
+            failed = True
+        record = {'command': args.command, 'target': target, 'result': result,
+                  'elapsed': round(time.perf_counter() - dispatched, 3)}
+        if args.format == 'ndjson':
+            out.write(json.dumps(record, ensure_ascii=False, default=json_default) + '\n')
+            out.flush()
+        else:
+            records.append(record)
+
+    args.handler(args, emit)
+    if metrics:
+        metrics.record_call(args.command, time.perf_counter() - dispatched, 'error' if failed else 'ok')
+    if args.format == 'json':
+        json.dump(records, out, ensure_ascii=False, indent=2, default=json_default)
+        out.write('\n')
+    if args.timings:
+        finished = time.perf_counter()
+        startup_ms = (dispatched - _STARTED) * 1000
+        print(f"startup: {startup_ms:.1f} ms (target {STARTUP_TARGET_MS} ms), "
+              f"checker import: {_import_seconds * 1000:.1f} ms, "
+              f"command: {(finished - dispatched - _import_seconds) * 1000:.1f} ms", file=sys.stderr)
+        if startup_ms > STARTUP_TARGET_MS:
+            print("WARNING: startup exceeded the target.", file=sys.stderr)
+    if args.metrics == 'json':
+        json.dump(metrics.export_json(), sys.stderr, ensure_ascii=False, indent=2)
+        sys.stderr.write('\n')
+    elif args.metrics == 'prometheus':
+        sys.stderr.write(metrics.export_prometheus())
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,207 @@
+# job_manager.py
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from checkers import metrics
+
+# 全種類あわせて同時に動かすジョブの数
+DEFAULT_MAX_WORKERS = 8
+# 種類ごとの同時実行数の既定値 (type_limits にない種類に使う)
+DEFAULT_TYPE_LIMIT = 2
+# 終わったジョブを状態の問い合わせ用に残しておく件数
+FINISHED_JOBS_KEPT = 100
+
+# 実行中のジョブ (ワーカーのスレッドごと)
+_current = threading.local()
+
+def current_job_id():
+    """このスレッドで実行中のジョブのID。ジョブの外から呼ぶと None。"""
+    return getattr(_current, 'job_id', None)
+
+class Job:
+    """1つのジョブ。status は queued / running / cancelling / done / error / cancelled。"""
+    __slots__ = ('id', 'type', 'status', 'function', 'args', 'cancellable', 'cancel_event', 'done_event',
+                 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+    def __init__(self, job_id, job_type, function, args, cancellable):
+        self.id = job_id
+        self.type = job_type
+        self.status = 'queued'
+        self.function = function
+        self.args = args
+        self.cancellable = cancellable
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error', 'cancelled')
+
+    def to_dict(self, include_result=False):
+        end = self.finished_at or time.time()
+        data = {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'queued_seconds': round((self.started_at or end) - self.created_at, 3),
+            'elapsed': round(end - self.started_at, 3) if self.started_at else None,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+class JobManager:
+    """
+    Api の時間のかかる処理を、上限つきのワーカーで実行するジョブ管理。
+    種類ごとに同時実行数 (type_limits) を決め、上限に達した種類のジョブは空きが出るまで待たせる
+    (待っているジョブはワーカーを使わないので、ほかの種類のジョブは先に動ける)。
+    ジョブが終わると on_finish(job) を呼ぶ。
+    """
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, type_limits=None, on_finish=None):
+        self.max_workers = max_workers
+        self.type_limits = dict(type_limits or {})
+        self.on_finish = on_finish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queued = {}
+        self._running = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, job_type, function, *args, cancellable=False):
+        """
+        function(*args) をジョブとして登録し、Job を返す (すぐに戻る)。
+        cancellable なら function には cancel_event= も渡し、キャンセル時は function が戻るのを待って終える。
+        そうでないものは、キャンセルした時点で終わったものとして扱い、後で届いた結果は捨てる。
+        """
+        job = Job(f"{job_type}-{next(self._ids)}", job_type, function, args, cancellable)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queued.setdefault(job_type, deque()).append(job)
+            self._dispatch(job_type)
+        return job
+
+    def _dispatch(self, job_type):
+        """空きのある分だけ、待っているジョブをワーカーに渡す (ロックを持って呼ぶ)"""
+        queue = self._queued.get(job_type)
+        limit = self.type_limits.get(job_type, DEFAULT_TYPE_LIMIT)
+        while queue and self._running.get(job_type, 0) < limit:
+            job = queue.popleft()
+            self._running[job_type] = self._running.get(job_type, 0) + 1
+            job.status = 'running'
+            job.started_at = time.time()
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        metrics.observe('job_queue_seconds', job.started_at - job.created_at, type=job.type)
+        result = error = None
+        _current.job_id = job.id
+        try:
+            if job.cancellable:
+                result = job.function(*job.args, cancel_event=job.cancel_event)
+            else:
+                result = job.function(*job.args)
+        except Exception as e:
+            print(f"ERROR in job {job.id}: {e}")
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            _current.job_id = None
+        with self._lock:
+            self._running[job.type] -= 1
+            notify = not job.finished
+            if notify:
+                job.result, job.error = result, error
+                job.status = 'cancelled' if job.cancel_event.is_set() else ('error' if error else 'done')
+                job.finished_at = time.time()
+                job.done_event.set()
+            self._dispatch(job.type)
+            self._prune()
+        if notify:
+            self._notify(job)
+
+    def _finish_cancelled(self, job):
+        """待っているジョブや、途中で止められないジョブを、キャンセル済みとして終える (ロックを持って呼ぶ)"""
+        job.status = 'cancelled'
+        job.error = "キャンセルされました。"
+        job.finished_at = time.time()
+        job.done_event.set()
+
+    def _notify(self, job):
+        if self.on_finish is None:
+            return
+        try:
+            self.on_finish(job)
+        except Exception as e:
+            print(f"ERROR: Failed to notify job {job.id}: {e}")
+
+    def _prune(self):
+        """終わったジョブは新しいものから FINISHED_JOBS_KEPT 件だけ残す (ロックを持って呼ぶ)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    def cancel(self, job_id):
+        """ジョブをキャンセルする。終わっていたり見つからなければ False。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == 'queued':
+                self._queued[job.type].remove(job)
+                self._finish_cancelled(job)
+            elif job.cancellable:
+                job.status = 'cancelling'
+                return True
+            else:
+                self._finish_cancelled(job)
+        self._notify(job)
+        return True
+
+    def cancel_type(self, job_type):
+        """job_type の待っている・実行中のジョブをすべてキャンセルし、キャンセルした件数を返す"""
+        with self._lock:
+            job_ids = [job.id for job in self._jobs.values() if job.type == job_type and not job.finished]
+        return sum(self.cancel(job_id) for job_id in job_ids)
+
+    def active(self, job_type):
+        """job_type の待っている・実行中のジョブの数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.type == job_type and not job.finished)
+
+    def wait(self, job_id, timeout=None):
+        """ジョブが終わるまで待ち、状態と結果を返す (UIからではなく、CLIやベンチマークから使う)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done_event.wait(timeout)
+        return job.to_dict(include_result=True)
+
+    def get(self, job_id, include_result=False):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict(include_result) if job else None
+
+    def list(self):
+        """全ジョブの状態 (結果は含めない) を新しい順に返す"""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'running': {t: n for t, n in self._running.items() if n},
+                'queued': {t: len(q) for t, q in self._queued.items() if q},
+            }
@@ -1,9 +1,13 @@
 # logger_setup.py
+import json
 import logging
 import sys
 import os
+import time
 from functools import wraps
 
+from checkers import metrics, models
+
 def setup_logger():
     """アプリケーション全体のロガーを設定します。"""
     
@@ -29,15 +33,47 @@ def setup_logger():
 
 logger = setup_logger()
 
+def _outcome(result):
+    """戻り値からエラーかどうかを判定する (チェッカーはエラーを {'error': ...} で返す)"""
+    if isinstance(result, dict) and result.get('error'):
+        return 'error'
+    return 'ok'
+
+def _result_size(result):
+    """戻り値をUIに渡すときのJSONのおおよそのバイト数"""
+    try:
+        return len(json.dumps(result, ensure_ascii=False, default=models.json_default).encode('utf-8'))
+    except (TypeError, ValueError):
+        return None
+
 def log_execution(func):
-    """関数の実行をログに記録するデコレータ"""
+    """
+    関数の実行をログに記録するデコレータ。
+    計測 (checkers.metrics) が有効なら、所要時間・結果 (ok/error/exception)・結果のサイズも記録する。
+    """
+    name = func.__name__
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         # 'self'を除いた引数をログに出力
         func_args = ', '.join(repr(a) for a in args[1:])
-        logger.info(f"{func.__name__}({func_args})")
-        
-        # 元の関数を実行
-        return func(*args, **kwargs)
-            
+        logger.info(f"{name}({func_args})")
+
+        if not metrics.enabled:
+            # 元の関数を実行
+            return func(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            metrics.record_call(name, time.perf_counter() - started, 'exception')
+            raise
+        elapsed = time.perf_counter() - started
+        outcome = _outcome(result)
+        size = _result_size(result) if result is not None else None
+        metrics.record_call(name, elapsed, outcome, size)
+        logger.info(f"{name} -> {outcome} in {elapsed * 1000:.1f} ms" + (f", {size} bytes" if size is not None else ""))
+        return result
+
     return wrapper
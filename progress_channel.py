@@ -0,0 +1,112 @@
+# progress_channel.py
+import json
+import threading
+import time
+from collections import deque
+
+# まとめて送るまでに貯める秒数の既定値
+DEFAULT_INTERVAL = 0.075
+# 往復時間の統計に使う直近のサンプル数
+_LATENCY_SAMPLES = 200
+
+class ProgressChannel:
+    """
+    バックグラウンド処理からUIへの evaluate_js 呼び出しをまとめて送るチャネル。
+    call() で積まれた呼び出しは interval 秒ごとに1つのJSONにまとめ、
+    JS側の dispatch_py_events() へ1回の evaluate_js で渡す。
+    coalesce を指定した呼び出しは、同じキーの未送信分をその位置で置き換える (途中の進捗は捨てる)。
+    """
+    def __init__(self, window=None, interval=DEFAULT_INTERVAL, dispatcher='dispatch_py_events', json_default=None):
+        self.window = window
+        self.json_default = json_default
+        self.interval = interval
+        self.dispatcher = dispatcher
+        self._pending = []
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+        self.flushes = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+
+    def set_window(self, window):
+        self.window = window
+
+    def call(self, function, *args, coalesce=None):
+        """
+        JS関数 function(*args) の呼び出しを予約する。
+        coalesce=True なら関数名、文字列ならその値をキーにして古い未送信分を捨てる。
+        """
+        key = function if coalesce is True else coalesce
+        with self._cond:
+            # 同じキーの未送信分は、送る順番を変えないようその位置で置き換える
+            index = None
+            if key is not None:
+                index = next((i for i, event in enumerate(self._pending) if event[0] == key), None)
+            if index is None:
+                self._pending.append((key, function, args))
+            else:
+                self._pending[index] = (key, function, args)
+                self.events_dropped += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 最初のイベントから interval 秒の間に届いたものを1回で送る
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """未送信の呼び出しを今すぐまとめて送る"""
+        with self._send_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            window = self.window
+            if not batch or window is None:
+                return
+            payload = [{'fn': function, 'args': list(args)} for _, function, args in batch]
+            started = time.perf_counter()
+            try:
+                window.evaluate_js(f'{self.dispatcher}({json.dumps(payload, default=self.json_default)})')
+            except Exception as e:
+                print(f"ERROR: Failed to send events to UI: {e}")
+                return
+            self._latencies.append(time.perf_counter() - started)
+            self.flushes += 1
+            self.events_sent += len(batch)
+
+    def measure_latency(self):
+        """空のJSを評価させ、ブリッジの往復時間(秒)を測って返す"""
+        window = self.window
+        if window is None:
+            return None
+        started = time.perf_counter()
+        window.evaluate_js('0')
+        latency = time.perf_counter() - started
+        self._latencies.append(latency)
+        return latency
+
+    def stats(self):
+        """送信回数・間引いた進捗数・往復時間の統計を返す"""
+        samples = sorted(self._latencies)
+        latency = {}
+        if samples:
+            latency = {
+                'last_ms': round(self._latencies[-1] * 1000, 2),
+                'avg_ms': round(sum(samples) / len(samples) * 1000, 2),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2),
+            }
+        return {
+            'flushes': self.flushes,
+            'events_sent': self.events_sent,
+            'events_dropped': self.events_dropped,
+            'latency': latency,
+        }
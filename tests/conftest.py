@@ -0,0 +1,36 @@
+# tests/conftest.py
+"""
+テストの共通のフィクスチャ。
+外のネットワークには出ず、benchmarks/stub_servers.py のローカルのサーバーに問い合わせる。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_servers import StubDNSServer
+from checkers import dns_resolver, net_policy
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """キャッシュや履歴をテストごとの一時ディレクトリに書く"""
+    monkeypatch.setenv('RENTALSERVERCHECKER_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+@pytest.fixture(scope='session')
+def dns_server():
+    server = StubDNSServer(seed=0).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def stub_dns(dns_server):
+    """既定の問い合わせ先をスタブのDNSサーバーにする"""
+    dns_resolver.configure('127.0.0.1', dns_server.port)
+    dns_resolver.clear_cache()
+    net_policy.reset()
+    yield dns_server
+    dns_resolver.configure()
+    dns_resolver.clear_cache()
@@ -0,0 +1,19 @@
+# tests/test_benchmarks.py
+from benchmarks.run import _is_error
+
+def test_nested_failures_are_errors():
+    assert _is_error({'error': "ドメイン名を入力してください。"})
+    assert _is_error([{'type': 'A', 'records': [], 'ttl': None, 'status': "クエリ失敗: timeout", 'failed': True}])
+    assert _is_error({'result': [{'type': 'MX', 'failed': True}], 'requeried': ['MX']})
+    assert _is_error({'results': [{'type': 'DKIM', 'records': [], 'failed': True}]})
+    assert _is_error({'servers': [{'name': 'stub', 'records': {'A': {'status': 'error', 'error': 'タイムアウト'}}}]})
+    assert _is_error({'domain': 'x.test', 'status': 'bogus', 'links': []})
+    assert _is_error({'results': [], 'summary': {'scanned': 2, 'errors': 1}})
+    assert _is_error({'total': 10, 'completed': 10, 'failed': 2})
+
+def test_successful_results_are_not_errors():
+    assert not _is_error([{'type': 'TXT', 'records': [], 'ttl': 60, 'status': "レコードなし", 'failed': False}])
+    assert not _is_error({'results': [{'type': 'SPF', 'records': ['v=spf1 -all']}], 'checked_selectors': []})
+    assert not _is_error({'servers': [{'records': {'A': {'status': 'NXDOMAIN', 'values': []}}}]})
+    assert not _is_error({'domain': 'x.test', 'status': 'insecure', 'error': None})
+    assert not _is_error({'results': [], 'summary': {'scanned': 2, 'closed': 1, 'errors': 0}})
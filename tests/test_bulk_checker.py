@@ -0,0 +1,35 @@
+# tests/test_bulk_checker.py
+import threading
+
+from checkers import bulk_checker
+
+def test_parse_domains():
+    text = 'domain,note\nExample.com., "a"\nexample.com test.example.jp\nnot a domain,日本語.jp\n'
+    assert bulk_checker.parse_domains(text) == ['example.com', 'test.example.jp', 'xn--wgv71a119e.jp']
+    assert bulk_checker.parse_domains('') == []
+
+def test_run_audit():
+    seen = []
+    def fail_b(domain):
+        if domain.startswith('b.'):
+            raise ValueError("broken")
+        return 'ok'
+    checks = {'first': lambda domain: domain.upper(), 'second': fail_b}
+    stats = bulk_checker.run_audit(['a.test', 'b.test', 'c.test'], checks, on_result=seen.append, max_workers=2)
+    assert (stats['total'], stats['completed'], stats['failed'], stats['cancelled']) == (3, 3, 1, False)
+    by_domain = {result['domain']: result for result in seen}
+    assert by_domain['a.test']['results'] == {'first': 'A.TEST', 'second': 'ok'}
+    assert by_domain['b.test']['errors'] == {'second': "ValueError: broken"}
+    assert by_domain['c.test']['index'] == 2
+    assert stats['latency']['min'] <= stats['latency']['p50'] <= stats['latency']['max']
+
+def test_run_audit_cancelled():
+    cancel_event = threading.Event()
+    seen = []
+    def check(domain):
+        cancel_event.set()
+        return domain
+    stats = bulk_checker.run_audit([f'd{i}.test' for i in range(10)], {'check': check},
+                                   on_result=seen.append, cancel_event=cancel_event, max_workers=1)
+    # 1件目の途中でキャンセルされたので、それ以降のドメインは処理しない
+    assert stats['cancelled'] and stats['completed'] == len(seen) == 1
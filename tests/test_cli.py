@@ -0,0 +1,52 @@
+# tests/test_cli.py
+import io
+import json
+
+import pytest
+
+import cli
+from benchmarks.stub_servers import BOGUS_PREFIX, ZONE
+from checkers import dnssec_checker
+
+def _run(argv):
+    out = io.StringIO()
+    code = cli.run(argv, out)
+    return code, json.loads(out.getvalue())
+
+def test_nslookup_timeout_fails():
+    timed_out = [{'type': 'A', 'records': [], 'ttl': None, 'status': "クエリ失敗: timeout", 'failed': True}]
+    missing = [{'type': 'TXT', 'records': [], 'ttl': 60, 'status': "レコードなし", 'failed': False}]
+    assert cli.has_failure('nslookup', timed_out)
+    assert not cli.has_failure('nslookup', missing)
+    assert cli.has_failure('nslookup', {'error': "ドメイン名を入力してください。"})
+
+def test_nested_statuses_fail():
+    assert cli.has_failure('email-auth', {'results': [{'type': 'DMARC', 'records': [], 'failed': True}]})
+    assert not cli.has_failure('email-auth', {'results': [{'type': 'DMARC', 'records': []}]})
+    assert cli.has_failure('propagation', {'servers': [{'records': {'A': {'status': 'error'}}}]})
+    assert not cli.has_failure('propagation', {'servers': [{'records': {'A': {'status': 'NXDOMAIN'}}}]})
+    assert cli.has_failure('ping', {'host': '192.0.2.1', 'sent': 4, 'received': 0, 'error': None})
+    assert not cli.has_failure('port', {'host': '127.0.0.1', 'port': 1, 'state': 'closed', 'error': None})
+    assert cli.has_failure('port', {'host': 'host.invalid', 'port': 80, 'state': 'error', 'error': 'gaierror'})
+
+def test_dnssec_exit_code(stub_dns):
+    anchor = ['--server', '127.0.0.1', '--port', str(stub_dns.port), '--trust-anchor', stub_dns.trust_anchor]
+    try:
+        code, records = _run(['dnssec', f'signed.{ZONE}'] + anchor)
+        assert code == 0 and records[0]['result']['status'] == 'secure'
+        code, records = _run(['dnssec', f'{BOGUS_PREFIX}.{ZONE}'] + anchor)
+        assert code == 1 and records[0]['result']['status'] == 'bogus'
+    finally:
+        dnssec_checker.clear_cache()
+
+def test_nslookup_exit_code(stub_dns):
+    code, records = _run(['nslookup', f'cli.{ZONE}'])
+    assert code == 0
+    assert {record_set['type'] for record_set in records[0]['result']} >= {'A', 'MX', 'TXT'}
+
+def test_traceroute_max_hops_range():
+    parser = cli.build_parser()
+    assert parser.parse_args(['traceroute', 'example.com', '--max-hops', '255']).max_hops == 255
+    for value in ('0', '256', 'x'):
+        with pytest.raises(SystemExit):
+            parser.parse_args(['traceroute', 'example.com', '--max-hops', value])
@@ -0,0 +1,72 @@
+# tests/test_dkim_checker.py
+import threading
+
+import pytest
+
+from benchmarks.stub_servers import DKIM_SELECTOR, ZONE
+from checkers import dkim_checker
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    """当たり回数をテストごとの一時ディレクトリ (cache_dir) から読み直す"""
+    monkeypatch.setattr(dkim_checker, '_stats', None)
+
+@pytest.mark.parametrize('host, provider', [
+    ('aspmx.l.google.com.', 'google.com'),
+    ('www3.sakura.ne.jp', 'sakura.ne.jp'),
+    ('mx.example.co.uk', 'example.co.uk'),
+    # 2文字のTLDでも、一覧にないサフィックスは1階層だけ
+    ('mx1.mail.example.io', 'example.io'),
+    ('in1-smtp.messagingengine.com', 'messagingengine.com'),
+])
+def test_provider_of(host, provider):
+    assert dkim_checker._provider_of(host) == provider
+
+def test_order_selectors():
+    selectors = ['google', 'selector1', 'k1', 'default']
+    assert dkim_checker.order_selectors(selectors, 'example.com') == selectors
+    dkim_checker.record_hit('k1', None, 3, 3, 3)
+    dkim_checker.record_hit('default', 'example.com', 4, 4, 4)
+    # 同じプロバイダでの当たりが、全体での当たりより優先される
+    assert dkim_checker.order_selectors(selectors, 'example.com') == ['default', 'k1', 'google', 'selector1']
+    assert dkim_checker.order_selectors(selectors, 'other.com') == ['k1', 'default', 'google', 'selector1']
+
+def test_record_hit_persists():
+    dkim_checker.record_hit('k1', 'example.com', 8, 1, 3)
+    dkim_checker.record_hit('k1', 'example.com', 6, 1, 3)
+    # 保存したファイルから読み直しても同じ
+    dkim_checker._stats = None
+    stats = dkim_checker.get_selector_stats()
+    assert stats['lookups'] == 2
+    assert stats['median_probes_to_hit'] == 7
+    assert stats['median_rank'] == 1
+    assert stats['median_rank_file_order'] == 3
+    assert stats['top_selectors'] == {dkim_checker.ALL_PROVIDERS: ['k1'], 'example.com': ['k1']}
+
+def test_find_records_probes_sent(stub_dns):
+    data, checked = dkim_checker.find_dkim_record(f'dkim.{ZONE}', max_workers=1)
+    assert data['query'] == f'{DKIM_SELECTOR}._domainkey.dkim.{ZONE}'
+    assert data['probes_to_hit'] == checked.index(DKIM_SELECTOR) + 1
+    # 見つかったと分かるまでに、ワーカーが次の候補を問い合わせていることがある
+    assert data['probes_sent'] >= data['probes_to_hit']
+    lookup = dkim_checker._stats['lookups'][-1]
+    assert lookup['probes'] == data['probes_sent'] and lookup['rank'] == data['probes_to_hit']
+
+def test_find_records_stops_at_first_hit(stub_dns):
+    progress = []
+    data, checked = dkim_checker.find_dkim_record(f'first.{ZONE}', adaptive=False, max_workers=2,
+                                                  progress_callback=lambda done, total: progress.append(done))
+    assert data['records'] and not data.get('failed')
+    # 見つかった時点で打ち切るので、全候補の結果は待たない
+    assert progress[-1] < len(checked)
+
+def test_find_records_not_found(stub_dns):
+    data, _ = dkim_checker.find_dkim_record(f'first.{ZONE}', dkim_selector='missing')
+    assert data['records'] == [] and not data.get('failed')
+    assert 'probes_to_hit' not in data
+
+def test_find_records_cancelled(stub_dns):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    data, _ = dkim_checker.find_dkim_record(f'cancel.{ZONE}', adaptive=False, cancel_event=cancel_event)
+    assert data['records'] == [] and data['failed']
@@ -0,0 +1,26 @@
+# tests/test_dns_checker.py
+from benchmarks.stub_servers import ZONE
+from checkers import dns_checker
+
+def test_nslookup_records_and_glue(stub_dns):
+    domain = f'lookup.{ZONE}'
+    results = dns_checker.nslookup(domain, '', timeout=5)
+    # 並行して問い合わせても、結果は RECORD_TYPES の順に並ぶ
+    assert [record_set.type for record_set in results] == dns_checker.RECORD_TYPES
+    by_type = {record_set.type: record_set for record_set in results}
+    assert [record.value for record in by_type['A'].records] == ['192.0.2.1']
+    mx = sorted(by_type['MX'].records, key=lambda record: record.preference)
+    assert [(record.preference, record.target) for record in mx] == [(10, f'mx1.{domain}'), (20, f'mx2.{domain}')]
+    assert [(address.type, address.address) for address in mx[0].addresses] == [('A', '192.0.2.10'),
+                                                                              ('AAAA', '2001:db8::10')]
+    ns = {record.target: record.addresses for record in by_type['NS'].records}
+    assert [address.address for address in ns[f'ns2.{domain}']] == ['192.0.2.54', '2001:db8::54']
+    # レコードが無い種別は失敗ではなく、否定応答のTTLを持つ
+    assert not by_type['CAA'].failed and by_type['CAA'].ttl == 60
+
+def test_nslookup_record_types(stub_dns):
+    results = dns_checker.nslookup(f'lookup.{ZONE}', '', record_types=['TXT', 'A'])
+    assert [record_set.type for record_set in results] == ['TXT', 'A']
+
+def test_nslookup_empty_domain():
+    assert 'error' in dns_checker.nslookup('', '')
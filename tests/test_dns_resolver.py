@@ -0,0 +1,38 @@
+# tests/test_dns_resolver.py
+import time
+
+import dns.resolver
+import pytest
+
+from benchmarks.stub_servers import ZONE
+from checkers import dns_resolver
+
+def test_positive_cache(stub_dns):
+    first = dns_resolver.resolve(f'cache.{ZONE}', 'A')
+    assert dns_resolver.resolve(f'CACHE.{ZONE}.', 'a') is first
+    stats = dns_resolver.get_cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    # use_cache=False ならキャッシュを使わずに問い合わせる
+    assert dns_resolver.resolve(f'cache.{ZONE}', 'A', use_cache=False) is not first
+
+@pytest.mark.parametrize('name, rdtype, error', [
+    (f'missing.sub.{ZONE}', 'A', dns.resolver.NXDOMAIN),
+    (f'negative.{ZONE}', 'CAA', dns.resolver.NoAnswer),
+])
+def test_negative_cache(stub_dns, name, rdtype, error):
+    with pytest.raises(error) as first:
+        dns_resolver.resolve(name, rdtype)
+    # 否定応答はスタブのSOAの TTL/minimum (60秒) までキャッシュする
+    assert dns_resolver.negative_ttl(first.value) == 60
+    with pytest.raises(error):
+        dns_resolver.resolve(name, rdtype)
+    assert dns_resolver.get_cache_stats()['hits'] == 1
+
+def test_negative_cache_expires(stub_dns, monkeypatch):
+    monkeypatch.setattr(dns_resolver, 'NEGATIVE_TTL_MAX', 0.05)
+    for _ in range(2):
+        with pytest.raises(dns.resolver.NXDOMAIN):
+            dns_resolver.resolve(f'expires.sub.{ZONE}', 'A')
+        time.sleep(0.06)
+    stats = dns_resolver.get_cache_stats()
+    assert (stats['hits'], stats['misses']) == (0, 2)
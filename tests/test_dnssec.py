@@ -0,0 +1,53 @@
+# tests/test_dnssec.py
+import pytest
+
+from benchmarks.stub_servers import BOGUS_PREFIX, NODS_PREFIX, NOPROOF_PREFIX, UNSIGNED_PREFIX, ZONE
+from checkers import dnssec_checker
+
+pytest.importorskip('cryptography')
+
+@pytest.fixture
+def validate(stub_dns):
+    dnssec_checker.configure([stub_dns.trust_anchor])
+    yield lambda domain: dnssec_checker.validate_chain(domain, '127.0.0.1', stub_dns.port, timeout=10)
+    dnssec_checker.configure()
+
+def test_secure_chain(validate):
+    result = validate(f'signed.{ZONE}')
+    assert result.status == 'secure', result.error
+    assert [link.zone for link in result.links] == ['.', 'test.', f'{ZONE}.', f'signed.{ZONE}.']
+
+    # 検証済みの途中のゾーンは再利用し、2件目はそのドメインの分だけ問い合わせる
+    again = validate(f'signed2.{ZONE}')
+    assert again.status == 'secure'
+    assert again.queries == 3
+    assert [link.cached for link in again.links] == [True, True, True, False]
+
+@pytest.mark.parametrize('prefix', [NODS_PREFIX, UNSIGNED_PREFIX])
+def test_insecure_chain_with_denial(validate, prefix):
+    result = validate(f'{prefix}1.{ZONE}')
+    assert result.status == 'insecure'
+    assert result.failed_at == f'{prefix}1.{ZONE}.'
+    assert 'NSEC' in result.links[-1].detail
+
+def test_missing_denial_is_unproven(validate):
+    result = validate(f'{NOPROOF_PREFIX}1.{ZONE}')
+    assert result.status == 'unproven-insecure'
+    assert result.links[-1].status == 'unproven-insecure'
+
+def test_bogus_chain(validate):
+    result = validate(f'{BOGUS_PREFIX}1.{ZONE}')
+    assert result.status == 'bogus'
+    assert result.failed_at == f'{BOGUS_PREFIX}1.{ZONE}.'
+    assert result.error
+
+def test_wrong_trust_anchor_is_bogus(stub_dns, dns_server):
+    other = '12345 13 2 ' + '00' * 32
+    result = dnssec_checker.validate_chain(f'signed.{ZONE}', '127.0.0.1', dns_server.port, timeout=10,
+                                           trust_anchors=[other])
+    assert result.status == 'bogus'
+    assert result.failed_at == '.'
+
+def test_empty_domain_returns_result():
+    result = dnssec_checker.validate_chain('')
+    assert result.status == 'error' and result.error
@@ -0,0 +1,50 @@
+# tests/test_history_store.py
+import threading
+
+from benchmarks.stub_servers import DKIM_SELECTOR, ZONE
+from checkers import dkim_checker, net_policy
+from checkers.history_store import HistoryStore, extract_fields
+
+DOMAIN = f'history.{ZONE}'
+
+def _auth_result(deadline=None, cancel_event=None):
+    """DKIMのカードだけを持つ email_auth の結果"""
+    dkim_result, _ = dkim_checker.find_dkim_record(
+        DOMAIN, DKIM_SELECTOR, deadline=deadline, cancel_event=cancel_event)
+    return {'results': [dict(type='DKIM', **dkim_result)], 'checked_selectors': [DKIM_SELECTOR]}
+
+def test_failed_results_are_not_changes(stub_dns, tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    cancelled = threading.Event()
+    cancelled.set()
+    sequence = [
+        _auth_result(),
+        _auth_result(deadline=net_policy.Deadline(0)),
+        _auth_result(),
+        _auth_result(cancel_event=cancelled),
+    ]
+    assert sequence[0]['results'][0]['records']
+    assert sequence[1]['results'][0]['failed']
+    assert sequence[3]['results'][0]['failed']
+
+    for result in sequence:
+        assert store.save(DOMAIN, 'email_auth', result) == []
+    assert store.changes(domain=DOMAIN) == []
+    store.close()
+
+def test_missing_record_is_a_change(stub_dns, tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    store.save(DOMAIN, 'email_auth', _auth_result())
+    missing = {'results': [{'type': 'DKIM', 'records': [], 'status': "セレクタ候補ではDKIMレコードが見つかりませんでした。"}]}
+    changes = store.save(DOMAIN, 'email_auth', missing)
+    assert [change['field'] for change in changes] == ['DKIM']
+    assert changes[0]['new'] == []
+    store.close()
+
+def test_nslookup_timeout_is_skipped():
+    result = [
+        {'type': 'A', 'records': [{'value': '192.0.2.1'}], 'ttl': 300, 'status': None, 'failed': False},
+        {'type': 'MX', 'records': [], 'ttl': None, 'status': "クエリ失敗: Timeout", 'failed': True},
+        {'type': 'TXT', 'records': [], 'ttl': 60, 'status': "レコードが見つかりませんでした。", 'failed': False},
+    ]
+    assert sorted(extract_fields('nslookup', result)) == ['A', 'TXT']
@@ -0,0 +1,70 @@
+# tests/test_job_manager.py
+import threading
+
+import pytest
+
+from job_manager import JobManager, current_job_id
+
+@pytest.fixture
+def manager():
+    finished = []
+    manager = JobManager(max_workers=4, type_limits={'slow': 1}, on_finish=finished.append)
+    manager.finished = finished
+    yield manager
+    manager._executor.shutdown(wait=True)
+
+def test_type_limit(manager):
+    release = threading.Event()
+    jobs = [manager.submit('slow', release.wait, 5) for _ in range(3)]
+    # 上限に達した種類のジョブが待っていても、ほかの種類のジョブは先に動く
+    other = manager.submit('fast', current_job_id)
+    assert manager.wait(other.id, timeout=5)['result'] == other.id
+    assert manager.stats()['running'] == {'slow': 1}
+    assert manager.stats()['queued'] == {'slow': 2}
+    assert [job.status for job in jobs] == ['running', 'queued', 'queued']
+    assert manager.active('slow') == 3
+
+    release.set()
+    for job in jobs:
+        assert manager.wait(job.id, timeout=5)['status'] == 'done'
+    assert manager.stats() == {'max_workers': 4, 'running': {}, 'queued': {}}
+    assert manager.finished[0] is other
+    assert {job.id for job in manager.finished[1:]} == {job.id for job in jobs}
+
+def test_error(manager):
+    job = manager.submit('fast', lambda: 1 / 0)
+    result = manager.wait(job.id, timeout=5)
+    assert result['status'] == 'error'
+    assert result['error'].startswith('ZeroDivisionError')
+
+def test_cancel_queued_and_running(manager):
+    started = threading.Event()
+    def cancellable(cancel_event):
+        started.set()
+        cancel_event.wait(5)
+        return 'stopped'
+    running = manager.submit('slow', cancellable, cancellable=True)
+    queued = manager.submit('slow', current_job_id)
+    assert started.wait(5)
+
+    # 待っているジョブはすぐにキャンセル済みになる
+    assert manager.cancel(queued.id)
+    assert queued.status == 'cancelled' and queued.finished_at is not None
+    # 実行中のジョブは、関数が戻るまで cancelling
+    assert manager.cancel(running.id)
+    result = manager.wait(running.id, timeout=5)
+    assert result['status'] == 'cancelled' and result['result'] == 'stopped'
+    assert not manager.cancel(running.id)
+    assert not manager.cancel('missing-1')
+    assert [job.id for job in manager.finished] == [queued.id, running.id]
+
+def test_cancel_uncancellable_discards_result(manager):
+    release = threading.Event()
+    job = manager.submit('slow', lambda: release.wait(5) and 'late')
+    assert manager.cancel_type('slow') == 1
+    assert job.status == 'cancelled'
+    release.set()
+    manager._executor.shutdown(wait=True)
+    # 後で届いた結果は捨て、終了の通知も1回だけ
+    assert job.result is None
+    assert manager.finished == [job]
@@ -0,0 +1,35 @@
+# tests/test_models.py
+import json
+
+import pytest
+
+from checkers import models
+from checkers.models import PingProbe, PingStats, PortProbe, TraceHop, TraceResult
+
+def test_serialize_nested():
+    stats = PingStats('example.com', '192.0.2.1', 'icmp', [PingProbe(0, 1.5), PingProbe(1)], sent=2, received=1)
+    data = models.serialize({'results': (stats,), 'count': 1})
+    assert data['count'] == 1
+    ping = data['results'][0]
+    assert ping['probes'] == [{'seq': 0, 'rtt_ms': 1.5}, {'seq': 1, 'rtt_ms': None}]
+    assert set(ping) == set(PingStats.__slots__)
+    # 辞書・リスト・数値だけになり、そのままJSONにできる
+    assert json.loads(json.dumps(data)) == data
+
+def test_serialize_passthrough():
+    assert models.serialize('text') == 'text'
+    assert models.serialize(None) is None
+    assert models.serialize((1, [2])) == [1, [2]]
+
+def test_json_default():
+    trace = TraceResult('example.com', '192.0.2.1', 'icmp', True, 2, [TraceHop(1, '192.0.2.1', [0.5])])
+    data = json.loads(json.dumps({'trace': trace}, default=models.json_default))
+    assert data['trace']['hops'] == [{'ttl': 1, 'address': '192.0.2.1', 'rtts_ms': [0.5]}]
+    with pytest.raises(TypeError):
+        json.dumps({'value': object()}, default=models.json_default)
+
+def test_equality_and_repr():
+    probe = PortProbe('example.com', '192.0.2.1', 443, 'open', 1.0)
+    assert probe == PortProbe('example.com', '192.0.2.1', 443, 'open', 1.0)
+    assert probe != PortProbe('example.com', '192.0.2.1', 443, 'closed', 1.0)
+    assert repr(probe).startswith("PortProbe(host='example.com', ip='192.0.2.1', port=443, state='open'")
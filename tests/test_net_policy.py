@@ -0,0 +1,83 @@
+# tests/test_net_policy.py
+import pytest
+
+from checkers import net_policy
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(net_policy.time, 'monotonic', clock)
+    return clock
+
+@pytest.fixture(autouse=True)
+def reset_policy():
+    net_policy.reset()
+    yield
+    net_policy.reset()
+
+def test_deadline(clock):
+    deadline = net_policy.Deadline(6)
+    assert deadline.timeout(2) == 2
+    assert deadline.timeout() == 6
+    # 残り時間を、この後の問い合わせの回数で均等に分ける
+    assert deadline.share(3) == 2
+    assert deadline.share(2, cap=1) == 1
+    clock.now += 5
+    assert deadline.remaining() == 1 and not deadline.expired()
+    assert deadline.timeout(2) == 1
+    clock.now += 1
+    assert deadline.expired()
+    with pytest.raises(net_policy.DeadlineExceeded):
+        deadline.timeout(2)
+
+def test_resolve_deadline(clock):
+    assert net_policy.resolve_deadline(None, 'whois').seconds == net_policy.ACTION_DEADLINES['whois']
+    assert net_policy.resolve_deadline(None, 'unknown').seconds == net_policy.DEFAULT_DEADLINE
+    assert net_policy.resolve_deadline(3, 'whois').seconds == 3
+    deadline = net_policy.Deadline(1)
+    assert net_policy.resolve_deadline(deadline, 'whois') is deadline
+
+def test_hedge_delay():
+    server = 'dns:192.0.2.53'
+    assert net_policy.hedge_delay(server) == net_policy.HEDGE_DEFAULT_DELAY
+    for ms in range(10, 210, 10):
+        net_policy.record_latency(server, ms / 1000)
+    # 20件の p95 は19番目の値
+    assert net_policy.hedge_delay(server) == pytest.approx(0.19)
+    for _ in range(net_policy.LATENCY_SAMPLES):
+        net_policy.record_latency(server, 5.0)
+    assert net_policy.hedge_delay(server) == net_policy.HEDGE_MAX_DELAY
+    for _ in range(net_policy.LATENCY_SAMPLES):
+        net_policy.record_latency(server, 0.0001)
+    assert net_policy.hedge_delay(server) == net_policy.HEDGE_MIN_DELAY
+
+def test_circuit_breaker(clock):
+    breaker = net_policy.CircuitBreaker(failures=3, open_seconds=10)
+    for _ in range(2):
+        breaker.record_failure('a')
+    assert breaker.allow('a')
+    breaker.record_failure('a')
+    with pytest.raises(net_policy.CircuitOpenError):
+        breaker.check('a')
+    assert breaker.allow('b')
+    assert breaker.stats()['a'] == {'failures': 3, 'open_for': 10.0}
+
+    # 遮断が明けたら試しの1回だけを通す
+    clock.now += 10
+    assert breaker.allow('a')
+    assert not breaker.allow('a')
+    # 試しが失敗したら、すぐにまた遮断する
+    breaker.record_failure('a')
+    assert not breaker.allow('a')
+    clock.now += 10
+    assert breaker.allow('a')
+    breaker.record_success('a')
+    assert breaker.allow('a') and breaker.allow('a')
+    assert breaker.stats() == {}
@@ -0,0 +1,144 @@
+# tests/test_network_checker.py
+import socket
+import threading
+
+import pytest
+
+from benchmarks.stub_servers import TCPListeners
+from checkers import network_checker
+
+@pytest.fixture
+def listeners():
+    server = TCPListeners(count=2, closed=2).start()
+    yield server
+    server.stop()
+
+def test_ping_localhost(listeners):
+    # ICMPが使えない環境では、待ち受けているポートへのTCP接続で測る
+    result = network_checker.ping_host('127.0.0.1', count=3, interval=0.05, tcp_ports=listeners.open_ports[:1])
+    assert result.error is None
+    assert result.method in ('icmp', f'tcp:{listeners.open_ports[0]}')
+    assert result.sent == 3 and result.received == 3
+    assert result.loss_pct == 0
+
+def test_ping_unresolvable_host():
+    assert network_checker.ping_host('host.invalid', count=1).error
+
+def test_ping_uses_system_icmp_without_socket(monkeypatch):
+    # ICMPソケットが開けなくても、OSのICMP APIが使えればTCPには切り替えない
+    monkeypatch.setattr(network_checker, '_open_icmp_socket', lambda: (None, None))
+    monkeypatch.setattr(network_checker, '_system_icmp_ping', lambda ip, count, timeout, interval: [0.001, None, 0.003])
+    result = network_checker.ping_host('127.0.0.1', count=3, interval=0)
+    assert result.method == 'icmp'
+    assert result.received == 2
+    assert [probe.rtt_ms for probe in result.probes] == [1.0, None, 3.0]
+
+def test_ping_falls_back_to_tcp(monkeypatch, listeners):
+    monkeypatch.setattr(network_checker, '_open_icmp_socket', lambda: (None, None))
+    monkeypatch.setattr(network_checker, '_system_icmp_ping', lambda ip, count, timeout, interval: None)
+    result = network_checker.ping_host('127.0.0.1', count=2, interval=0, tcp_ports=listeners.open_ports[:1])
+    assert result.method == f'tcp:{listeners.open_ports[0]}'
+    assert result.received == 2
+
+def test_traceroute_localhost():
+    result = network_checker.trace_route('127.0.0.1', max_hops=5, timeout=1)
+    if result is None:
+        pytest.skip("raw ソケットを開く権限がありません")
+    assert result.reached
+    assert [hop.ttl for hop in result.hops] == [1]
+    assert None not in result.hops[0].rtts_ms
+
+class _SilentSocket:
+    """送ったプローブを記録し、何も応答しない raw ソケットの代わり"""
+    def __init__(self, *args):
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def setsockopt(self, *args):
+        pass
+
+    def sendto(self, packet, address):
+        self.sent.append(packet)
+
+class _UnreachableSocket(_SilentSocket):
+    """送信のたびに ENETUNREACH になるソケットの代わり"""
+    def sendto(self, packet, address):
+        raise OSError(101, 'Network is unreachable')
+
+def test_ping_send_error_counts_as_lost(monkeypatch):
+    sock = _UnreachableSocket()
+    monkeypatch.setattr(network_checker, '_open_icmp_socket', lambda: ('raw', sock))
+    monkeypatch.setattr(network_checker.select, 'select', lambda r, w, x, timeout: ([], [], []))
+    result = network_checker.ping_host('192.0.2.1', count=2, timeout=0, interval=0)
+    assert result.sent == 2 and result.received == 0
+    assert 'Network is unreachable' in result.error
+
+def test_traceroute_send_error(monkeypatch):
+    monkeypatch.setattr(network_checker.socket, 'socket', lambda *args: _UnreachableSocket())
+    monkeypatch.setattr(network_checker.select, 'select', lambda r, w, x, timeout: ([], [], []))
+    result = network_checker.trace_route('192.0.2.1', max_hops=2, timeout=0)
+    assert not result.reached
+    assert 'Network is unreachable' in result.error
+
+@pytest.mark.parametrize('max_hops, expected', [(0, 1), (-3, 1), (300, 255)])
+def test_traceroute_clamps_max_hops(monkeypatch, max_hops, expected):
+    sock = _SilentSocket()
+    monkeypatch.setattr(network_checker.socket, 'socket', lambda *args: sock)
+    monkeypatch.setattr(network_checker.select, 'select', lambda r, w, x, timeout: ([], [], []))
+    result = network_checker.trace_route('192.0.2.1', max_hops=max_hops, timeout=0, probes_per_hop=1, window=300)
+    assert result.max_hops == expected
+    assert len(sock.sent) == expected
+
+def test_traceroute_limits_probes_in_flight(monkeypatch):
+    sock = _SilentSocket()
+    in_flight_at_wait = []
+    monkeypatch.setattr(network_checker.socket, 'socket', lambda *args: sock)
+    monkeypatch.setattr(network_checker.select, 'select',
+                        lambda r, w, x, timeout: (in_flight_at_wait.append(len(sock.sent)), ([], [], []))[1])
+    result = network_checker.trace_route('192.0.2.1', max_hops=6, timeout=0, probes_per_hop=2, window=3)
+    assert not result.reached
+    assert len(sock.sent) == 12
+    # 応答を待つ時点で送ってあるのは、期限切れの分を除いて window 件まで
+    assert in_flight_at_wait == [3, 6, 9, 12]
+
+def test_port_connection_states(monkeypatch, listeners):
+    assert network_checker.test_port_connection('127.0.0.1', str(listeners.open_ports[0])).state == 'open'
+    closed = network_checker.test_port_connection('127.0.0.1', str(listeners.closed_ports[0]))
+    assert closed.state == 'closed' and closed.error is None
+    unresolvable = network_checker.test_port_connection('host.invalid', '80')
+    assert unresolvable.state == 'error' and unresolvable.error
+    def timing_out(address, timeout=None):
+        raise socket.timeout("timed out")
+    monkeypatch.setattr(network_checker.socket, 'create_connection', timing_out)
+    assert network_checker.test_port_connection('192.0.2.1', '80').state == 'filtered'
+
+def test_scan_ports_localhost(listeners):
+    seen = []
+    ports = listeners.open_ports + listeners.closed_ports
+    result = network_checker.scan_ports('127.0.0.1', ports, timeout=1, on_result=seen.append)
+    states = {probe.port: probe.state for probe in result['results']}
+    assert states == {**{port: 'open' for port in listeners.open_ports},
+                      **{port: 'closed' for port in listeners.closed_ports}}
+    assert [probe.port for probe in result['results']] == sorted(ports)
+    assert len(seen) == len(ports)
+    assert result['summary']['open'] == 2 and result['summary']['closed'] == 2 and result['summary']['errors'] == 0
+
+def test_scan_ports_unresolvable_host(listeners):
+    result = network_checker.scan_ports('127.0.0.1,host.invalid', listeners.open_ports[:1], timeout=1)
+    assert [(probe.host, probe.state) for probe in result['results']] == [('127.0.0.1', 'open'), ('host.invalid', 'error')]
+
+def test_scan_ports_cancelled(listeners):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    result = network_checker.scan_ports('127.0.0.1', listeners.open_ports, timeout=1, cancel_event=cancel_event)
+    assert result['results'] == []
+
+def test_parse_ports():
+    assert network_checker.parse_ports('web,8000-8002,80') == [80, 443, 8000, 8001, 8002]
+    with pytest.raises(ValueError):
+        network_checker.parse_ports('0-10')
@@ -0,0 +1,52 @@
+# tests/test_progress_channel.py
+import json
+import time
+
+from progress_channel import ProgressChannel
+
+class _Window:
+    """evaluate_js に渡されたイベントを記録するウィンドウの代わり"""
+    def __init__(self):
+        self.batches = []
+
+    def evaluate_js(self, script):
+        prefix = 'dispatch_py_events('
+        assert script.startswith(prefix) and script.endswith(')')
+        self.batches.append([(event['fn'], event['args']) for event in json.loads(script[len(prefix):-1])])
+
+def test_batches_and_coalesces_in_place():
+    window = _Window()
+    # 送信スレッドに先に送られないよう、間隔を長くして手動で flush する
+    channel = ProgressChannel(window, interval=60)
+    channel.call('onStart', 'a')
+    channel.call('onProgress', 1, 10, coalesce=True)
+    channel.call('onRow', 'r1')
+    channel.call('onProgress', 2, 10, coalesce=True)
+    channel.call('onProgress', 3, 10, coalesce=True)
+    channel.call('onRow', 'r2', coalesce='row:other')
+    channel.flush()
+    # 置き換えた進捗は最初に積んだ位置のまま送る
+    assert window.batches == [[('onStart', ['a']), ('onProgress', [3, 10]), ('onRow', ['r1']), ('onRow', ['r2'])]]
+    stats = channel.stats()
+    assert (stats['flushes'], stats['events_sent'], stats['events_dropped']) == (1, 4, 2)
+
+    # 送信済みのものは置き換えない
+    channel.call('onProgress', 10, 10, coalesce=True)
+    channel.flush()
+    assert window.batches[-1] == [('onProgress', [10, 10])]
+
+def test_flush_without_window():
+    channel = ProgressChannel(interval=60)
+    channel.call('onStart')
+    channel.flush()
+    assert channel.stats()['events_sent'] == 0
+
+def test_background_flush():
+    window = _Window()
+    channel = ProgressChannel(window, interval=0.01)
+    channel.call('onDone', {'ok': True})
+    for _ in range(200):
+        if window.batches:
+            break
+        time.sleep(0.01)
+    assert window.batches == [[('onDone', [{'ok': True}])]]
@@ -0,0 +1,53 @@
+# tests/test_propagation.py
+import socket
+
+import pytest
+
+from benchmarks.stub_servers import StubDNSServer, ZONE
+from checkers import dns_checker
+
+@pytest.fixture(scope='module')
+def other_server():
+    # bench.test を知らないサーバー (移転前のDNSサーバーの代わり)
+    server = StubDNSServer(zone='other.test').start()
+    yield server
+    server.stop()
+
+def _closed_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _server(name, port):
+    return {'name': name, 'ip': '127.0.0.1', 'port': port, 'group': 'public'}
+
+def test_consistent_servers(dns_server):
+    servers = [_server(f'stub-{n}', dns_server.port) for n in range(3)]
+    result = dns_checker.check_propagation(f'prop.{ZONE}', ['A', 'MX'], servers=servers, timeout=5)
+    assert result['propagated']
+    assert [server['records']['A']['values'] for server in result['servers']] == [['192.0.2.1']] * 3
+    assert result['consistency']['MX']['variants'][0]['servers'] == ['stub-0', 'stub-1', 'stub-2']
+
+def test_inconsistent_servers(dns_server, other_server):
+    servers = [_server('new-1', dns_server.port), _server('new-2', dns_server.port), _server('old', other_server.port)]
+    result = dns_checker.check_propagation(f'prop.{ZONE}', ['A'], servers=servers, timeout=5)
+    assert not result['propagated']
+    variants = result['consistency']['A']['variants']
+    # 多数派が先頭
+    assert [(v['status'], v['servers']) for v in variants] == [('ok', ['new-1', 'new-2']), ('NXDOMAIN', ['old'])]
+
+def test_unresponsive_server_is_left_out(dns_server):
+    servers = [_server('stub', dns_server.port), _server('dead', _closed_udp_port())]
+    result = dns_checker.check_propagation(f'prop.{ZONE}', ['A'], servers=servers, timeout=1)
+    dead = next(server for server in result['servers'] if server['name'] == 'dead')
+    assert dead['records']['A']['status'] == 'error'
+    assert result['propagated']
+    assert result['elapsed'] < 3
+
+def test_configured_servers(dns_server):
+    dns_checker.configure([_server('configured', dns_server.port)])
+    try:
+        result = dns_checker.check_propagation(f'prop.{ZONE}', ['A'], timeout=5)
+    finally:
+        dns_checker.configure()
+    assert [server['name'] for server in result['servers']] == ['configured']
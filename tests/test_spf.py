@@ -0,0 +1,40 @@
+# tests/test_spf.py
+import threading
+import time
+
+from checkers import email_auth_checker, net_policy
+from checkers.email_auth_checker import _evaluate_spf, _memoized, parse_spf
+
+def test_out_of_range_cidr_is_permerror():
+    record = 'v=spf1 a/33 mx//129 ip4:192.0.2.0/33 ip6:2001:db8::/129 ip4:2001:db8::1 ip4:192.0.2.0/24 -all'
+    errors = [term['text'] for term in parse_spf(record) if term.get('error')]
+    assert errors == ['a/33', 'mx//129', 'ip4:192.0.2.0/33', 'ip6:2001:db8::/129', 'ip4:2001:db8::1']
+
+    records = {'example.test': {'records': [record], 'void': False}}
+    node = _evaluate_spf('example.test', records, {})
+    assert len(node['errors']) == 5
+    assert all('PermError' in error for error in node['errors'])
+    assert [str(network) for network in node['_pass']] == ['192.0.2.0/24']
+
+def test_waiter_with_longer_deadline_requeries():
+    email_auth_checker.clear_cache()
+    calls = []
+    release = threading.Event()
+
+    def fetch(deadline):
+        calls.append(deadline.seconds)
+        if len(calls) == 1:
+            # 先に始めた問い合わせは持ち時間を使い切って、値を得られずに終わる
+            release.wait(1)
+            return {'records': [], 'error': "クエリ失敗: timeout"}, None
+        return {'records': ['v=spf1 -all'], 'void': False}, 300
+
+    key = ('spf', 'memo.test')
+    short = _memoized(key, fetch, net_policy.Deadline(0.05))
+    long = _memoized(key, fetch, net_policy.Deadline(5))
+    time.sleep(0.1)
+    release.set()
+    assert short.result(timeout=5)['error']
+    assert long.result(timeout=5)['records'] == ['v=spf1 -all']
+    assert calls == [0.05, 5]
+    email_auth_checker.clear_cache()
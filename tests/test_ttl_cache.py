@@ -0,0 +1,44 @@
+# tests/test_ttl_cache.py
+from checkers import ttl_cache
+from checkers.ttl_cache import TTLCache
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_expiry(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(ttl_cache.time, 'monotonic', clock)
+    cache = TTLCache()
+    cache.put('a', 1, 10)
+    cache.put('b', 2, 0)
+    assert cache.get('a') == 1
+    # ttl が 0 以下のものは保持しない
+    assert cache.get('b', 'missing') == 'missing'
+    clock.now += 10
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+def test_lru_eviction():
+    cache = TTLCache(max_size=2)
+    cache.put('a', 1, 60)
+    cache.put('b', 2, 60)
+    assert cache.get('a') == 1
+    cache.put('c', 3, 60)
+    # 直前に使った 'a' は残り、最も古く使われた 'b' が捨てられる
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (3, 1, 1)
+    assert stats['hit_rate'] == 0.75
+
+def test_clear():
+    cache = TTLCache()
+    cache.put('a', 1, 60)
+    cache.get('a')
+    cache.clear()
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 0
@@ -0,0 +1,184 @@
+# tests/test_whois_checker.py
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from benchmarks.stub_servers import ZONE, StubRDAPServer, TCPListeners
+from checkers import net_policy, whois_checker
+from checkers.ttl_cache import TTLCache
+
+@pytest.fixture(scope='module')
+def rdap_server():
+    server = StubRDAPServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def bootstrap(monkeypatch, cache_dir):
+    """ブートストラップの読み込み状態を空にし、ディスクのキャッシュファイルのパスを返す"""
+    monkeypatch.setattr(whois_checker, '_bootstrap', None)
+    monkeypatch.setattr(whois_checker, '_bootstrap_loaded_at', 0)
+    monkeypatch.setattr(whois_checker, '_bootstrap_retry_at', 0)
+    monkeypatch.setattr(whois_checker, '_pool', whois_checker._HTTPConnectionPool())
+    return os.path.join(cache_dir, whois_checker.BOOTSTRAP_CACHE_FILE)
+
+def _write_bootstrap(path, fetched_at, services):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'fetched_at': fetched_at, 'services': services}, f)
+
+def _closed_url():
+    port = TCPListeners(count=0, closed=1).closed_ports[0]
+    return f"http://127.0.0.1:{port}/dns.json"
+
+def test_bootstrap_disk_hit(monkeypatch, bootstrap):
+    services = {'test': ['https://rdap.example/']}
+    _write_bootstrap(bootstrap, time.time() - 60, services)
+    # ディスクの内容が新しければIANAには問い合わせない
+    monkeypatch.setattr(whois_checker, 'RDAP_BOOTSTRAP_URL', _closed_url())
+    assert whois_checker._load_bootstrap(timeout=1) == services
+
+def test_bootstrap_expired(monkeypatch, bootstrap, rdap_server):
+    stale_at = time.time() - whois_checker.BOOTSTRAP_MAX_AGE - 1
+    _write_bootstrap(bootstrap, stale_at, {'old': ['https://rdap.example/']})
+    monkeypatch.setattr(whois_checker, 'RDAP_BOOTSTRAP_URL', rdap_server.bootstrap_url)
+    services = whois_checker._load_bootstrap(timeout=1)
+    assert list(services) == [ZONE.split('.')[-1]]
+    with open(bootstrap, encoding='utf-8') as f:
+        assert json.load(f)['fetched_at'] > stale_at
+
+def test_bootstrap_stale_fallback(monkeypatch, bootstrap):
+    stale_at = time.time() - whois_checker.BOOTSTRAP_MAX_AGE - 1
+    services = {'test': ['https://rdap.example/']}
+    _write_bootstrap(bootstrap, stale_at, services)
+    fetches = []
+    def failing_get(url, headers=None, max_redirects=3, timeout=None):
+        fetches.append(url)
+        raise ConnectionRefusedError("refused")
+    monkeypatch.setattr(whois_checker._pool, 'get', failing_get)
+
+    assert whois_checker._load_bootstrap(timeout=1) == services
+    # 古い内容は取得した時刻のまま残し、少し待ってから取り直す
+    assert whois_checker._bootstrap_loaded_at == stale_at
+    assert whois_checker._load_bootstrap(timeout=1) == services
+    assert len(fetches) == 1
+    monkeypatch.setattr(whois_checker, '_bootstrap_retry_at', time.time() - 1)
+    assert whois_checker._load_bootstrap(timeout=1) == services
+    assert len(fetches) == 2
+
+def test_bootstrap_spent_deadline_does_not_back_off(monkeypatch, bootstrap, rdap_server):
+    monkeypatch.setattr(whois_checker, 'RDAP_BOOTSTRAP_URL', rdap_server.bootstrap_url)
+    assert whois_checker._load_bootstrap(timeout=0) == {}
+    assert whois_checker._load_bootstrap(timeout=1)
+
+def test_pool_reuses_connection(rdap_server):
+    pool = whois_checker._HTTPConnectionPool()
+    before = rdap_server.connections
+    for _ in range(3):
+        status, body = pool.get(rdap_server.bootstrap_url, timeout=1)
+        assert status == 200
+    assert rdap_server.connections - before == 1
+
+def test_pool_retries_dropped_connection(rdap_server):
+    pool = whois_checker._HTTPConnectionPool()
+    assert pool.get(rdap_server.bootstrap_url, timeout=1)[0] == 200
+    rdap_server.drop_connections()
+    time.sleep(0.05)
+    before = rdap_server.connections
+    assert pool.get(rdap_server.bootstrap_url, timeout=1)[0] == 200
+    assert rdap_server.connections - before == 1
+
+def test_pool_spent_timeout(rdap_server):
+    with pytest.raises(net_policy.DeadlineExceeded):
+        whois_checker._HTTPConnectionPool().get(rdap_server.bootstrap_url, timeout=0)
+
+@pytest.mark.parametrize('query, key', [
+    ('example.COM.', 'com'),
+    ('192.0.2.1', 'ipv4:192'),
+    ('2400:cb00::1', 'ipv6:2400::/12'),
+    ('2404:6800::1', 'ipv6:2400::/12'),
+    ('2001:db8::1', 'ipv6:2001:c00::/23'),
+])
+def test_server_cache_key(query, key):
+    assert whois_checker._server_cache_key(query)[0] == key
+
+def test_referral_chain(monkeypatch):
+    responses = {
+        'whois.registry.test': "Domain Name: EXAMPLE.TEST\nRegistrar WHOIS Server: whois.registrar.test\n",
+        'whois.registrar.test': "Registrar: Example\nWhois Server: whois.reseller.test\n",
+        # 参照元へ戻る参照はたどらない
+        'whois.reseller.test': "Reseller: Example\nwhois server: WHOIS.REGISTRY.TEST\n",
+    }
+    asked = []
+    def fake_query(server, query, deadline, parts=1):
+        asked.append(server)
+        return responses[server]
+    monkeypatch.setattr(whois_checker, '_query_whois', fake_query)
+
+    text = whois_checker._query_whois_chain('whois.registry.test', 'example.test', net_policy.Deadline(5))
+    assert asked == ['whois.registry.test', 'whois.registrar.test', 'whois.reseller.test']
+    assert "--- whois.reseller.test からの応答 ---" in text
+
+    asked.clear()
+    monkeypatch.setattr(whois_checker, 'MAX_REFERRALS', 1)
+    whois_checker._query_whois_chain('whois.registry.test', 'example.test', net_policy.Deadline(5))
+    assert asked == ['whois.registry.test', 'whois.registrar.test']
+
+def test_whois_response_size_cap(monkeypatch):
+    server = socket.create_server(('127.0.0.1', 0))
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(1024)
+            try:
+                conn.sendall(b'x' * (whois_checker.MAX_RESPONSE_SIZE * 2))
+            except OSError:
+                pass
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    monkeypatch.setattr(whois_checker, 'WHOIS_PORT', server.getsockname()[1])
+    whois_checker.configure(min_interval=0)
+    try:
+        text = whois_checker._query_whois('127.0.0.1', b'example.test\r\n', net_policy.Deadline(5))
+    finally:
+        whois_checker.configure()
+        server.close()
+    body, _, note = text.partition('\n')
+    assert len(body) == whois_checker.MAX_RESPONSE_SIZE
+    assert str(whois_checker.MAX_RESPONSE_SIZE) in note
+
+def test_rate_limiter():
+    limiter = whois_checker._RateLimiter(0.1)
+    started = time.monotonic()
+    assert limiter.wait('a') and limiter.wait('b')
+    assert time.monotonic() - started < 0.05
+    assert limiter.wait('a')
+    assert time.monotonic() - started >= 0.09
+    # 待ち時間が max_wait を超えるなら、待たずに諦める
+    assert not limiter.wait('a', max_wait=0.01)
+
+def test_result_cache_ttl_and_lru(monkeypatch):
+    lookups = []
+    def fake_rdap(domain, deadline):
+        lookups.append(domain)
+        return json.dumps({'ldhName': domain})
+    monkeypatch.setattr(whois_checker, '_query_rdap', fake_rdap)
+    monkeypatch.setattr(whois_checker, '_result_cache', TTLCache(2))
+
+    for domain in ('a.test', 'b.test', 'A.test.'):
+        assert whois_checker.get_whois_info(domain).data['ldhName'] == domain.lower().rstrip('.')
+    assert lookups == ['a.test', 'b.test']
+    # 'a.test' を直前に使ったので、溢れて捨てられるのは 'b.test'
+    whois_checker.get_whois_info('c.test')
+    whois_checker.get_whois_info('a.test')
+    whois_checker.get_whois_info('b.test')
+    assert lookups == ['a.test', 'b.test', 'c.test', 'b.test']
+
+    monkeypatch.setattr(whois_checker, 'RESULT_CACHE_TTL', 0.05)
+    whois_checker.get_whois_info('d.test')
+    time.sleep(0.06)
+    whois_checker.get_whois_info('d.test')
+    assert lookups[-2:] == ['d.test', 'd.test']
@@ -0,0 +1,150 @@
+// web/js/api/bulk_checker.js
+
+let bulkTotal = 0;
+let bulkDone = 0;
+
+document.addEventListener('DOMContentLoaded', () => {
+    // CSVファイルが選ばれたら、内容をテキストエリアに読み込む
+    const fileInput = document.getElementById('bulk-csv-file');
+    if (fileInput) {
+        fileInput.addEventListener('change', () => {
+            const file = fileInput.files[0];
+            if (!file) return;
+            const reader = new FileReader();
+            reader.onload = () => { document.getElementById('bulk-domains').value = reader.result; };
+            reader.readAsText(file);
+        });
+    }
+});
+
+async function startBulkAudit() {
+    const text = document.getElementById('bulk-domains').value;
+    const resultsDiv = document.getElementById('bulk-results');
+    const statsDiv = document.getElementById('bulk-stats');
+
+    const response = await window.pywebview.api.start_bulk_audit_py(text);
+    if (response.error) {
+        resultsDiv.innerHTML = `<div class="error-message">${response.error}</div>`;
+        return;
+    }
+    bulkTotal = response.domains.length;
+    bulkDone = 0;
+    statsDiv.textContent = '';
+    resultsDiv.innerHTML = `
+        <table class="bulk-table">
+            <thead><tr><th>ドメイン</th><th>A</th><th>MX</th><th>SPF</th><th>DMARC</th><th>DKIM</th><th>Whois</th><th>変更</th><th>秒</th></tr></thead>
+            <tbody id="bulk-table-body"></tbody>
+        </table>`;
+    document.getElementById('bulk-start-btn').disabled = true;
+    document.getElementById('bulk-cancel-btn').style.display = 'block';
+    updateBulkProgress();
+}
+
+function cancelBulkAudit() {
+    document.getElementById('bulk-progress-text').textContent = '中断しています...';
+    window.pywebview.api.cancel_bulk_audit_py();
+}
+
+function updateBulkProgress() {
+    document.getElementById('bulk-progress-text').textContent = `${bulkDone} / ${bulkTotal}`;
+}
+
+/**
+ * nslookup結果から指定したレコード種別の件数を返す
+ */
+function countRecords(nslookupResult, type) {
+    if (!Array.isArray(nslookupResult)) return '-';
+    const item = nslookupResult.find(r => r.type === type);
+    return item && item.records ? item.records.length : 0;
+}
+
+/**
+ * メール認証結果で、指定したレコードが見つかったかを記号で返す
+ */
+function authMark(authResult, type) {
+    if (!authResult || !authResult.results) return '-';
+    const item = authResult.results.find(r => r.type === type);
+    if (!item || !item.records || item.records.length === 0) return '❌';
+    // SPFの参照回数超過など、レコードはあるが問題のある設定
+    return item.warnings && item.warnings.length > 0 ? '⚠️' : '✅';
+}
+
+/**
+ * Pythonから1ドメイン分の結果が届くたびに呼び出される
+ */
+function bulk_audit_result(result) {
+    const tbody = document.getElementById('bulk-table-body');
+    if (!tbody) return;
+    bulkDone += 1;
+    updateBulkProgress();
+
+    const r = result.results;
+    const whoisOk = r.whois && !r.whois.error;
+    const row = document.createElement('tr');
+    const cells = [
+        result.domain,
+        countRecords(r.nslookup, 'A'),
+        countRecords(r.nslookup, 'MX'),
+        authMark(r.email_auth, 'SPF'),
+        authMark(r.email_auth, 'DMARC'),
+        authMark(r.email_auth, 'DKIM'),
+        whoisOk ? '✅' : '❌',
+        // 前回の一括チェック以降に変わった項目
+        result.changes && result.changes.length > 0 ? result.changes.map(c => c.field).join(', ') : '-',
+        result.elapsed,
+    ];
+    cells.forEach((value, i) => {
+        const td = document.createElement('td');
+        if (i === 0) {
+            // 詳細はドメイン名を開くと表示する
+            const details = document.createElement('details');
+            const summary = document.createElement('summary');
+            summary.textContent = value;
+            const pre = document.createElement('pre');
+            pre.textContent = JSON.stringify(result, null, 2);
+            details.appendChild(summary);
+            details.appendChild(pre);
+            td.appendChild(details);
+        } else {
+            td.textContent = value;
+        }
+        row.appendChild(td);
+    });
+    tbody.appendChild(row);
+}
+
+/**
+ * 一括チェックが終わった(または中断された)ときに統計を表示する
+ */
+function finish_bulk_audit(stats) {
+    document.getElementById('bulk-start-btn').disabled = false;
+    document.getElementById('bulk-cancel-btn').style.display = 'none';
+    const statsDiv = document.getElementById('bulk-stats');
+    if (stats.error) {
+        statsDiv.innerHTML = `<div class="error-message">${stats.error}</div>`;
+        return;
+    }
+    const state = stats.cancelled ? '中断しました' : '完了しました';
+    statsDiv.textContent = `${state}: ${stats.completed} / ${stats.total} 件 (エラー ${stats.failed} 件)、`
+        + `${stats.elapsed} 秒、${stats.throughput} 件/秒、`
+        + `所要時間 p50 ${stats.latency.p50} 秒 / p95 ${stats.latency.p95} 秒 / 最大 ${stats.latency.max} 秒`;
+}
+
+/**
+ * 履歴から、指定した日数のうちに選んだ項目が変わったドメインを表示する
+ */
+async function showChangedDomains(days) {
+    const [check, field] = document.getElementById('bulk-history-field').value.split(':');
+    const resultsDiv = document.getElementById('bulk-history-results');
+    try {
+        const response = await window.pywebview.api.get_history_changes_py(check, field, days);
+        resultsDiv.innerHTML = '';
+        if (response.domains.length === 0) {
+            resultsDiv.innerHTML = `<p class="status-message">${days}日以内に変わったドメインはありません。</p>`;
+            return;
+        }
+        resultsDiv.appendChild(renderChanges(response.changes));
+    } catch (error) {
+        resultsDiv.innerHTML = `<div class="error-message">アプリケーションで予期せぬエラーが発生しました。<br>${error}</div>`;
+    }
+}
@@ -0,0 +1,113 @@
+// web/js/api/diagnostics.js
+
+document.addEventListener('DOMContentLoaded', () => {
+    const toggle = document.getElementById('metrics-toggle');
+    if (toggle) {
+        toggle.addEventListener('change', async () => {
+            await window.pywebview.api.set_metrics_enabled_py(toggle.checked);
+            refreshMetrics();
+        });
+    }
+});
+
+/**
+ * 見出しと行 (配列の配列) から表を作る
+ */
+function buildMetricsTable(headers, rows) {
+    const table = document.createElement('table');
+    table.className = 'bulk-table';
+    const thead = document.createElement('thead');
+    const headRow = document.createElement('tr');
+    headers.forEach(text => {
+        const th = document.createElement('th');
+        th.textContent = text;
+        headRow.appendChild(th);
+    });
+    thead.appendChild(headRow);
+    table.appendChild(thead);
+    const tbody = document.createElement('tbody');
+    rows.forEach(cells => {
+        const tr = document.createElement('tr');
+        cells.forEach(value => {
+            const td = document.createElement('td');
+            td.textContent = value === null || value === undefined ? '-' : value;
+            tr.appendChild(td);
+        });
+        tbody.appendChild(tr);
+    });
+    table.appendChild(tbody);
+    return table;
+}
+
+const formatLabels = (labels) => Object.entries(labels).map(([k, v]) => `${k}=${v}`).join(' ');
+
+function appendMetricsSection(resultsDiv, title, table) {
+    const header = document.createElement('h3');
+    header.textContent = title;
+    resultsDiv.appendChild(header);
+    resultsDiv.appendChild(table);
+}
+
+async function refreshMetrics() {
+    const summaryDiv = document.getElementById('metrics-summary');
+    const resultsDiv = document.getElementById('metrics-results');
+    try {
+        const data = await window.pywebview.api.get_metrics_py();
+        document.getElementById('metrics-toggle').checked = data.enabled;
+        const dns = data.dns_cache;
+        summaryDiv.textContent = `計測: ${data.enabled ? '有効' : '無効'} / `
+            + `DNSキャッシュ: ヒット率 ${(dns.hit_rate * 100).toFixed(1)}% (${dns.size} 件) / `
+            + `UIへの送信: ${data.bridge.flushes} 回 (${data.bridge.events_sent} 件)`;
+        resultsDiv.innerHTML = '';
+
+        const histograms = data.histograms.map(h => [
+            h.name, formatLabels(h.labels), h.count, h.recent.p50_ms, h.recent.p95_ms, h.recent.p99_ms, h.recent.max_ms,
+        ]);
+        appendMetricsSection(resultsDiv, '所要時間 (直近5分, ms)',
+            buildMetricsTable(['項目', 'ラベル', '回数', 'p50', 'p95', 'p99', '最大'], histograms));
+
+        const counters = data.counters.map(c => [c.name, formatLabels(c.labels), c.value]);
+        appendMetricsSection(resultsDiv, 'カウンタ', buildMetricsTable(['項目', 'ラベル', '値'], counters));
+
+        // 失敗が続いて問い合わせを見送っているサーバーと、ヘッジまでの待ち時間
+        const policy = data.net_policy;
+        const servers = Array.from(new Set([...Object.keys(policy.breaker), ...Object.keys(policy.hedge_delay_ms)])).sort();
+        const serverRows = servers.map(server => {
+            const state = policy.breaker[server];
+            return [server, state ? state.failures : 0, state && state.open_for > 0 ? `${state.open_for} 秒` : '-',
+                    policy.hedge_delay_ms[server]];
+        });
+        appendMetricsSection(resultsDiv, 'サーバーの状態',
+            buildMetricsTable(['サーバー', '連続失敗', '遮断中 (残り)', 'ヘッジまで (ms)'], serverRows));
+
+        // 実行中・待ちのジョブと、直近に終わったジョブ
+        const jobRows = data.jobs.recent.map(job => [
+            job.id, job.status, job.queued_seconds, job.elapsed, job.error,
+        ]);
+        appendMetricsSection(resultsDiv, `ジョブ (同時実行 ${data.jobs.stats.max_workers} 件まで)`,
+            buildMetricsTable(['ジョブ', '状態', '待ち (秒)', '実行 (秒)', 'エラー'], jobRows));
+
+        // 新しい問い合わせを上に表示する
+        const queries = data.recent_dns_queries.slice().reverse().map(q => [
+            new Date(q.at * 1000).toLocaleTimeString(), q.name, q.type, q.server, q.rcode, q.latency_ms, q.attempts,
+        ]);
+        appendMetricsSection(resultsDiv, '直近のDNS問い合わせ',
+            buildMetricsTable(['時刻', '名前', '種別', 'サーバー', 'rcode', 'ms', '送信回数'], queries));
+    } catch (error) {
+        resultsDiv.innerHTML = `<div class="error-message">アプリケーションで予期せぬエラーが発生しました。<br>${error}</div>`;
+    }
+}
+
+async function showPrometheusMetrics() {
+    const resultsDiv = document.getElementById('metrics-results');
+    const text = await window.pywebview.api.get_metrics_prometheus_py();
+    resultsDiv.innerHTML = '';
+    const pre = document.createElement('pre');
+    pre.textContent = text;
+    resultsDiv.appendChild(pre);
+}
+
+async function resetMetrics() {
+    await window.pywebview.api.reset_metrics_py();
+    refreshMetrics();
+}
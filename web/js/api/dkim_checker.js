@@ -1,5 +1,10 @@
 // web/js/api_calls/dkim_checker.js
 
+// 表示中のチェックのジョブID。これと違うジョブ (打ち切られた前のチェック) の通知は捨てる
+let currentAuthJobId = null;
+// check_email_auth_py の戻りより先に届いた結果: job_id → response
+const earlyAuthResults = new Map();
+
 async function startEmailAuthCheck() {
     const domain = document.getElementById('emailauth-domain').value;
     const selector = document.getElementById('dkim-selector').value;
@@ -13,10 +18,29 @@ async function startEmailAuthCheck() {
     resultsDiv.innerHTML = '';
     selectorContainer.style.display = 'none';
     document.getElementById('dkim-progress-container').style.display = 'block';
-    window.pywebview.api.check_email_auth_py(domain, selector);
+    currentAuthJobId = null;
+    earlyAuthResults.clear();
+    const response = await window.pywebview.api.check_email_auth_py(domain, selector);
+    currentAuthJobId = response.job_id;
+    if (earlyAuthResults.has(currentAuthJobId)) {
+        finish_auth_check(earlyAuthResults.get(currentAuthJobId));
+    }
+    earlyAuthResults.clear();
+}
+
+async function cancelEmailAuthCheck() {
+    document.getElementById('dkim-progress-text').textContent = '中断しています...';
+    await window.pywebview.api.cancel_email_auth_py();
+    // キャンセルしたチェックの結果は届かない
+    currentAuthJobId = null;
+    document.getElementById('dkim-progress-container').style.display = 'none';
+    document.getElementById('emailauth-results').innerHTML = '<div class="status-message">確認を中断しました。</div>';
 }
 
-function update_dkim_progress(done, total) {
+function update_dkim_progress(done, total, jobId) {
+    if (jobId !== currentAuthJobId) {
+        return;
+    }
     const progressBar = document.getElementById('dkim-progress-bar');
     const progressText = document.getElementById('dkim-progress-text');
     const percentage = total > 0 ? Math.round((done / total) * 100) : 0;
@@ -25,6 +49,15 @@ function update_dkim_progress(done, total) {
 }
 
 function finish_auth_check(response) {
+    if (currentAuthJobId === null) {
+        // 開始の戻りがまだ届いていない
+        earlyAuthResults.set(response.job_id, response);
+        return;
+    }
+    if (response.job_id !== currentAuthJobId) {
+        return;
+    }
+    currentAuthJobId = null;
     document.getElementById('dkim-progress-container').style.display = 'none';
     const resultsDiv = document.getElementById('emailauth-results');
     const selectorContainer = document.getElementById('checked-selectors-container');
@@ -44,6 +77,7 @@ function finish_auth_check(response) {
         
         let headerText = `${item.type} レコード`;
         if (item.type === 'DKIM' && item.query) { headerText += ` (${item.query})`; }
+        if (item.type === 'DKIM' && item.probes_to_hit) { headerText += ` - ${item.probes_to_hit} 番目の候補で検出`; }
 
         header.innerHTML = `
             <span class="result-header-title">${headerText}</span>
@@ -64,6 +98,7 @@ function finish_auth_check(response) {
             p.textContent = item.status || '情報がありません。';
             body.appendChild(p);
         }
+        appendAuthDetails(body, item);
         card.appendChild(header);
         card.appendChild(body);
         resultsDiv.appendChild(card);
@@ -73,3 +108,44 @@ function finish_auth_check(response) {
         selectorListDiv.textContent = checked_selectors.join(', ');
     }
 }
+
+/**
+ * SPFの展開結果 (参照回数・許可されるIP・include のツリー) や MTA-STS のポリシー、警告を結果カードに追加する
+ */
+function appendAuthDetails(body, item) {
+    const addLine = (text, className) => {
+        const p = document.createElement('p');
+        if (className) p.className = className;
+        p.textContent = text;
+        body.appendChild(p);
+    };
+    if (item.type === 'SPF' && item.lookups !== undefined) {
+        addLine(`DNS参照: ${item.lookups} / ${item.lookup_limit} 回` + (item.void_lookups ? ` (存在しない参照先: ${item.void_lookups} 件)` : ''),
+                item.lookups > item.lookup_limit ? 'highlight-yellow' : null);
+        const ips = item.flattened.ip4.concat(item.flattened.ip6);
+        const details = document.createElement('details');
+        const summary = document.createElement('summary');
+        summary.textContent = `許可される送信元: ${ips.length} 件` + (item.unflattenable.length > 0 ? ` (展開できない項: ${item.unflattenable.join(' ')})` : '');
+        const pre = document.createElement('pre');
+        pre.textContent = ips.join('\n') + '\n\n' + spfTreeToText(item.tree, 0);
+        details.appendChild(summary);
+        details.appendChild(pre);
+        body.appendChild(details);
+    }
+    if (item.type === 'MTA-STS' && item.policy) {
+        addLine(`mode: ${item.policy.mode || '-'} / max_age: ${item.policy.max_age || '-'} / mx: ${item.policy.mx.join(', ')}`);
+    }
+    (item.warnings || []).forEach(warning => addLine(`⚠️ ${warning}`, 'highlight-yellow'));
+}
+
+/**
+ * SPFの include/redirect のツリーを字下げしたテキストにする
+ */
+function spfTreeToText(node, depth) {
+    const indent = '  '.repeat(depth);
+    let text = `${indent}${node.domain} (参照 ${node.lookups} 回 / 配下を含めて ${node.total_lookups} 回)\n`;
+    if (node.record) text += `${indent}  ${node.record}\n`;
+    node.includes.forEach(child => { text += spfTreeToText(child, depth + 1); });
+    if (node.redirect) text += spfTreeToText(node.redirect, depth + 1);
+    return text;
+}
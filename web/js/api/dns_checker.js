@@ -1,4 +1,36 @@
 // web/js/api_calls/nslookup.js
+
+/**
+ * IPアドレスと、そのIPをWhois検索するボタンを要素に追加する
+ */
+function appendIpWithWhoisButton(parent, ip) {
+    parent.appendChild(document.createTextNode(`${ip} `));
+    const button = document.createElement('button');
+    button.className = 'ip-lookup-btn';
+    button.dataset.ip = ip;
+    button.textContent = 'Whois';
+    parent.appendChild(button);
+}
+
+/**
+ * nslookupの1レコード分 ({value, target, preference, addresses}) を表示用の要素にする
+ */
+function renderDnsRecord(type, record) {
+    const p = document.createElement('p');
+    if (type === 'A' || type === 'AAAA') {
+        appendIpWithWhoisButton(p, record.value);
+        return p;
+    }
+    p.appendChild(document.createTextNode(record.value));
+    // CNAME/MX/NS の参照先ホストのアドレス
+    record.addresses.forEach(address => {
+        p.appendChild(document.createElement('br'));
+        p.appendChild(document.createTextNode(`    -> ${address.type}: `));
+        appendIpWithWhoisButton(p, address.address);
+    });
+    return p;
+}
+
 async function startLookup() {
     const domain = document.getElementById('domain').value;
     const resultsDiv = document.getElementById('nslookup-results');
@@ -13,45 +45,245 @@ async function startLookup() {
     
     showLoader('DNSレコードを検索中...');
     try {
-        const results = await window.pywebview.api.nslookup_py(domain, server);
+        const results = await runJob('nslookup', [domain, server]);
         resultsDiv.innerHTML = '';
         if (results.error) {
             resultsDiv.innerHTML = `<div class="error-message">${results.error}</div>`;
             return;
         }
-        results.forEach(item => {
+        renderNslookupResults(resultsDiv, results);
+    } catch (error) {
+        resultsDiv.innerHTML = `<div class="error-message">アプリケーションで予期せぬエラーが発生しました。<br>${error}</div>`;
+    } finally {
+        hideLoader();
+    }
+}
+
+/**
+ * nslookupの結果 (DnsRecordSetのリスト) をレコード種別ごとのカードにして追加する
+ */
+function renderNslookupResults(resultsDiv, results) {
+    results.forEach(item => {
+        const card = document.createElement('div');
+        card.className = 'result-card';
+        const header = document.createElement('div');
+        header.className = 'result-header';
+        
+        header.innerHTML = `
+            <span class="result-header-title">${item.type} レコード</span>
+            <button class="clipboard-btn-card" title="この結果をコピー">📋</button>
+        `;
+        
+        const body = document.createElement('div');
+        body.className = 'result-body';
+        if (item.records && item.records.length > 0) {
+            item.records.forEach(record => {
+                body.appendChild(renderDnsRecord(item.type, record));
+            });
+        } else {
+            const p = document.createElement('p');
+            p.className = 'status-message';
+            p.textContent = item.status || '情報がありません。';
+            body.appendChild(p);
+        }
+        card.appendChild(header);
+        card.appendChild(body);
+        resultsDiv.appendChild(card);
+    });
+}
+
+/**
+ * 前回の結果のうちTTLが切れたレコードだけを問い合わせ直し、変わった項目を先頭に表示する
+ */
+async function startIncrementalLookup() {
+    const domain = document.getElementById('domain').value;
+    const resultsDiv = document.getElementById('nslookup-results');
+    const dnsSelect = document.getElementById('dns-server-select');
+    let server = dnsSelect.value;
+    if (server === 'custom') { server = document.getElementById('custom-dns-server').value; }
+
+    if (!domain) {
+        resultsDiv.innerHTML = '<div class="error-message">ドメイン名を入力してください。</div>';
+        return;
+    }
+
+    showLoader('TTLの切れたレコードを再確認中...');
+    try {
+        const entry = await runJob('nslookup_recheck', [domain, server]);
+        resultsDiv.innerHTML = '';
+        if (entry.error) {
+            resultsDiv.innerHTML = `<div class="error-message">${entry.error}</div>`;
+            return;
+        }
+        const summary = document.createElement('p');
+        summary.className = 'status-message';
+        summary.textContent = `再問い合わせ: ${entry.requeried.join(', ') || 'なし'} / 履歴から: ${entry.reused.join(', ') || 'なし'}`;
+        resultsDiv.appendChild(summary);
+        if (entry.changes.length > 0) {
+            resultsDiv.appendChild(renderChanges(entry.changes));
+        }
+        renderNslookupResults(resultsDiv, entry.result);
+    } catch (error) {
+        resultsDiv.innerHTML = `<div class="error-message">アプリケーションで予期せぬエラーが発生しました。<br>${error}</div>`;
+    } finally {
+        hideLoader();
+    }
+}
+
+/**
+ * 前回からの差分 ({field, added, removed}) のリストをカードにする
+ */
+function renderChanges(changes) {
+    const card = document.createElement('div');
+    card.className = 'result-card';
+    const header = document.createElement('div');
+    header.className = 'result-header';
+    header.innerHTML = '<span class="result-header-title">⚠️ 前回からの変更</span>';
+    const body = document.createElement('div');
+    body.className = 'result-body';
+    changes.forEach(change => {
+        const p = document.createElement('p');
+        p.className = 'highlight-yellow';
+        const prefix = change.domain ? `${change.domain} ` : '';
+        const parts = [];
+        if (change.added.length > 0) parts.push(`追加: ${change.added.join(', ')}`);
+        if (change.removed.length > 0) parts.push(`削除: ${change.removed.join(', ')}`);
+        p.textContent = `${prefix}${change.field}: ${parts.join(' / ')}`;
+        body.appendChild(p);
+    });
+    card.appendChild(header);
+    card.appendChild(body);
+    return card;
+}
+
+/**
+ * dns_servers.json の全サーバーに同じレコードを問い合わせ、食い違いを表示する
+ */
+async function startPropagationCheck() {
+    const domain = document.getElementById('domain').value;
+    const resultsDiv = document.getElementById('nslookup-results');
+    if (!domain) {
+        resultsDiv.innerHTML = '<div class="error-message">ドメイン名を入力してください。</div>';
+        return;
+    }
+
+    showLoader('全DNSサーバーに問い合わせ中...');
+    try {
+        const result = await runJob('propagation', [domain]);
+        resultsDiv.innerHTML = '';
+        if (result.error) {
+            resultsDiv.innerHTML = `<div class="error-message">${result.error}</div>`;
+            return;
+        }
+        const summary = document.createElement('p');
+        summary.className = 'status-message';
+        summary.textContent = (result.propagated ? '✅ 全サーバーの応答が一致しています。' : '⚠️ サーバー間で応答が食い違っています。')
+            + ` (${result.elapsed} 秒)`;
+        resultsDiv.appendChild(summary);
+
+        result.record_types.forEach(type => {
+            const consistency = result.consistency[type];
+            // 多数派と異なる応答を返したサーバーを強調する
+            const majority = consistency.variants.length > 0 ? consistency.variants[0].servers : [];
+
+            const card = document.createElement('div');
+            card.className = 'result-card';
+            const header = document.createElement('div');
+            header.className = 'result-header';
+            header.innerHTML = `
+                <span class="result-header-title">${type} レコード ${consistency.consistent ? '✅ 一致' : '⚠️ 不一致'}</span>
+                <button class="clipboard-btn-card" title="この結果をコピー">📋</button>
+            `;
+            const body = document.createElement('div');
+            body.className = 'result-body';
+            result.servers.forEach(server => {
+                const p = document.createElement('p');
+                const entry = server.records[type];
+                let text;
+                if (server.error) {
+                    text = `${server.name}: ${server.error}`;
+                } else if (!entry || entry.status === 'error') {
+                    text = `${server.name}: 応答なし ${entry && entry.error ? '(' + entry.error + ')' : ''}`;
+                } else {
+                    const values = entry.values.length > 0 ? entry.values.join(', ') : entry.status;
+                    const ttl = entry.ttl !== null ? ` TTL ${entry.ttl}` : '';
+                    text = `${server.name} (${entry.latency_ms.toFixed(0)}ms${ttl}): ${values}`;
+                }
+                p.textContent = text;
+                if (!server.error && entry && entry.status !== 'error' && !majority.includes(server.name)) {
+                    p.className = 'highlight-yellow';
+                }
+                body.appendChild(p);
+            });
+            card.appendChild(header);
+            card.appendChild(body);
+            resultsDiv.appendChild(card);
+        });
+    } catch (error) {
+        resultsDiv.innerHTML = `<div class="error-message">アプリケーションで予期せぬエラーが発生しました。<br>${error}</div>`;
+    } finally {
+        hideLoader();
+    }
+}
+
+// DNSSECの検証結果の表示
+const DNSSEC_STATUS_LABELS = {
+    secure: '✅ 検証済み',
+    insecure: '⚠️ 署名なし',
+    'unproven-insecure': '⚠️ 署名なし (DSが無いことを証明できません)',
+    bogus: '❌ 検証失敗',
+    error: '❌ エラー',
+};
+
+/**
+ * ルートからドメインまでのDNSSECの信頼の連鎖を検証し、ゾーンごとの結果を表示する
+ */
+async function startDnssecCheck() {
+    const domain = document.getElementById('domain').value;
+    const resultsDiv = document.getElementById('nslookup-results');
+    let server = document.getElementById('dns-server-select').value;
+    if (server === 'custom') { server = document.getElementById('custom-dns-server').value; }
+    if (!domain) {
+        resultsDiv.innerHTML = '<div class="error-message">ドメイン名を入力してください。</div>';
+        return;
+    }
+
+    showLoader('DNSSECの連鎖を検証中...');
+    try {
+        const result = await runJob('dnssec', [domain, server]);
+        resultsDiv.innerHTML = '';
+        if (!result.links) {
+            resultsDiv.innerHTML = `<div class="error-message">${result.error}</div>`;
+            return;
+        }
+        const summary = document.createElement('p');
+        summary.className = 'status-message';
+        summary.textContent = `${DNSSEC_STATUS_LABELS[result.status]}`
+            + (result.failed_at ? ` (${result.failed_at} で連鎖が切れています)` : '')
+            + ` / 問い合わせ ${result.queries} 件 (${result.elapsed} 秒)`;
+        resultsDiv.appendChild(summary);
+
+        result.links.forEach(link => {
             const card = document.createElement('div');
             card.className = 'result-card';
             const header = document.createElement('div');
             header.className = 'result-header';
-            
             header.innerHTML = `
-                <span class="result-header-title">${item.type} レコード</span>
+                <span class="result-header-title">${link.zone} ${DNSSEC_STATUS_LABELS[link.status]}${link.cached ? ' (検証済みの鍵を再利用)' : ''}</span>
                 <button class="clipboard-btn-card" title="この結果をコピー">📋</button>
             `;
-            
             const body = document.createElement('div');
             body.className = 'result-body';
-            if (item.records && item.records.length > 0) {
-                item.records.forEach(record => {
-                    const p = document.createElement('p');
-                    
-                    const ipRegex = /\[IP\]([0-9a-fA-F:.]+)/g;
-                    let processedRecord = record.replace(/\n/g, '<br>');
-                    
-                    processedRecord = processedRecord.replace(ipRegex, (match, ip) => {
-                        return `${ip} <button class="ip-lookup-btn" data-ip="${ip}">Whois</button>`;
-                    });
-
-                    p.innerHTML = processedRecord;
-                    body.appendChild(p);
-                });
-            } else {
+            const lines = [
+                `DS: ${link.ds.join(', ') || 'なし'}`,
+                `DNSKEY: ${link.dnskey.join(', ') || 'なし'}`,
+            ];
+            if (link.detail) lines.push(link.detail);
+            lines.forEach(text => {
                 const p = document.createElement('p');
-                p.className = 'status-message';
-                p.textContent = item.status || '情報がありません。';
+                p.textContent = text;
                 body.appendChild(p);
-            }
+            });
             card.appendChild(header);
             card.appendChild(body);
             resultsDiv.appendChild(card);
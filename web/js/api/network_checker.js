@@ -13,10 +13,81 @@ async function startPortCheck() {
     }
     showLoader('ポートに接続中...');
     try {
-        resultsDiv.textContent = await window.pywebview.api.test_port_connection_py(host, port);
+        const result = await runJob('port', [host, port]);
+        if (result.error && !result.port) {
+            resultsDiv.textContent = `エラー: ${result.error}`;
+        } else if (result.state === 'open') {
+            resultsDiv.textContent = `✅ 成功: ${result.host} (${result.ip}) のポート ${result.port} に接続できました。 (${result.latency_ms.toFixed(1)} ms)`;
+        } else {
+            resultsDiv.textContent = `❌ 失敗: 予期せぬエラーが発生しました。\n${result.error}`;
+        }
     } catch (error) {
         resultsDiv.textContent = 'アプリケーションでエラーが発生しました。\n' + error;
     } finally {
         hideLoader();
     }
-}
\ No newline at end of file
+}
+
+let portScanTotal = 0;
+let portScanDone = 0;
+const PORT_STATE_LABELS = { open: '✅ open', closed: '❌ closed', filtered: '⏳ filtered', error: '⚠️ error' };
+
+async function startPortScan() {
+    const hosts = document.getElementById('portscan-hosts').value;
+    const ports = document.getElementById('portscan-ports').value;
+    const resultsDiv = document.getElementById('portscan-results');
+    document.getElementById('portscan-summary').textContent = '';
+
+    const response = await window.pywebview.api.start_port_scan_py(hosts, ports);
+    if (response.error) {
+        resultsDiv.innerHTML = `<div class="error-message">${response.error}</div>`;
+        return;
+    }
+    portScanTotal = response.total;
+    portScanDone = 0;
+    resultsDiv.innerHTML = `
+        <table class="bulk-table">
+            <thead><tr><th>ホスト</th><th>IP</th><th>ポート</th><th>状態</th><th>接続時間</th></tr></thead>
+            <tbody id="portscan-table-body"></tbody>
+        </table>`;
+    document.getElementById('portscan-start-btn').disabled = true;
+    document.getElementById('portscan-cancel-btn').style.display = 'block';
+    document.getElementById('portscan-progress-text').textContent = `0 / ${portScanTotal}`;
+}
+
+function cancelPortScan() {
+    document.getElementById('portscan-progress-text').textContent = '中断しています...';
+    window.pywebview.api.cancel_port_scan_py();
+}
+
+/**
+ * Pythonから1ポート分の結果が届くたびに呼び出される
+ */
+function port_scan_result(result) {
+    const tbody = document.getElementById('portscan-table-body');
+    if (!tbody) return;
+    portScanDone += 1;
+    document.getElementById('portscan-progress-text').textContent = `${portScanDone} / ${portScanTotal}`;
+
+    const row = document.createElement('tr');
+    const latency = result.latency_ms !== null ? `${result.latency_ms.toFixed(1)} ms` : '-';
+    [result.host, result.ip || '-', result.port, PORT_STATE_LABELS[result.state] || result.state, latency].forEach(value => {
+        const td = document.createElement('td');
+        td.textContent = value;
+        row.appendChild(td);
+    });
+    if (result.error) row.title = result.error;
+    tbody.appendChild(row);
+}
+
+function finish_port_scan(summary) {
+    document.getElementById('portscan-start-btn').disabled = false;
+    document.getElementById('portscan-cancel-btn').style.display = 'none';
+    const summaryDiv = document.getElementById('portscan-summary');
+    if (summary.error) {
+        summaryDiv.innerHTML = `<div class="error-message">${summary.error}</div>`;
+        return;
+    }
+    summaryDiv.textContent = `open ${summary.open} / closed ${summary.closed} / filtered ${summary.filtered} / error ${summary.errors}`
+        + ` (${summary.scanned} 件、${summary.elapsed} 秒)`;
+}
@@ -10,8 +10,8 @@ async function startWhois() {
     }
     showLoader('Whois情報を取得中...');
     try {
-        const resultText = await window.pywebview.api.whois_py(target);
-        resultsDiv.innerHTML = formatWhoisForDisplay(resultText);
+        const result = await runJob('whois', [target]);
+        resultsDiv.innerHTML = formatWhoisForDisplay(whoisResultToText(result));
     } catch (error) {
         resultsDiv.textContent = 'アプリケーションでエラーが発生しました。\n' + error;
     } finally {
@@ -19,6 +19,15 @@ async function startWhois() {
     }
 }
 
+/**
+ * Whoisの結果 (WhoisResult) を表示用のテキストにする。RDAPの場合はJSONを整形する。
+ */
+function whoisResultToText(result) {
+    if (result.error) return `Error: ${result.error}`;
+    if (result.source === 'rdap') return JSON.stringify(result.data, null, 4);
+    return result.text;
+}
+
 /**
  * Whoisの結果を色分けするヘルパー関数
  */
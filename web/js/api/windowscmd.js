@@ -8,7 +8,7 @@ async function startPing() {
     resultsDiv.textContent = `実行中...`;
     showLoader('Pingを実行中...');
     try {
-        resultsDiv.textContent = await window.pywebview.api.ping_py(host);
+        resultsDiv.textContent = formatPingResult(await runJob('ping', [host]));
     } catch (error) {
         resultsDiv.textContent = 'アプリケーションでエラーが発生しました。\n' + error;
     } finally {
@@ -26,10 +26,50 @@ async function startTraceroute() {
     resultsDiv.textContent = `実行中... (時間がかかる場合があります)`;
     showLoader('経路を追跡中...');
     try {
-        resultsDiv.textContent = await window.pywebview.api.traceroute_py(host);
+        resultsDiv.textContent = formatTracerouteResult(await runJob('traceroute', [host]));
     } catch (error) {
         resultsDiv.textContent = 'アプリケーションでエラーが発生しました。\n' + error;
     } finally {
         hideLoader();
     }
-}
\ No newline at end of file
+}
+
+const formatMs = (value) => (value !== null && value !== undefined ? `${value.toFixed(1)}ms` : '*');
+
+/**
+ * Pingの結果 (PingStats) を表示用のテキストにする
+ */
+function formatPingResult(result) {
+    if (result.error) return `エラー: ${result.error}`;
+    const method = result.method === 'icmp' ? 'ICMP' : `TCP (ポート ${result.method.split(':').pop()})`;
+    const lines = [`${result.host} [${result.ip}] に ${method} で Ping を送信しています:`];
+    result.probes.forEach(probe => {
+        lines.push(probe.rtt_ms === null
+            ? `seq=${probe.seq + 1} 要求がタイムアウトしました。`
+            : `seq=${probe.seq + 1} 応答: 時間=${formatMs(probe.rtt_ms)}`);
+    });
+    lines.push('');
+    lines.push(`統計: 送信 = ${result.sent}、受信 = ${result.received}、損失 = ${result.sent - result.received} (${result.loss_pct}% の損失)`);
+    if (result.received > 0) {
+        lines.push(`往復時間: 最小 = ${formatMs(result.min_ms)}、最大 = ${formatMs(result.max_ms)}、`
+            + `平均 = ${formatMs(result.avg_ms)}、ジッター = ${formatMs(result.jitter_ms)}`);
+    }
+    return lines.join('\n');
+}
+
+/**
+ * Tracerouteの結果 (TraceResult) を表示用のテキストにする
+ */
+function formatTracerouteResult(result) {
+    if (result.error) return `エラー: ${result.error}`;
+    // OSのコマンドで代用した場合は、その出力をそのまま表示する
+    if (result.output !== null) return result.output;
+    const lines = [`${result.host} [${result.ip}] へのルートをトレースしています (最大 ${result.max_hops} ホップ):`, ''];
+    result.hops.forEach(hop => {
+        const rtts = hop.rtts_ms.map(rtt => formatMs(rtt).padStart(10)).join('');
+        lines.push(`${String(hop.ttl).padStart(3)}${rtts}  ${hop.address || '要求がタイムアウトしました。'}`);
+    });
+    lines.push('');
+    lines.push(result.reached ? 'トレースを完了しました。' : '宛先に到達できませんでした。');
+    return lines.join('\n');
+}
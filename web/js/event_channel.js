@@ -0,0 +1,22 @@
+// web/js/event_channel.js
+
+/**
+ * Python側の ProgressChannel からまとめて送られた呼び出しを順番に実行する
+ * @param {Array<{fn: string, args: Array}>} events - 呼び出す関数名と引数のリスト
+ * @returns {number} 処理したイベント数
+ */
+function dispatch_py_events(events) {
+    events.forEach(event => {
+        const handler = window[event.fn];
+        if (typeof handler !== 'function') {
+            console.warn(`未定義のハンドラです: ${event.fn}`);
+            return;
+        }
+        try {
+            handler(...event.args);
+        } catch (error) {
+            console.error(`${event.fn} の実行中にエラーが発生しました:`, error);
+        }
+    });
+    return events.length;
+}
@@ -0,0 +1,74 @@
+// web/js/jobs.js
+
+// runJob で実行する種類 (これ以外のジョブの結果は各機能の finish_* で届くので、ここでは覚えておかない)
+const JOB_TYPES_FROM_UI = {
+    nslookup: true, nslookup_recheck: true, propagation: true, port: true, ping: true, traceroute: true, whois: true, dnssec: true,
+};
+
+// 結果を待っているジョブ: job_id → resolve
+const pendingJobs = new Map();
+// start_job_py の戻りより先に届いた結果: job_id → job
+const earlyJobResults = new Map();
+// ローディング表示中のジョブ (「キャンセル」ボタンで止める対象)
+let loaderJobId = null;
+
+/**
+ * Python側の処理をジョブとして実行し、結果を返す。
+ * 呼び出しはすぐに戻り、結果は job_finished で届くので、待っている間も画面は固まらない。
+ * @param {string} type - ジョブの種類 (Api.JOB_METHODS のキー: nslookup, whois, ping など)
+ * @param {Array} args - 実行するメソッドに渡す引数
+ * @returns {Promise<any>} メソッドの戻り値。失敗・キャンセル時は {error, cancelled} を返す
+ */
+async function runJob(type, args = []) {
+    const response = await window.pywebview.api.start_job_py(type, args);
+    if (response.error) {
+        return response;
+    }
+    const jobId = response.job_id;
+    loaderJobId = jobId;
+    const job = await new Promise(resolve => {
+        if (earlyJobResults.has(jobId)) {
+            resolve(earlyJobResults.get(jobId));
+            earlyJobResults.delete(jobId);
+        } else {
+            pendingJobs.set(jobId, resolve);
+        }
+    });
+    if (loaderJobId === jobId) {
+        loaderJobId = null;
+    }
+    if (job.status === 'done') {
+        return job.result;
+    }
+    return { error: job.error, cancelled: job.status === 'cancelled' };
+}
+
+/**
+ * ジョブが終わったときにPython側から呼ばれる
+ * @param {Object} job - ジョブの状態と結果 (job.result)
+ */
+function job_finished(job) {
+    const resolve = pendingJobs.get(job.id);
+    if (resolve) {
+        pendingJobs.delete(job.id);
+        resolve(job);
+    } else if (job.type in JOB_TYPES_FROM_UI) {
+        earlyJobResults.set(job.id, job);
+    }
+}
+
+/**
+ * ジョブをキャンセルする。待っていた runJob は {cancelled: true} で戻る。
+ */
+async function cancelJob(jobId) {
+    if (jobId) {
+        await window.pywebview.api.cancel_job_py(jobId);
+    }
+}
+
+/**
+ * ローディング表示の「キャンセル」ボタンから、表示中のジョブを止める
+ */
+function cancelLoaderJob() {
+    cancelJob(loaderJobId);
+}